@@ -5,4 +5,10 @@ set -o errexit
 pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
+
+# Precompress the React build (if present) so WhiteNoise serves .br/.gz files
+if [ -d frontend/dist ]; then
+  python -m whitenoise.compress frontend/dist
+fi
+
 python manage.py migrate
\ No newline at end of file
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import api from './api';
+import { subscribeToOrderEvents } from './utils/orderStream';
 
 const MyOrdersPage = ({ user }) => {
     const [orders, setOrders] = useState([]);
@@ -27,6 +28,16 @@ const MyOrdersPage = ({ user }) => {
         fetchOrders();
     }, [user]);
 
+    useEffect(() => {
+        if (!user) return undefined;
+        return subscribeToOrderEvents({
+            onStatusChanged: (event) => {
+                const { order, to } = event.payload;
+                setOrders((prev) => prev.map((item) => (item.id === order ? { ...item, status: to } : item)));
+            },
+        });
+    }, [user]);
+
     if (loading) return <div className="text-center p-5"><h2>Loading your orders...</h2></div>;
 
     return (
@@ -1,10 +1,26 @@
 ﻿import React, { useCallback, useEffect, useState } from 'react';
 import api from './api';
+import { subscribeToOrderEvents } from './utils/orderStream';
+
+const STATUSES = ['Pending', 'Processing', 'Shipped', 'Delivered', 'Cancelled'];
+
+// Mirrors Order.STATUS_TRANSITIONS on the backend; Delivered and Cancelled are final.
+const STATUS_TRANSITIONS = {
+  Pending: ['Processing', 'Shipped', 'Delivered', 'Cancelled'],
+  Processing: ['Pending', 'Shipped', 'Delivered', 'Cancelled'],
+  Shipped: ['Delivered', 'Cancelled'],
+  Delivered: [],
+  Cancelled: [],
+};
+
+const canTransition = (from, to) => from === to || (STATUS_TRANSITIONS[from] || []).includes(to);
 
 const OrderManagement = () => {
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [selected, setSelected] = useState([]);
+  const [bulkStatus, setBulkStatus] = useState('Processing');
 
   const fetchOrders = useCallback(async () => {
     try {
@@ -24,6 +40,16 @@ const OrderManagement = () => {
     fetchOrders();
   }, [fetchOrders]);
 
+  // Live updates instead of refetching the whole list.
+  useEffect(() => subscribeToOrderEvents({
+    onCreated: fetchOrders,
+    onStatusChanged: (event) => {
+      const { order, to } = event.payload;
+      setOrders((prev) => prev.map((item) => (item.id === order ? { ...item, status: to } : item)));
+    },
+    onResync: fetchOrders,
+  }), [fetchOrders]);
+
   const handleStatusChange = async (orderId, newStatus) => {
     try {
       await api.post(`orders/${orderId}/update-status/`, { status: newStatus });
@@ -34,14 +60,55 @@ const OrderManagement = () => {
     }
   };
 
+  const toggleSelected = (orderId) => {
+    setSelected((prev) => (prev.includes(orderId) ? prev.filter((id) => id !== orderId) : [...prev, orderId]));
+  };
+
+  const toggleAll = () => {
+    setSelected((prev) => (prev.length === orders.length ? [] : orders.map((order) => order.id)));
+  };
+
+  // One request for the whole batch; the server applies all changes or none.
+  const handleBulkStatusChange = async () => {
+    if (selected.length === 0) return;
+    try {
+      await api.post('orders/bulk-update-status/', { order_ids: selected, status: bulkStatus });
+      setOrders((prev) => prev.map((order) => (selected.includes(order.id) ? { ...order, status: bulkStatus } : order)));
+      setSelected([]);
+    } catch (error) {
+      console.error('Error updating order statuses:', error);
+      const details = error.response?.data?.errors;
+      const message = details
+        ? Object.entries(details).map(([id, reason]) => `#${id}: ${reason}`).join('\n')
+        : error.response?.data?.error;
+      alert(message || 'Failed to update statuses');
+    }
+  };
+
+  const bulkAllowed = selected.length > 0 && orders
+    .filter((order) => selected.includes(order.id))
+    .every((order) => canTransition(order.status, bulkStatus));
+
   if (loading) {
     return <div className="p-4">Loading orders...</div>;
   }
 
   return (
     <div className="card shadow-sm m-4">
-      <div className="card-header bg-white py-3">
+      <div className="card-header bg-white py-3 d-flex justify-content-between align-items-center">
         <h5 className="m-0 fw-bold text-secondary">Order Management</h5>
+        <div className="d-flex gap-2 align-items-center">
+          <small className="text-muted">{selected.length} selected</small>
+          <select className="form-select form-select-sm" value={bulkStatus} onChange={(e) => setBulkStatus(e.target.value)}>
+            <option value="Processing">Processing</option>
+            <option value="Shipped">Shipped</option>
+            <option value="Delivered">Delivered</option>
+            <option value="Cancelled">Cancelled</option>
+          </select>
+          <button className="btn btn-sm btn-danger text-nowrap" disabled={!bulkAllowed} onClick={handleBulkStatusChange}>
+            Apply to selected
+          </button>
+        </div>
       </div>
       {error && <div className="alert alert-danger m-3 mb-0">{error}</div>}
       <div className="card-body p-0">
@@ -49,6 +116,14 @@ const OrderManagement = () => {
           <table className="table table-striped table-hover mb-0">
             <thead className="bg-light">
               <tr>
+                <th>
+                  <input
+                    type="checkbox"
+                    className="form-check-input"
+                    checked={orders.length > 0 && selected.length === orders.length}
+                    onChange={toggleAll}
+                  />
+                </th>
                 <th>ID</th>
                 <th>Customer</th>
                 <th>Product</th>
@@ -61,6 +136,14 @@ const OrderManagement = () => {
             <tbody>
               {orders.map((order) => (
                 <tr key={order.id}>
+                  <td>
+                    <input
+                      type="checkbox"
+                      className="form-check-input"
+                      checked={selected.includes(order.id)}
+                      onChange={() => toggleSelected(order.id)}
+                    />
+                  </td>
                   <td>#{order.id}</td>
                   <td>
                     <strong>{order.customer}</strong>
@@ -77,11 +160,9 @@ const OrderManagement = () => {
                       value={order.status}
                       onChange={(e) => handleStatusChange(order.id, e.target.value)}
                     >
-                      <option value="Pending">Pending</option>
-                      <option value="Processing">Processing</option>
-                      <option value="Shipped">Shipped</option>
-                      <option value="Delivered">Delivered</option>
-                      <option value="Cancelled">Cancelled</option>
+                      {STATUSES.filter((status) => canTransition(order.status, status)).map((status) => (
+                        <option key={status} value={status}>{status}</option>
+                      ))}
                     </select>
                   </td>
                 </tr>
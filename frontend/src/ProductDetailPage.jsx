@@ -7,6 +7,7 @@ const ProductDetailPage = ({ user }) => {
     const { productId } = useParams();
     const navigate = useNavigate();
     const [product, setProduct] = useState(null);
+    const [related, setRelated] = useState([]);
     const [quantity, setQuantity] = useState(1);
     const [phone, setPhone] = useState('');
     const [address, setAddress] = useState('');
@@ -21,7 +22,16 @@ const ProductDetailPage = ({ user }) => {
                 console.error("Failed to fetch product", error);
             }
         };
+        const fetchRelated = async () => {
+            try {
+                const res = await api.get(`products/${productId}/related/`);
+                setRelated(res.data);
+            } catch (error) {
+                setRelated([]);
+            }
+        };
         fetchProduct();
+        fetchRelated();
     }, [productId]);
 
     const handlePlaceOrder = async (e) => {
@@ -81,6 +91,24 @@ const ProductDetailPage = ({ user }) => {
                     {!user && <p className="text-warning mt-2">Please <Link to="/login">login</Link> to place an order.</p>}
                 </form>
             </div>
+            {related.length > 0 && (
+                <div className="col-12">
+                    <h4>Frequently Bought Together</h4>
+                    <div className="row g-3">
+                        {related.map(item => (
+                            <div className="col-6 col-md-3" key={item.id}>
+                                <Link to={`/customer/products/${item.id}`} className="card h-100 text-decoration-none">
+                                    <img src={getImageUrl(item.image)} className="card-img-top" alt={item.name} />
+                                    <div className="card-body">
+                                        <h6 className="card-title">{item.name}</h6>
+                                        <p className="card-text fw-bold text-danger">TSh {parseFloat(item.price).toLocaleString()}</p>
+                                    </div>
+                                </Link>
+                            </div>
+                        ))}
+                    </div>
+                </div>
+            )}
         </div>
     );
 };
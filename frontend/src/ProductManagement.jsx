@@ -192,6 +192,25 @@ const ProductManagement = () => {
     }
   };
 
+  // One request for a whole CSV/JSON file; the server upserts by SKU.
+  const handleImport = async (e) => {
+    const file = e.target.files[0];
+    e.target.value = '';
+    if (!file) return;
+    const payload = new FormData();
+    payload.append('file', file);
+    try {
+      const res = await api.post('products/import/', payload);
+      const { created, updated, error_count: errorCount, errors } = res.data;
+      const problems = errors.slice(0, 10).map((item) => `Row ${item.row}: ${item.error}`).join('\n');
+      alert(`Imported: ${created} new, ${updated} updated, ${errorCount} rejected.${problems ? `\n\n${problems}` : ''}`);
+      fetchProducts();
+    } catch (error) {
+      console.error('Import failed:', error.response?.data || error);
+      alert(error.response?.data?.error || 'Import failed.');
+    }
+  };
+
   const handleEdit = (product) => {
     setEditingProduct(product);
     setShowForm(true);
@@ -216,9 +235,15 @@ const ProductManagement = () => {
     <div className="container-fluid p-4">
       <div className="d-flex justify-content-between align-items-center mb-4">
         <h4 className="fw-bold text-dark mb-0">Product Management</h4>
-        <button className="btn btn-primary btn-sm shadow-sm" onClick={handleAddNew} style={{ borderRadius: '20px', padding: '8px 20px' }}>
-          + Add New Product
-        </button>
+        <div className="d-flex gap-2">
+          <label className="btn btn-outline-primary btn-sm shadow-sm mb-0" style={{ borderRadius: '20px', padding: '8px 20px' }}>
+            Import CSV/JSON
+            <input type="file" accept=".csv,.json,.jsonl" onChange={handleImport} hidden />
+          </label>
+          <button className="btn btn-primary btn-sm shadow-sm" onClick={handleAddNew} style={{ borderRadius: '20px', padding: '8px 20px' }}>
+            + Add New Product
+          </button>
+        </div>
       </div>
 
       <div className="row g-4">
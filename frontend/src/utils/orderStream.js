@@ -0,0 +1,47 @@
+import api from '../api';
+
+// How often to refetch when the live stream is unavailable.
+const POLL_INTERVAL_MS = 15000;
+
+/**
+ * Subscribes to live order events (Server-Sent Events from `orders/stream/`).
+ * Falls back to polling (calling onResync periodically) when the stream is
+ * unavailable, e.g. when the backend runs under WSGI and answers 404.
+ * @param {object} handlers - Callbacks: onCreated(event), onStatusChanged(event), onResync()
+ * @returns {function} - Call to close the connection
+ */
+export const subscribeToOrderEvents = ({ onCreated, onStatusChanged, onResync }) => {
+  let timer = null;
+  const poll = () => {
+    if (!timer) {
+      timer = setInterval(() => onResync && onResync(), POLL_INTERVAL_MS);
+    }
+  };
+
+  if (typeof window === 'undefined' || !window.EventSource) {
+    poll();
+    return () => clearInterval(timer);
+  }
+
+  // The session cookie authenticates the stream; the browser reconnects on its
+  // own and sends Last-Event-ID so missed events are replayed.
+  const source = new EventSource(`${api.defaults.baseURL}orders/stream/`, { withCredentials: true });
+  const parse = (handler) => (message) => {
+    if (handler) handler(JSON.parse(message.data));
+  };
+
+  source.addEventListener('order.created', parse(onCreated));
+  source.addEventListener('order.status_changed', parse(onStatusChanged));
+  source.addEventListener('resync', () => onResync && onResync());
+  // A CLOSED source will not reconnect (an error status such as 404); poll instead.
+  source.onerror = () => {
+    if (source.readyState === window.EventSource.CLOSED) {
+      poll();
+    }
+  };
+
+  return () => {
+    source.close();
+    clearInterval(timer);
+  };
+};
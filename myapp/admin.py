@@ -1,25 +1,34 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import Category, Product, Customer, Sale, SaleItem, Order
+from .admin_tools import AutocompleteFilter, ScalableAdminMixin
+from .inventory import ledger_batch
+from .models import (
+    ArchivedOrder, ArchivedSale, ArchivedSaleItem, Category, Product, Customer, Sale, SaleItem, Order, DeadTask, LowStockAlert, OutboxCursor, OutboxEvent, PriceHistory, RelatedProduct, ReorderSuggestion,
+    StockMovement, StockSnapshot, Task,
+)
+from .orders import OrderTransitionError, transition_orders
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name']
+    list_display = ['id', 'name', 'parent', 'reorder_threshold', 'product_count', 'in_stock_count']
+    list_select_related = ['parent']
     search_fields = ['name']
     ordering = ['name']
+    autocomplete_fields = ['parent']
+    readonly_fields = ['path', 'product_count', 'in_stock_count']
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'category', 'price', 'quantity', 'created_at']
     list_filter = ['category', 'created_at']
-    search_fields = ['name']
-    readonly_fields = ['created_at', 'updated_at']
+    search_fields = ['name', 'sku']
+    readonly_fields = ['next_price_change', 'created_at', 'updated_at']
     fieldsets = (
         ('Product Info', {
-            'fields': ('name', 'category', 'price', 'quantity', 'image')
+            'fields': ('name', 'sku', 'category', 'price', 'next_price_change', 'quantity', 'reorder_threshold', 'image')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -27,11 +36,16 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        # Stock edits made here are logged to the ledger as adjustments by this user
+        with ledger_batch(user=request.user):
+            super().save_model(request, obj, form, change)
+
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'name', 'phone', 'address', 'created_at']
-    search_fields = ['name', 'phone']
+    search_fields = ['name', '^phone']
     readonly_fields = ['created_at']
     fieldsets = (
         ('Customer Info', {
@@ -48,12 +62,16 @@ class SaleItemInline(admin.TabularInline):
     model = SaleItem
     extra = 1
     fields = ['product', 'quantity', 'price']
+    autocomplete_fields = ['product']
 
 
 @admin.register(Sale)
-class SaleAdmin(admin.ModelAdmin):
+class SaleAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'customer_name', 'user', 'total_amount', 'date']
-    list_filter = ['date', 'user']
+    list_filter = ['date', ('user', AutocompleteFilter)]
+    list_select_related = ['customer', 'user']
+    search_fields = ['customer__name']
+    autocomplete_fields = ['user', 'customer']
     readonly_fields = ['date', 'total_amount']
     inlines = [SaleItemInline]
     fieldsets = (
@@ -73,10 +91,12 @@ class SaleAdmin(admin.ModelAdmin):
 
 
 @admin.register(SaleItem)
-class SaleItemAdmin(admin.ModelAdmin):
+class SaleItemAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'sale', 'product', 'quantity', 'price', 'get_total']
-    list_filter = ['sale', 'product']
-    search_fields = ['product__name']
+    list_filter = [('sale', AutocompleteFilter), ('product', AutocompleteFilter)]
+    list_select_related = ['sale', 'product']
+    search_fields = ['^product__name']
+    autocomplete_fields = ['sale', 'product']
     readonly_fields = ['get_total']
     
     def get_total(self, obj):
@@ -84,12 +104,100 @@ class SaleItemAdmin(admin.ModelAdmin):
     get_total.short_description = 'Total'
 
 
+def order_status_action(new_status):
+    """Admin action moving the selected orders to ``new_status`` through ``transition_orders``."""
+    @admin.action(description=f"Mark selected orders as {new_status}")
+    def action(modeladmin, request, queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        try:
+            changed = transition_orders(dict.fromkeys(ids, new_status), user=request.user)
+        except OrderTransitionError as exc:
+            errors = '; '.join(f"#{pk}: {message}" for pk, message in sorted(exc.errors.items()))
+            modeladmin.message_user(request, f"No orders changed. {errors}", messages.ERROR)
+            return
+        modeladmin.message_user(request, f"{len(changed)} order(s) marked {new_status}.")
+    action.__name__ = f'mark_{new_status.lower()}'
+    return action
+
+
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'product', 'user', 'phone', 'quantity', 'total_price', 'status', 'date_ordered']
-    list_filter = ['status', 'date_ordered']
-    search_fields = ['user__username', 'phone', 'product__name']
-    list_editable = ['status']
+    list_filter = ['status', 'date_ordered', ('product', AutocompleteFilter), ('user', AutocompleteFilter)]
+    list_select_related = ['product', 'user']
+    # Prefix/exact lookups so the joined columns can use their indexes.
+    search_fields = ['=user__username', '^phone', '^product__name']
+    autocomplete_fields = ['product', 'user']
+    # Status only changes through the actions, so every change is checked
+    # against the state machine, restocks on cancellation and reaches the outbox.
+    readonly_fields = ['status']
+    actions = [order_status_action(value) for value, _ in Order.STATUS_CHOICES]
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['id', 'product', 'kind', 'quantity', 'reference_id', 'user', 'created_at']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['product__name', 'note']
+    list_select_related = ['product', 'user']
+    raw_id_fields = ['product', 'user']
+    date_hierarchy = 'created_at'
+
+    # The ledger is append-only: rows are written by the application, never edited here.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'product', 'kind', 'price', 'valid_from', 'valid_to', 'created_by']
+    list_filter = ['kind', 'valid_from']
+    search_fields = ['product__name', 'product__sku', 'note']
+    list_select_related = ['product', 'created_by']
+    raw_id_fields = ['product']
+    date_hierarchy = 'valid_from'
+    exclude = ['created_by', 'created_at']
+
+    # Rows go through pricing.set_prices so the current price and the
+    # scheduled refreshes stay in step; history is not edited afterwards.
+    def save_model(self, request, obj, form, change):
+        from .pricing import set_prices
+        set_prices({obj.product_id: obj.price}, obj.kind, obj.valid_from, obj.valid_to, user=request.user, note=obj.note)
+        obj.pk = PriceHistory.objects.filter(product_id=obj.product_id).values_list('pk', flat=True).order_by('-pk').first()
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['id', 'product', 'quantity', 'taken_at', 'last_movement_id']
+    list_select_related = ['product']
+    raw_id_fields = ['product']
+    date_hierarchy = 'taken_at'
+
+
+@admin.register(LowStockAlert)
+class LowStockAlertAdmin(admin.ModelAdmin):
+    list_display = ['product', 'quantity', 'threshold', 'since']
+    list_select_related = ['product']
+    search_fields = ['product__name']
+
+    # Maintained automatically as stock moves.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 # Re-register UserAdmin to show staff status clearly
@@ -100,4 +208,116 @@ class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser', 'is_active', 'date_joined')
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'date_joined')
     search_fields = ('username', 'email')
-    ordering = ('-date_joined',)
\ No newline at end of file
+    ordering = ('-date_joined',)
+
+
+@admin.register(ReorderSuggestion)
+class ReorderSuggestionAdmin(admin.ModelAdmin):
+    list_display = ['product', 'on_hand', 'forecast_daily', 'days_of_cover', 'suggested_quantity', 'generated_at']
+    list_select_related = ['product']
+    search_fields = ['product__name']
+
+    # Rebuilt by `manage.py forecast_demand`.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RelatedProduct)
+class RelatedProductAdmin(admin.ModelAdmin):
+    list_display = ['product', 'rank', 'related', 'together', 'score']
+    list_select_related = ['product', 'related']
+    search_fields = ['product__name']
+
+    # Rebuilt by `manage.py build_recommendations`.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by']
+    list_filter = ['status', 'name']
+    readonly_fields = ['attempts', 'locked_by', 'locked_at', 'last_error', 'created_at']
+
+
+@admin.register(DeadTask)
+class DeadTaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'attempts', 'created_at', 'failed_at']
+    list_filter = ['name']
+    readonly_fields = ['name', 'payload', 'attempts', 'last_error', 'created_at', 'failed_at']
+    actions = ['requeue']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Requeue selected tasks")
+    def requeue(self, request, queryset):
+        dead = list(queryset)
+        Task.objects.bulk_create(Task(name=task.name, payload=task.payload) for task in dead)
+        queryset.delete()
+        self.message_user(request, f"Requeued {len(dead)} task(s).")
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'topic', 'subject_id', 'created_at']
+    list_filter = ['topic']
+    readonly_fields = ['topic', 'subject_id', 'payload', 'created_at']
+
+    # The outbox is append-only.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboxCursor)
+class OutboxCursorAdmin(admin.ModelAdmin):
+    list_display = ['consumer', 'position', 'updated_at']
+
+
+class ArchivedSaleItemInline(admin.TabularInline):
+    model = ArchivedSaleItem
+    fields = ['product', 'quantity', 'price']
+    readonly_fields = fields
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+# Archived history is read-only; rows are moved here by `manage.py archive_history`.
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['id', 'product', 'user', 'quantity', 'total_price', 'status', 'date_ordered', 'archived_at']
+    list_filter = ['status', 'date_ordered', ('product', AutocompleteFilter), ('user', AutocompleteFilter)]
+    list_select_related = ['product', 'user']
+    search_fields = ['=user__username', '^phone', '^product__name']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedSale)
+class ArchivedSaleAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['id', 'customer', 'user', 'total_amount', 'date', 'archived_at']
+    list_filter = ['date']
+    list_select_related = ['customer', 'user']
+    search_fields = ['customer__name']
+    inlines = [ArchivedSaleItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
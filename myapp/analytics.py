@@ -0,0 +1,198 @@
+"""
+Sales analytics (``GET /api/analytics/``).
+
+A report covers POS sale lines and online orders (not cancelled), live and
+archived.  Each of those tables is aggregated by the database with one grouped
+query (``Trunc*`` for periods, ``GROUP BY`` product/category/customer); only
+the per-group results are combined here, so the work in Python is bounded by
+the number of groups, not rows.  Results are cached per query shape for
+``ANALYTICS_CACHE_SECONDS``.
+"""
+
+from datetime import datetime, time, timedelta
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .archive import across_history
+from .models import Order, Sale, SaleItem
+
+PERIODS = {'day': TruncDate, 'week': TruncWeek, 'month': TruncMonth}
+GROUPS = (*PERIODS, 'category', 'product')
+REPORTS = ('revenue', 'baskets', 'customers')
+SOURCES = ('all', 'sales', 'orders')
+MAX_TOP = 100
+
+
+def parse_params(params):
+    """Validated, normalised report parameters (also the cache key)."""
+    report = params.get('report', 'revenue')
+    if report not in REPORTS:
+        raise ValidationError({'report': f"Expected one of: {', '.join(REPORTS)}."})
+    group = params.get('group', 'day')
+    if group not in GROUPS:
+        raise ValidationError({'group': f"Expected one of: {', '.join(GROUPS)}."})
+    source = params.get('source', 'all')
+    if source not in SOURCES:
+        raise ValidationError({'source': f"Expected one of: {', '.join(SOURCES)}."})
+
+    today = timezone.localdate()
+    end = _date_param(params, 'end', today)
+    start = _date_param(params, 'start', end - timedelta(days=29))
+    if start > end:
+        raise ValidationError({'start': 'start must not be after end.'})
+    try:
+        top = int(params.get('top', 10))
+    except ValueError:
+        raise ValidationError({'top': 'Expected a whole number.'})
+    return {
+        'report': report, 'group': group, 'source': source,
+        'start': start.isoformat(), 'end': end.isoformat(), 'top': max(1, min(top, MAX_TOP)),
+    }
+
+
+def _date_param(params, name, default):
+    value = params.get(name)
+    if not value:
+        return default
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValidationError({name: 'Expected a date (YYYY-MM-DD).'})
+    return parsed
+
+
+def run_report(params):
+    """The report for ``parse_params`` output, from the cache when possible."""
+    key = 'analytics:' + hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    result = cache.get(key)
+    if result is None:
+        result = dict(params, **REPORT_FUNCTIONS[params['report']](params))
+        cache.set(key, result, settings.ANALYTICS_CACHE_SECONDS)
+    return result
+
+
+def date_range(params):
+    tz = timezone.get_current_timezone()
+    start = datetime.combine(datetime.fromisoformat(params['start']), time.min, tzinfo=tz)
+    end = datetime.combine(datetime.fromisoformat(params['end']) + timedelta(days=1), time.min, tzinfo=tz)
+    return start, end
+
+
+def line_sources(params):
+    """``(queryset, date field, revenue expression)`` for each table of sold lines in range."""
+    start, end = date_range(params)
+    money = DecimalField(max_digits=14, decimal_places=2)
+    sources = []
+    if params['source'] in ('all', 'sales'):
+        sources += [
+            (items.filter(sale__date__gte=start, sale__date__lt=end), 'sale__date',
+             ExpressionWrapper(F('price') * F('quantity'), output_field=money))
+            for items in across_history(SaleItem, lambda items: items)
+        ]
+    if params['source'] in ('all', 'orders'):
+        sources += [
+            (orders.filter(date_ordered__gte=start, date_ordered__lt=end).exclude(status='Cancelled'), 'date_ordered',
+             F('total_price'))
+            for orders in across_history(Order, lambda orders: orders)
+        ]
+    return sources
+
+
+def merge(groups, rows, key, totals):
+    """Add grouped ``rows`` from one table into ``groups``, summing the ``totals`` fields."""
+    for row in rows:
+        merged = groups.get(row[key])
+        if merged is None:
+            groups[row[key]] = dict(row)
+        else:
+            for field in totals:
+                merged[field] = (merged[field] or 0) + (row[field] or 0)
+
+
+def revenue_report(params):
+    group = params['group']
+    groups = {}
+    for queryset, date_field, revenue in line_sources(params):
+        if group in PERIODS:
+            queryset = queryset.annotate(key=PERIODS[group](date_field)).values('key')
+        elif group == 'category':
+            queryset = queryset.values(key=F('product__category_id'), name=F('product__category__name'))
+        else:
+            queryset = queryset.values(key=F('product_id'), name=F('product__name'))
+        rows = queryset.annotate(revenue=Sum(revenue), units=Sum('quantity'), lines=Count('pk')).order_by()
+        merge(groups, rows, 'key', ('revenue', 'units', 'lines'))
+
+    rows = list(groups.values())
+    if group in PERIODS:
+        rows.sort(key=lambda row: row['key'])
+    else:
+        rows.sort(key=lambda row: (-(row['revenue'] or 0), row['key'] or 0))
+        rows = rows[:params['top']]
+    total = sum(row['revenue'] or 0 for row in groups.values())
+    for row in rows:
+        key = row.pop('key')
+        if group in PERIODS:
+            # TruncWeek/TruncMonth give midnight datetimes, TruncDate a date.
+            row['period'] = (key.date() if isinstance(key, datetime) else key).isoformat()
+        else:
+            row['id'] = key
+        row['revenue'] = float(row['revenue'] or 0)
+        row['share'] = round(row['revenue'] / float(total), 4) if total else 0
+    return {'total_revenue': float(total), 'rows': rows}
+
+
+def basket_report(params):
+    """Baskets are POS sales and online orders; average units and value per basket."""
+    summary = {}
+    for queryset, date_field, revenue in line_sources(params):
+        kind = 'sales' if date_field == 'sale__date' else 'orders'
+        basket = 'sale_id' if kind == 'sales' else 'pk'
+        row = queryset.aggregate(baskets=Count(basket, distinct=True), units=Sum('quantity'), revenue=Sum(revenue))
+        merge(summary, [dict(row, kind=kind)], 'kind', ('baskets', 'units', 'revenue'))
+    for row in summary.values():
+        baskets = row['baskets'] or 0
+        row['revenue'] = float(row['revenue'] or 0)
+        row['units'] = row['units'] or 0
+        row['avg_units'] = round(row['units'] / baskets, 2) if baskets else 0
+        row['avg_value'] = round(row['revenue'] / baskets, 2) if baskets else 0
+    return {'rows': [summary[kind] for kind in ('sales', 'orders') if kind in summary]}
+
+
+def customer_report(params):
+    """Repeat rate: share of customers with two or more purchases in the range."""
+    start, end = date_range(params)
+    channels = []
+    if params['source'] in ('all', 'orders'):
+        channels.append(('orders', across_history(Order, lambda orders: (
+            orders.filter(date_ordered__gte=start, date_ordered__lt=end).exclude(status='Cancelled')
+            .values(customer=F('user_id')).annotate(purchases=Count('pk')).order_by()
+        ))))
+    if params['source'] in ('all', 'sales'):
+        channels.append(('sales', across_history(Sale, lambda sales: (
+            sales.filter(date__gte=start, date__lt=end, customer__isnull=False)
+            .values(customer=F('customer_id')).annotate(purchases=Count('pk')).order_by()
+        ))))
+
+    rows = []
+    for kind, querysets in channels:
+        customers = {}
+        for queryset in querysets:
+            merge(customers, queryset, 'customer', ('purchases',))
+        repeat = sum(1 for row in customers.values() if row['purchases'] >= 2)
+        rows.append({
+            'kind': kind,
+            'customers': len(customers),
+            'repeat_customers': repeat,
+            'repeat_rate': round(repeat / len(customers), 4) if customers else 0,
+        })
+    return {'rows': rows}
+
+
+REPORT_FUNCTIONS = {'revenue': revenue_report, 'baskets': basket_report, 'customers': customer_report}
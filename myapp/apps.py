@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class ClothingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapp'
-    verbose_name = 'My App Management'
\ No newline at end of file
+    verbose_name = 'My App Management'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,128 @@
+"""
+Archival of closed history.
+
+``archive_orders`` moves Delivered/Cancelled orders that closed before a cutoff
+into ``ArchivedOrder``; ``archive_sales`` moves older sales with their items
+into ``ArchivedSale``/``ArchivedSaleItem``.  Both work in batches of
+``batch_size`` rows, one transaction each, so the live tables only hold recent
+and open work and locks stay short.  Rows keep their ids.
+
+Archived orders keep their ``updated_at``, so order lists and delta sync read
+both tables and archiving writes no tombstones.  Reports that span all
+history combine the tables through ``across_history`` and the helpers below.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedSale, ArchivedSaleItem, Order, Sale, SaleItem
+
+CLOSED_STATUSES = ('Delivered', 'Cancelled')
+
+ARCHIVES = {Order: ArchivedOrder, Sale: ArchivedSale, SaleItem: ArchivedSaleItem}
+
+ORDER_FIELDS = [
+    'id', 'product_id', 'user_id', 'quantity', 'total_price', 'date_ordered', 'address', 'phone', 'status', 'updated_at',
+]
+SALE_FIELDS = ['id', 'user_id', 'customer_id', 'date', 'total_amount']
+SALE_ITEM_FIELDS = ['id', 'sale_id', 'product_id', 'quantity', 'price']
+
+_archiving = ContextVar('archiving', default=False)
+
+
+@contextmanager
+def archiving():
+    """Deletes inside this block are moves to the archive, not deletions."""
+    token = _archiving.set(True)
+    try:
+        yield
+    finally:
+        _archiving.reset(token)
+
+
+def is_archiving():
+    return _archiving.get()
+
+
+def cutoff(days):
+    return timezone.now() - timedelta(days=days)
+
+
+def archive_orders(before, batch_size=1000):
+    """Move orders closed before ``before``; returns how many were moved."""
+    closed = Order.objects.filter(status__in=CLOSED_STATUSES, updated_at__lt=before).order_by('pk')
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(closed.select_for_update().values(*ORDER_FIELDS)[:batch_size])
+            if not rows:
+                return moved
+            now = timezone.now()
+            ArchivedOrder.objects.bulk_create(ArchivedOrder(archived_at=now, **row) for row in rows)
+            with archiving():
+                Order.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        moved += len(rows)
+
+
+def archive_sales(before, batch_size=1000):
+    """Move sales dated before ``before``, with their items; returns how many sales were moved."""
+    old = Sale.objects.filter(date__lt=before).order_by('pk')
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(old.select_for_update().values(*SALE_FIELDS)[:batch_size])
+            if not rows:
+                return moved
+            ids = [row['id'] for row in rows]
+            now = timezone.now()
+            ArchivedSale.objects.bulk_create(ArchivedSale(archived_at=now, **row) for row in rows)
+            ArchivedSaleItem.objects.bulk_create(
+                ArchivedSaleItem(**item) for item in SaleItem.objects.filter(sale_id__in=ids).values(*SALE_ITEM_FIELDS)
+            )
+            with archiving():
+                SaleItem.objects.filter(sale_id__in=ids).delete()
+                Sale.objects.filter(pk__in=ids).delete()
+        moved += len(rows)
+
+
+def across_history(model, build):
+    """``[build(live queryset), build(archive queryset)]`` for ``Order``, ``Sale`` or ``SaleItem``."""
+    return [build(model._default_manager.all()), build(ARCHIVES[model]._default_manager.all())]
+
+
+def count_across(model, **filters):
+    return sum(across_history(model, lambda queryset: queryset.filter(**filters).count()))
+
+
+def sum_across(model, field, **filters):
+    totals = across_history(model, lambda queryset: queryset.filter(**filters).aggregate(total=Sum(field))['total'])
+    return sum(total for total in totals if total is not None)
+
+
+def daily_sales(start):
+    """``{date: total_amount}`` of sales since ``start`` (a date), live and archived."""
+    totals = {}
+    for rows in across_history(Sale, lambda queryset: (
+        queryset.filter(date__date__gte=start).annotate(day=TruncDate('date'))
+        .values('day').annotate(total=Sum('total_amount')).order_by().values_list('day', 'total')
+    )):
+        for day, total in rows:
+            totals[day] = totals.get(day, 0) + total
+    return totals
+
+
+def order_status_counts(**filters):
+    """``{status: count}`` of orders matching ``filters``, live and archived."""
+    counts = {}
+    for rows in across_history(Order, lambda queryset: (
+        queryset.filter(**filters).values('status').annotate(count=Count('pk')).order_by().values_list('status', 'count')
+    )):
+        for status, count in rows:
+            counts[status] = counts.get(status, 0) + count
+    return counts
@@ -0,0 +1,120 @@
+"""
+Cached user lookup for authenticated requests.
+
+JWT and session requests normally load the ``User`` row on every request.
+``CachedJWTAuthentication`` and ``CachedModelBackend`` read it from the cache
+instead, for ``AUTH_USER_CACHE_SECONDS``; saving or deleting a user drops the
+entry (see ``signals.py``), so password, ``is_active`` and ``is_staff`` changes
+apply on the next request in this process and within the TTL everywhere else
+when the cache is not shared, which is why ``AUTH_USER_CACHE_SECONDS``
+defaults to 0 without ``REDIS_URL``.
+
+``CachedModelBackend.authenticate`` also accepts an email address in place of
+the username and finds the account with one query; ``aauthenticate`` does the
+same for async views, hashing off the event loop.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .hashers import acheck_user_password, amake_password
+
+
+def user_cache_key(pk):
+    return f'auth:user:{pk}'
+
+
+def get_cached_user(pk):
+    """The user with primary key ``pk`` (or None), cached for ``AUTH_USER_CACHE_SECONDS``."""
+    UserModel = get_user_model()
+    if not settings.AUTH_USER_CACHE_SECONDS:
+        return UserModel._default_manager.filter(pk=pk).first()
+    key = user_cache_key(pk)
+    user = cache.get(key)
+    if user is None:
+        user = UserModel._default_manager.filter(pk=pk).first()
+        if user is not None:
+            cache.set(key, user, settings.AUTH_USER_CACHE_SECONDS)
+    return user
+
+
+def forget_user(pk):
+    cache.delete(user_cache_key(pk))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_FIELD not in ('id', 'pk'):
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+
+class CachedModelBackend(ModelBackend):
+    def candidates(self, username):
+        """Up to two users whose username (or email, for an address) matches ``username``."""
+        UserModel = get_user_model()
+        lookup = Q(**{UserModel.USERNAME_FIELD: username})
+        if '@' in username:
+            lookup |= Q(email__iexact=username)
+        return UserModel._default_manager.filter(lookup).order_by('pk')[:2]
+
+    def pick(self, candidates, username):
+        # An exact username match wins over an email match.
+        return sorted(candidates, key=lambda candidate: candidate.get_username() != username)[0] if candidates else None
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if not username or password is None:
+            return None
+
+        user = self.pick(list(self.candidates(username)), username)
+        if user is None:
+            # Hash anyway so response time does not reveal whether the account exists.
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if not username or password is None:
+            return None
+
+        user = self.pick([candidate async for candidate in self.candidates(username)], username)
+        if user is None:
+            await amake_password(password)
+            return None
+        if await acheck_user_password(user, password) and self.user_can_authenticate(user):
+            user.backend = f'{type(self).__module__}.{type(self).__qualname__}'
+            return user
+        return None
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,431 @@
+"""
+Micro-benchmarks run through ``python manage.py benchmark``.
+
+Each suite is a function ``(size, repeat) -> list of (label, value, unit)``
+registered with ``@suite('name')``.  Suites build their own synthetic data
+so they can run against an empty database.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+import time
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import Category, Order, Product
+from .renderers import FastJSONRenderer
+from .serializers import ProductSerializer
+
+SUITES = {}
+
+
+def suite(name):
+    def register(func):
+        SUITES[name] = func
+        return func
+    return register
+
+
+def best_of(func, repeat):
+    """Return the fastest of ``repeat`` runs of ``func`` in seconds."""
+    best = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def synthetic_products(size):
+    """Unsaved products with categories and timestamps, as the list endpoint sees them."""
+    categories = [Category(id=i + 1, name=f'Category {i + 1}') for i in range(10)]
+    now = timezone.now()
+    return [
+        Product(
+            id=i + 1,
+            name=f'Product {i + 1}',
+            category=categories[i % len(categories)],
+            price=Decimal('1000.00') + i,
+            quantity=i % 60,
+            created_at=now - timedelta(minutes=i),
+            updated_at=now,
+        )
+        for i in range(size)
+    ]
+
+
+def synthetic_orders(size, products):
+    users = [User(id=i + 1, username=f'customer{i + 1}') for i in range(50)]
+    now = timezone.now()
+    return [
+        Order(
+            id=i + 1,
+            product=products[i % len(products)],
+            user=users[i % len(users)],
+            quantity=1 + i % 3,
+            total_price=products[i % len(products)].price * (1 + i % 3),
+            date_ordered=now - timedelta(minutes=i),
+            phone='0712345678',
+            address='Kariakoo, Dar es Salaam',
+            status=Order.STATUS_CHOICES[i % len(Order.STATUS_CHOICES)][0],
+        )
+        for i in range(size)
+    ]
+
+
+@suite('render')
+def bench_render(size, repeat):
+    from .views import staff_order_data
+
+    products = synthetic_products(size)
+    payloads = {
+        'products': ProductSerializer(products, many=True).data,
+        'orders': [staff_order_data(order) for order in synthetic_orders(size, products)],
+    }
+
+    results = []
+    for name, data in payloads.items():
+        baseline = best_of(lambda: JSONRenderer().render(data), repeat)
+        fast = best_of(lambda: FastJSONRenderer().render(data), repeat)
+        results += [
+            (f'{name}: JSONRenderer', baseline * 1000, 'ms'),
+            (f'{name}: FastJSONRenderer', fast * 1000, 'ms'),
+            (f'{name}: speed-up', baseline / fast if fast else 0, 'x'),
+        ]
+    return results
+
+
+@suite('compression')
+def bench_compression(size, repeat):
+    import gzip
+    from .views import staff_order_data
+
+    try:
+        import brotli
+    except ImportError:  # pragma: no cover
+        brotli = None
+
+    products = synthetic_products(size)
+    renderer = FastJSONRenderer()
+    payloads = {
+        'products': renderer.render(ProductSerializer(products, many=True).data),
+        'orders': renderer.render([staff_order_data(order) for order in synthetic_orders(size, products)]),
+    }
+
+    results = []
+    for name, body in payloads.items():
+        gzipped = gzip.compress(body, compresslevel=6)
+        results += [
+            (f'{name}: raw', len(body) / 1024, 'KiB'),
+            (f'{name}: gzip-6', len(gzipped) / 1024, 'KiB'),
+            (f'{name}: gzip-6 time', best_of(lambda: gzip.compress(body, compresslevel=6), repeat) * 1000, 'ms'),
+        ]
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=5)
+            results += [
+                (f'{name}: br-5', len(compressed) / 1024, 'KiB'),
+                (f'{name}: br-5 time', best_of(lambda: brotli.compress(body, quality=5), repeat) * 1000, 'ms'),
+            ]
+    return results
+
+
+@suite('forecast')
+def bench_forecast(size, repeat):
+    from .forecasting import compute_forecasts, np
+
+    if np is None:
+        return [('numpy not installed', 0, '')]
+
+    days = 730
+    rng = np.random.default_rng(0)
+    demand = rng.poisson(2.0, size=(size, days)).astype(np.float32)
+    on_hand = rng.integers(0, 200, size=size)
+
+    def per_product():
+        # Reference: the same forecast written as a Python loop per product.
+        for row, stock in zip(demand.tolist(), on_hand.tolist()):
+            level = row[0]
+            for value in row[1:]:
+                level = 0.3 * value + 0.7 * level
+            recent = row[-28:]
+            mean = sum(recent) / len(recent)
+            std = (sum((value - mean) ** 2 for value in recent) / len(recent)) ** 0.5
+            max(0, level * 21 + 1.65 * std * 7 ** 0.5 - stock)
+
+    vectorised = best_of(lambda: compute_forecasts(demand, on_hand), repeat)
+    loop = best_of(per_product, repeat)
+    return [
+        (f'{size} products x {days} days: per-product loop', loop * 1000, 'ms'),
+        (f'{size} products x {days} days: vectorised', vectorised * 1000, 'ms'),
+        ('speed-up', loop / vectorised if vectorised else 0, 'x'),
+    ]
+
+
+@suite('recommendations')
+def bench_recommendations(size, repeat):
+    from collections import Counter
+    from itertools import permutations
+    from .recommendations import cooccurrence, np
+
+    if np is None:
+        return [('numpy not installed', 0, '')]
+
+    # ``size`` baskets of 1-6 items drawn from a 2000-product catalogue.
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(1, 7, size=size)
+    basket_ids = np.repeat(np.arange(size), lengths)
+    items = rng.integers(0, 2000, size=len(basket_ids))
+    pairs = np.unique(np.column_stack([basket_ids, items]), axis=0)
+    basket_ids, items = pairs[:, 0], pairs[:, 1]
+
+    def per_basket():
+        counts, basket = Counter(), {}
+        for basket_id, item in zip(basket_ids.tolist(), items.tolist()):
+            basket.setdefault(basket_id, []).append(item)
+        for members in basket.values():
+            counts.update(permutations(members, 2))
+
+    vectorised = best_of(lambda: cooccurrence(basket_ids, items, 2000), repeat)
+    loop = best_of(per_basket, repeat)
+    return [
+        (f'{size} baskets: per-basket loop', loop * 1000, 'ms'),
+        (f'{size} baskets: vectorised', vectorised * 1000, 'ms'),
+        ('speed-up', loop / vectorised if vectorised else 0, 'x'),
+    ]
+
+
+@suite('admin')
+def bench_admin(size, repeat):
+    """Changelist pages before and after the admin tuning, on synthetic rows that are rolled back."""
+    from django.contrib import admin
+    from django.db import transaction
+    from django.test import RequestFactory
+    from .models import Customer, Sale, SaleItem
+
+    class LegacyOrderAdmin(admin.ModelAdmin):
+        list_display = ['id', 'product', 'user', 'phone', 'quantity', 'total_price', 'status', 'date_ordered']
+        list_filter = ['status', 'date_ordered']
+        search_fields = ['user__username', 'phone', 'product__name']
+        list_editable = ['status']
+
+    class LegacySaleItemAdmin(admin.ModelAdmin):
+        list_display = ['id', 'sale', 'product', 'quantity', 'price']
+        list_filter = ['sale', 'product']
+        search_fields = ['product__name']
+
+    class LegacyCustomerAdmin(admin.ModelAdmin):
+        list_display = ['id', 'name', 'phone', 'address', 'created_at']
+        search_fields = ['name', 'phone']
+
+    pages = [
+        ('orders', Order, LegacyOrderAdmin, {}),
+        ('orders search', Order, LegacyOrderAdmin, {'q': 'benchmark-customer7'}),
+        ('sale items', SaleItem, LegacySaleItemAdmin, {}),
+        ('customers', Customer, LegacyCustomerAdmin, {}),
+    ]
+    staff = User(username='benchmark', is_staff=True, is_superuser=True, is_active=True)
+
+    def render(model_admin, params):
+        request = RequestFactory().get('/', params)
+        request.user = staff
+        model_admin.changelist_view(request).render()
+
+    results = []
+    with transaction.atomic():
+        categories = Category.objects.bulk_create(Category(name=f'Benchmark category {i}') for i in range(10))
+        products = synthetic_products(size)
+        for product in products:
+            product.id, product.category = None, categories[product.category.id - 1]
+        products = Product.objects.bulk_create(products)
+        users = User.objects.bulk_create(User(username=f'benchmark-customer{i}') for i in range(size // 10 or 1))
+        orders = synthetic_orders(size, products)
+        for order in orders:
+            order.id, order.user = None, users[order.id % len(users)]
+        Order.objects.bulk_create(orders)
+        customers = Customer.objects.bulk_create(Customer(name=f'Customer {i}', phone=f'07{i:08d}') for i in range(size))
+        sales = Sale.objects.bulk_create(Sale(user=users[i % len(users)], customer=customers[i]) for i in range(size))
+        SaleItem.objects.bulk_create(
+            SaleItem(sale=sales[i], product=products[i], quantity=1, price=products[i].price) for i in range(size)
+        )
+
+        for label, model, legacy, params in pages:
+            before = best_of(lambda: render(legacy(model, admin.site), params), repeat)
+            after = best_of(lambda: render(admin.site._registry[model], params), repeat)
+            results += [
+                (f'{label}: before', before * 1000, 'ms'),
+                (f'{label}: after', after * 1000, 'ms'),
+                (f'{label}: speed-up', before / after if after else 0, 'x'),
+            ]
+        transaction.set_rollback(True)
+    return results
+
+
+@suite('auth')
+def bench_auth(size, repeat):
+    """Per-request user lookup for JWT and session requests, with and without the user cache."""
+    from django.contrib.auth.backends import ModelBackend
+    from django.db import transaction
+    from django.test import RequestFactory
+    from rest_framework.request import Request
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.tokens import AccessToken
+    from .authentication import CachedJWTAuthentication, CachedModelBackend, forget_user
+
+    results = []
+    with transaction.atomic():
+        user = User.objects.create_user(username='benchmark-auth')
+        request = Request(RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'))
+        checks = [
+            ('JWT', lambda: JWTAuthentication().authenticate(request), lambda: CachedJWTAuthentication().authenticate(request)),
+            ('session', lambda: ModelBackend().get_user(user.pk), lambda: CachedModelBackend().get_user(user.pk)),
+        ]
+        for label, uncached, cached in checks:
+            cached()  # warm the cache
+            before = best_of(lambda: [uncached() for _ in range(size)], repeat) / size
+            after = best_of(lambda: [cached() for _ in range(size)], repeat) / size
+            results += [
+                (f'{label}: database lookup', before * 1e6, 'us/request'),
+                (f'{label}: cached lookup', after * 1e6, 'us/request'),
+                (f'{label}: speed-up', before / after if after else 0, 'x'),
+            ]
+        transaction.set_rollback(True)
+    forget_user(user.pk)
+    return results
+
+
+@suite('throttle')
+def bench_throttle(size, repeat):
+    """Cost of one throttle check: DRF's history-list throttle against the token buckets."""
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.test import RequestFactory
+    from rest_framework.request import Request
+    from rest_framework.throttling import AnonRateThrottle
+    from . import throttling
+
+    request = Request(RequestFactory().get('/'))
+    rate = f'{size}/min'  # no check is refused, so every call does the full update
+
+    class HistoryThrottle(AnonRateThrottle):
+        pass
+
+    class BucketThrottle(throttling.PerIPThrottle):
+        scope = 'benchmark'
+
+    HistoryThrottle.rate = BucketThrottle.rate = rate
+    stores = [('token bucket, memory', throttling.MemoryBucketStore)]
+    if settings.CACHES['default']['BACKEND'].endswith('RedisCache'):
+        stores.append(('token bucket, redis', throttling.RedisBucketStore))
+
+    def run(throttle, store=None):
+        # Start from a full bucket / empty history each time.
+        cache.delete(throttle.get_cache_key(request, None))
+        if store is not None:
+            throttling._store = store()
+        for _ in range(size):
+            throttle.allow_request(request, None)
+
+    results = []
+    history = best_of(lambda: run(HistoryThrottle()), repeat) / size
+    results.append(('DRF history list (cache)', history * 1e6, 'us/check'))
+    try:
+        for label, store in stores:
+            bucket = best_of(lambda: run(BucketThrottle(), store), repeat) / size
+            results += [(label, bucket * 1e6, 'us/check'), (f'{label}: speed-up', history / bucket if bucket else 0, 'x')]
+    finally:
+        throttling._store = None
+    return results
+
+
+@suite('snapshot')
+def bench_snapshot(size, repeat):
+    """Orders history as the JSON API returns it versus columnar snapshots, on rolled-back rows."""
+    import io
+    import json
+    from django.core.serializers.json import DjangoJSONEncoder
+    from django.db import transaction
+    from . import snapshots
+    from .views import order_history, staff_order_data
+
+    results = []
+    with transaction.atomic():
+        products = synthetic_products(100)
+        for product in products:
+            product.id, product.category = None, None
+        products = Product.objects.bulk_create(products)
+        users = User.objects.bulk_create(User(username=f'benchmark-customer{i}') for i in range(50))
+        orders = synthetic_orders(size, products)
+        for order in orders:
+            order.id, order.user = None, users[order.id % len(users)]
+        Order.objects.bulk_create(orders)
+
+        def api():
+            return json.dumps([staff_order_data(order) for order in order_history()], cls=DjangoJSONEncoder).encode()
+
+        def snapshot(fmt, since=None):
+            sink = io.BytesIO()
+            snapshots.write_snapshot('orders', sink, fmt, since=since)
+            return sink.getvalue()
+
+        results += [
+            (f'{size} orders: JSON API', best_of(api, repeat) * 1000, 'ms'),
+            (f'{size} orders: JSON API size', len(api()) / 1024, 'KB'),
+        ]
+        for fmt in snapshots.available_formats():
+            results += [
+                (f'{size} orders: {fmt} snapshot', best_of(lambda: snapshot(fmt), repeat) * 1000, 'ms'),
+                (f'{size} orders: {fmt} size', len(snapshot(fmt)) / 1024, 'KB'),
+            ]
+        token = snapshots.DATASETS['orders'].next_token()
+        results.append(('incremental, nothing changed', best_of(lambda: snapshot('csv', token), repeat) * 1000, 'ms'))
+        transaction.set_rollback(True)
+    return results
+
+
+@suite('coalescing')
+def bench_coalescing(size, repeat):
+    import threading
+    from django.test import override_settings
+    from rest_framework.request import Request
+    from rest_framework.response import Response
+    from rest_framework.test import APIRequestFactory
+    from .coalescing import coalesce
+
+    # A burst of identical requests against a CPU-bound handler (serialization
+    # holds the GIL), as a cold product list or dashboard sees under load.
+    burst = min(max(size, 2), 100)
+    computed = []
+
+    @coalesce('benchmark')
+    def handler(request):
+        computed.append(1)
+        return Response({'total': sum(i * i for i in range(200000))})
+
+    def run():
+        barrier = threading.Barrier(burst)
+
+        def client():
+            request = Request(APIRequestFactory().get('/api/products/'))
+            barrier.wait()
+            handler(request)
+
+        threads = [threading.Thread(target=client) for _ in range(burst)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    results = []
+    for enabled in (False, True):
+        label = 'coalesced' if enabled else 'uncoalesced'
+        with override_settings(COALESCE_ENABLED=enabled, COALESCE_CROSS_WORKER=False, ALLOWED_HOSTS=['testserver']):
+            computed.clear()
+            elapsed = best_of(run, repeat)
+            results += [
+                (f'{burst} identical requests, {label}', elapsed * 1000, 'ms'),
+                (f'{label}: computations per burst', len(computed) / max(1, repeat), 'runs'),
+            ]
+    return results
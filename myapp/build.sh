@@ -8,5 +8,10 @@ pip install -r requirements.txt
 # Convert static files
 python manage.py collectstatic --no-input
 
+# Precompress the React build (if present) so WhiteNoise serves .br/.gz files
+if [ -d frontend/dist ]; then
+  python -m whitenoise.compress frontend/dist
+fi
+
 # Run database migrations
 python manage.py migrate
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Category tree and its denormalised product counts.
+
+``Category.path`` holds the ids from the root down to the category
+(``"3/17/"``), so a subtree is ``path__startswith`` on an indexed column and
+a category's ancestors are read straight off its path.  ``product_count`` and
+``in_stock_count`` cover the whole subtree, so a category menu with counts is
+a single read of the category table.
+
+The counts are maintained incrementally.  Whatever changes a product's
+category or moves its stock across zero reports it to
+``product_counts_changed``:
+
+* ``Product.save`` and product deletion (``signals.py``);
+* ``inventory.update_quantities``, for stock changes from orders and sales;
+* the bulk importer.
+
+Each report becomes one relative ``UPDATE`` of the affected categories and
+their ancestors.  Moving or deleting a category shifts its subtree's counts
+between ancestors.  ``manage.py rebuild_categories`` recomputes paths and
+counts from scratch should they ever drift.
+"""
+
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Case, CharField, Count, F, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Concat, Substr
+from django.utils import timezone
+
+from .models import Category, Product
+
+MAX_PATH_LENGTH = Category._meta.get_field('path').max_length
+
+
+def ancestor_ids(path):
+    """Ids on ``path``, root first, ending with the category itself."""
+    return [int(part) for part in path.split('/') if part]
+
+
+def subtree(category):
+    return Category.objects.filter(path__startswith=category.path)
+
+
+def assign_root_paths(queryset):
+    """Set the path of categories created in bulk (which skips ``save()``); they are all roots."""
+    queryset.filter(path='').update(path=Concat(Cast('pk', CharField()), Value('/')))
+
+
+def validate_parent(pk, parent_id):
+    """Reject a parent that would put category ``pk`` inside its own subtree."""
+    if parent_id is None:
+        return
+    if parent_id == pk:
+        raise ValidationError({'parent': 'A category cannot be its own parent.'})
+    parent_path = Category.objects.filter(pk=parent_id).values_list('path', flat=True).first()
+    if parent_path is None:
+        return
+    if pk is not None and pk in ancestor_ids(parent_path):
+        raise ValidationError({'parent': 'A category cannot be moved under one of its own subcategories.'})
+    if len(parent_path) + len(str(pk or '')) + 1 > MAX_PATH_LENGTH:
+        raise ValidationError({'parent': 'The category tree is nested too deeply.'})
+
+
+def update_counts(totals):
+    """Add ``{category_id: (products, in_stock)}`` to the stored counts in one statement."""
+    totals = {pk: delta for pk, delta in totals.items() if any(delta)}
+    if not totals:
+        return
+
+    def column(index):
+        return Case(
+            *[When(pk=pk, then=Value(delta[index])) for pk, delta in totals.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    # .update() skips auto_now; delta sync clients rely on updated_at.
+    Category.objects.filter(pk__in=list(totals)).update(
+        product_count=F('product_count') + column(0),
+        in_stock_count=F('in_stock_count') + column(1),
+        updated_at=timezone.now(),
+    )
+
+
+def product_counts_changed(changes):
+    """
+    Apply ``(old_category_id, old_quantity, new_category_id, new_quantity)`` changes.
+
+    A new product has no old category, a deleted one no new category.  The
+    deltas are rolled up to every ancestor of the categories involved.
+    """
+    direct = defaultdict(lambda: [0, 0])
+    for old_category, old_quantity, new_category, new_quantity in changes:
+        if old_category is not None:
+            direct[old_category][0] -= 1
+            direct[old_category][1] -= old_quantity > 0
+        if new_category is not None:
+            direct[new_category][0] += 1
+            direct[new_category][1] += new_quantity > 0
+    direct = {pk: delta for pk, delta in direct.items() if any(delta)}
+    if not direct:
+        return
+
+    totals = defaultdict(lambda: [0, 0])
+    for pk, path in Category.objects.filter(pk__in=list(direct)).values_list('pk', 'path'):
+        products, in_stock = direct[pk]
+        for ancestor in ancestor_ids(path) or [pk]:
+            totals[ancestor][0] += products
+            totals[ancestor][1] += in_stock
+    update_counts(totals)
+
+
+def category_saved(category, adding, old_parent_id):
+    """Give a new category its path, or move a re-parented subtree and its counts."""
+    if not adding and category.parent_id == old_parent_id and category.path:
+        return
+    parent_path = ''
+    if category.parent_id is not None:
+        parent_path = Category.objects.filter(pk=category.parent_id).values_list('path', flat=True).get()
+    new_path = f'{parent_path}{category.pk}/'
+    old_path = Category.objects.filter(pk=category.pk).values_list('path', flat=True).get()
+    if old_path == new_path:
+        category.path = new_path
+        return
+    if not old_path:
+        Category.objects.filter(pk=category.pk).update(path=new_path)
+        category.path = new_path
+        return
+
+    counts = Category.objects.filter(pk=category.pk).values_list('product_count', 'in_stock_count').get()
+    Category.objects.filter(path__startswith=old_path).update(
+        path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+    )
+    category.path = new_path
+    # The subtree's products leave the old ancestors and join the new ones.
+    totals = defaultdict(lambda: [0, 0])
+    for ancestor in ancestor_ids(old_path)[:-1]:
+        totals[ancestor][0] -= counts[0]
+        totals[ancestor][1] -= counts[1]
+    for ancestor in ancestor_ids(new_path)[:-1]:
+        totals[ancestor][0] += counts[0]
+        totals[ancestor][1] += counts[1]
+    update_counts(totals)
+
+
+def category_deleted(category):
+    """Take a deleted category's products (set to no category) off its ancestors' counts."""
+    row = Category.objects.filter(pk=category.pk).values_list('path', 'product_count', 'in_stock_count').first()
+    if row is None:
+        return
+    path, products, in_stock = row
+    update_counts({ancestor: (-products, -in_stock) for ancestor in ancestor_ids(path)[:-1]})
+
+
+def rebuild_tree():
+    """Recompute every path and count from ``parent`` and the products; returns the category count."""
+    parents = dict(Category.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def path_of(pk):
+        chain = []
+        while pk is not None and pk not in paths and pk not in chain:
+            chain.append(pk)
+            pk = parents.get(pk)
+        prefix = paths.get(pk, '')
+        for node in reversed(chain):
+            prefix = paths[node] = f'{prefix}{node}/'
+        return paths[chain[0]] if chain else prefix
+
+    for pk in parents:
+        path_of(pk)
+
+    totals = defaultdict(lambda: [0, 0])
+    direct = (
+        Product.objects.filter(category__isnull=False).order_by().values_list('category_id')
+        .annotate(products=Count('pk'), in_stock=Count('pk', filter=Q(quantity__gt=0)))
+    )
+    for category_id, products, in_stock in direct:
+        for ancestor in ancestor_ids(paths[category_id]):
+            totals[ancestor][0] += products
+            totals[ancestor][1] += in_stock
+
+    categories = [
+        Category(pk=pk, path=paths[pk], product_count=totals[pk][0], in_stock_count=totals[pk][1])
+        for pk in parents
+    ]
+    Category.objects.bulk_update(categories, ['path', 'product_count', 'in_stock_count'], batch_size=500)
+    return len(categories)
@@ -0,0 +1,189 @@
+"""
+Request coalescing ("single flight") for expensive idempotent GET handlers.
+
+When many identical requests arrive together, e.g. everyone reloading
+``/api/products/`` when a promotion goes out, only one of them runs the
+queries and serialization; the others wait for it and answer with its data.
+
+* Within a worker process, identical requests that overlap wait on the first
+  one's in-flight computation (threaded or ASGI workers).
+* With ``COALESCE_CROSS_WORKER`` and a shared cache (Redis), the computing
+  worker holds a short lock in the cache and publishes its result there for
+  ``COALESCE_RESULT_SECONDS``; requests in other workers wait for that result
+  instead of computing it again.
+
+Requests are identical when they hit the same handler with the same host,
+path and query string; permissions are checked before the handler runs, so
+only requests allowed to see the data can share it.  Only 200 responses are
+shared.  A waiter that times out, or whose leader failed, computes the
+response itself, so coalescing can delay a request by at most
+``COALESCE_WAIT_SECONDS`` but never fails one.
+
+Per-handler counts of requests that ``computed``, were ``coalesced`` in
+process, were served another worker's result (``shared``) or had to
+``fallback`` to computing are kept in the cache (``coalescing_stats``,
+``GET /api/metrics/coalescing/``).
+"""
+
+import functools
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+EVENTS = ('computed', 'coalesced', 'shared', 'fallback')
+POLL_SECONDS = 0.025
+
+HANDLERS = set()
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class Flight:
+    """One in-process computation that other threads can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.payload = None
+
+    def finish(self, payload):
+        self.payload = payload
+        self.done.set()
+
+    def wait(self, timeout):
+        self.done.wait(timeout)
+        return self.payload
+
+
+def request_key(name, request):
+    query = '&'.join(sorted(request.GET.urlencode().split('&')))
+    raw = f'{name}|{request.scheme}://{request.get_host()}{request.path}?{query}'
+    return 'coalesce:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def record(name, event):
+    key = f'coalesce:stats:{name}:{event}'
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr(); losing one count is fine.
+            pass
+
+
+def coalescing_stats():
+    keys = {f'coalesce:stats:{name}:{event}': (name, event) for name in HANDLERS for event in EVENTS}
+    counts = cache.get_many(list(keys))
+    stats = {name: dict.fromkeys(EVENTS, 0) for name in sorted(HANDLERS)}
+    for key, value in counts.items():
+        name, event = keys[key]
+        stats[name][event] = value
+    return stats
+
+
+def join(key):
+    """Return ``(flight, leader)``: the in-process flight for ``key`` and whether we started it."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = _flights[key] = Flight()
+        return flight, True
+
+
+def leave(key, flight, payload):
+    with _flights_lock:
+        if _flights.get(key) is flight:
+            del _flights[key]
+    flight.finish(payload)
+
+
+def wait_for_other_worker(key):
+    """
+    Return ``(payload, locked)``: a result another worker computed for ``key``,
+    or None when this worker must compute it, and whether it now holds the lock.
+    """
+    result_key, lock_key = f'{key}:result', f'{key}:lock'
+    payload = cache.get(result_key)
+    if payload is not None:
+        return payload, False
+    if cache.add(lock_key, 1, timeout=settings.COALESCE_WAIT_SECONDS):
+        return None, True
+    deadline = time.monotonic() + settings.COALESCE_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        payload = cache.get(result_key)
+        if payload is not None:
+            return payload, False
+        if cache.add(lock_key, 1, timeout=settings.COALESCE_WAIT_SECONDS):
+            # The other worker finished without a shareable result; take over.
+            return None, True
+    return None, False
+
+
+def publish(key, payload):
+    if payload is not None:
+        cache.set(f'{key}:result', payload, settings.COALESCE_RESULT_SECONDS)
+    cache.delete(f'{key}:lock')
+
+
+def shareable(response):
+    if isinstance(response, Response) and response.status_code == 200 and not response.exception:
+        return {'data': response.data}
+    return None
+
+
+def rebuild(payload, event):
+    response = Response(payload['data'])
+    response['X-Coalesced'] = event
+    return response
+
+
+def coalesce(name):
+    """
+    Let identical concurrent GETs to the decorated handler share one computation.
+
+    Works on view methods ``(self, request, ...)`` and on function views
+    ``(request, ...)`` (place it under ``@api_view`` and the permission
+    decorators, so it only wraps the handler itself).
+    """
+    HANDLERS.add(name)
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            if not settings.COALESCE_ENABLED or request.method != 'GET':
+                return handler(*args, **kwargs)
+
+            key = request_key(name, request)
+            flight, leader = join(key)
+            if not leader:
+                payload = flight.wait(settings.COALESCE_WAIT_SECONDS)
+                if payload is not None:
+                    record(name, 'coalesced')
+                    return rebuild(payload, 'coalesced')
+                record(name, 'fallback')
+                return handler(*args, **kwargs)
+
+            payload, locked = None, False
+            try:
+                if settings.COALESCE_CROSS_WORKER:
+                    payload, locked = wait_for_other_worker(key)
+                    if payload is not None:
+                        record(name, 'shared')
+                        return rebuild(payload, 'shared')
+                response = handler(*args, **kwargs)
+                payload = shareable(response)
+                record(name, 'computed' if locked or not settings.COALESCE_CROSS_WORKER else 'fallback')
+                return response
+            finally:
+                if locked:
+                    publish(key, payload)
+                leave(key, flight, payload)
+        return wrapper
+    return decorator
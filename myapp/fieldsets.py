@@ -0,0 +1,169 @@
+"""
+Sparse fieldsets (``?fields=``) and relation expansion (``?expand=``).
+
+``SparseFieldsetSerializerMixin`` prunes the top-level serializer fields,
+``SparseFieldsetViewMixin`` reads the query parameters and trims the SQL to
+match: ``.only()`` the columns the remaining fields read, ``select_related``
+only the foreign keys they traverse and ``prefetch_related`` only the nested
+lists that are still rendered.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_field_list(value):
+    """Turn ``"id, name,,price"`` into ``{'id', 'name', 'price'}``; None when absent."""
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Drop fields not named in ``context['fields']``.
+
+    Fields listed in ``Meta.expandable_fields`` are only rendered when they
+    appear in ``context['expand']`` (or are named explicitly in ``fields``).
+    Otherwise serializers built without those context keys, e.g. internally
+    by other views, keep their full shape.
+    """
+
+    def is_top_level(self):
+        root = self.root
+        return root is self or (root is self.parent and isinstance(root, serializers.ListSerializer))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_top_level():
+            return fields
+
+        requested = self.context.get('fields')
+        expand = self.context.get('expand') or ()
+        for name in getattr(self.Meta, 'expandable_fields', ()):
+            if name not in expand and not (requested and name in requested):
+                fields.pop(name, None)
+        if requested:
+            for name in list(fields):
+                if name not in requested and name not in expand:
+                    fields.pop(name)
+        return fields
+
+
+class QueryPlan:
+    def __init__(self, model):
+        self.model = model
+        self.only = {model._meta.pk.name}
+        self.select = set()
+        self.prefetch = {}
+        # False when some field reads attributes we cannot map to columns;
+        # the queryset is then left without .only() at this level.
+        self.complete = True
+
+    def add_path(self, path):
+        model, chain = self.model, []
+        parts = path.split('__')
+        for index, part in enumerate(parts):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                self.complete = False
+                return
+            if not field.concrete:
+                self.complete = False
+                return
+            chain.append(field.name)
+            self.only.add('__'.join(chain))
+            if index == len(parts) - 1:
+                return
+            if not (field.many_to_one or field.one_to_one):
+                self.complete = False
+                return
+            self.select.add('__'.join(chain))
+            model = field.related_model
+
+    def add_related(self, name, child):
+        """Load the object behind foreign key ``name`` in the same query, as ``child`` describes."""
+        self.add_path(name)
+        self.select.add(name)
+        self.select.update(f'{name}__{path}' for path in child.select)
+        self.only.update(f'{name}__{path}' for path in child.only)
+        self.prefetch.update({f'{name}__{accessor}': plan for accessor, plan in child.prefetch.items()})
+        if not child.complete:
+            self.complete = False
+
+    def apply(self, queryset):
+        if self.complete:
+            queryset = queryset.select_related(None)
+        if self.select:
+            queryset = queryset.select_related(*sorted(self.select))
+        for accessor, child in self.prefetch.items():
+            queryset = queryset.prefetch_related(
+                Prefetch(accessor, queryset=child.apply(child.model._default_manager.all()))
+            )
+        if self.complete:
+            queryset = queryset.only(*sorted(self.only))
+        return queryset
+
+
+def build_query_plan(serializer, model):
+    """Work out the columns and relations ``serializer`` reads from ``model``."""
+    plan = QueryPlan(model)
+    hints = getattr(getattr(serializer, 'Meta', None), 'field_sources', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.ModelSerializer):
+            relation = model._meta.get_field(field.source)
+            child_plan = build_query_plan(field.child, relation.related_model)
+            child_plan.only.add(relation.field.name)
+            plan.prefetch[field.source] = child_plan
+            continue
+        if isinstance(field, serializers.ModelSerializer) and field.source != '*':
+            try:
+                relation = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                relation = None
+            if relation is not None and relation.concrete and (relation.many_to_one or relation.one_to_one):
+                plan.add_related(field.source, build_query_plan(field, relation.related_model))
+                continue
+        if isinstance(field, serializers.BaseSerializer):
+            plan.complete = False
+            continue
+        sources = hints.get(name)
+        if sources is None:
+            if field.source == '*':
+                plan.complete = False
+                continue
+            sources = ['__'.join(field.source_attrs)]
+        for path in sources:
+            plan.add_path(path)
+    return plan
+
+
+class SparseFieldsetViewMixin:
+    """Wire ``?fields=`` / ``?expand=`` into serializer context and the queryset."""
+
+    def get_sparse_params(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None, None
+        params = request.query_params
+        return parse_field_list(params.get('fields')), parse_field_list(params.get('expand')) or set()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields, expand = self.get_sparse_params()
+        if expand is not None:
+            context['fields'] = fields
+            context['expand'] = expand
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, expand = self.get_sparse_params()
+        if fields or expand:
+            queryset = build_query_plan(self.get_serializer(), queryset.model).apply(queryset)
+        return queryset
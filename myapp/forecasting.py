@@ -0,0 +1,149 @@
+"""
+Demand forecasting and reorder suggestions.
+
+Daily unit demand per product (POS sales plus non-cancelled online orders)
+is grouped by the database, loaded into NumPy arrays and evaluated for a
+whole block of products at once: moving averages, exponential smoothing
+(as one matrix-vector product) and days of cover.  ``run_forecast`` replaces
+the ``ReorderSuggestion`` table with the products that need restocking.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import archive
+from .models import Order, Product, ReorderSuggestion, SaleItem
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("Demand forecasting needs NumPy: pip install numpy")
+
+
+def load_daily_demand(start, end):
+    """Return ``(product_ids, day_dates, units)`` arrays of demand from ``start`` to ``end`` inclusive."""
+    def sales(items):
+        return (
+            items.filter(sale__date__date__gte=start, sale__date__date__lte=end)
+            .annotate(day=TruncDate('sale__date'))
+            .values('product_id', 'day')
+            .annotate(units=Sum('quantity'))
+            .order_by()
+            .values_list('product_id', 'day', 'units')
+        )
+
+    def orders(queryset):
+        return (
+            queryset.filter(date_ordered__date__gte=start, date_ordered__date__lte=end)
+            .exclude(status='Cancelled')
+            .annotate(day=TruncDate('date_ordered'))
+            .values('product_id', 'day')
+            .annotate(units=Sum('quantity'))
+            .order_by()
+            .values_list('product_id', 'day', 'units')
+        )
+
+    # Live and archived history; a product/day split across both simply
+    # appears twice and is summed when the matrix is built.
+    rows = [
+        row
+        for queryset in archive.across_history(SaleItem, sales) + archive.across_history(Order, orders)
+        for row in queryset.iterator()
+    ]
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype='datetime64[D]'), np.empty(0, dtype=np.float32)
+    product_ids, days, units = zip(*rows)
+    return (
+        np.asarray(product_ids, dtype=np.int64),
+        np.asarray(days, dtype='datetime64[D]'),
+        np.asarray(units, dtype=np.float32),
+    )
+
+
+def compute_forecasts(demand, on_hand, alpha=0.3, lead_time=7, cover_days=14, service_z=1.65):
+    """
+    Vectorised forecast for a ``(products, days)`` demand matrix.
+
+    Returns arrays keyed ``avg7``, ``avg28``, ``forecast``, ``cover`` and
+    ``suggested``.  The reorder quantity tops stock up to the forecast
+    demand over ``lead_time + cover_days`` plus a safety stock of
+    ``service_z`` standard deviations of recent daily demand over the lead time.
+    """
+    require_numpy()
+    days = demand.shape[1]
+    recent = demand[:, -28:]
+    avg7 = demand[:, -7:].mean(axis=1)
+    avg28 = recent.mean(axis=1)
+    std28 = recent.std(axis=1)
+
+    # s_t = alpha * x_t + (1 - alpha) * s_{t-1} with s_0 = x_0, unrolled into weights.
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+    weights[0] = (1 - alpha) ** (days - 1)
+    forecast = demand @ weights
+
+    on_hand = on_hand.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(forecast > 0, on_hand / forecast, np.inf)
+
+    target = forecast * (lead_time + cover_days) + service_z * std28 * np.sqrt(lead_time)
+    suggested = np.ceil(np.maximum(target - on_hand, 0)).astype(np.int64)
+    return {'avg7': avg7, 'avg28': avg28, 'forecast': forecast, 'cover': cover, 'suggested': suggested}
+
+
+def run_forecast(history_days=730, chunk_size=20000, **params):
+    """Recompute ``ReorderSuggestion`` for the whole catalogue; returns the number of suggestions."""
+    require_numpy()
+    today = timezone.now().date()
+    start = today - timedelta(days=history_days - 1)
+
+    catalog = list(Product.objects.order_by('pk').values_list('pk', 'quantity').iterator())
+    ids = np.fromiter((row[0] for row in catalog), dtype=np.int64, count=len(catalog))
+    on_hand = np.fromiter((row[1] for row in catalog), dtype=np.int64, count=len(catalog))
+
+    product_ids, days, units = load_daily_demand(start, today)
+    rows = np.searchsorted(ids, product_ids)
+    known = rows < len(ids)
+    known[known] = ids[rows[known]] == product_ids[known]
+    columns = (days - np.datetime64(start, 'D')).astype(np.int64)
+    # Days are truncated in the local time zone, so one can still fall just
+    # outside the UTC window; rows written during the run may be after today.
+    known &= (columns >= 0) & (columns < history_days)
+    rows, columns, units = rows[known], columns[known], units[known]
+    order = np.argsort(rows, kind='stable')
+    rows, columns, units = rows[order], columns[order], units[order]
+
+    now = timezone.now()
+    suggestions = []
+    for lo in range(0, len(ids), chunk_size):
+        hi = min(lo + chunk_size, len(ids))
+        first, last = np.searchsorted(rows, [lo, hi])
+        block = np.zeros((hi - lo, history_days), dtype=np.float32)
+        np.add.at(block, (rows[first:last] - lo, columns[first:last]), units[first:last])
+
+        result = compute_forecasts(block, on_hand[lo:hi], **params)
+        for i in np.flatnonzero(result['suggested'] > 0):
+            cover = result['cover'][i]
+            suggestions.append(ReorderSuggestion(
+                product_id=int(ids[lo + i]),
+                on_hand=int(on_hand[lo + i]),
+                avg_daily_7=float(result['avg7'][i]),
+                avg_daily_28=float(result['avg28'][i]),
+                forecast_daily=float(result['forecast'][i]),
+                days_of_cover=float(cover) if np.isfinite(cover) else None,
+                suggested_quantity=int(result['suggested'][i]),
+                generated_at=now,
+            ))
+
+    with transaction.atomic():
+        ReorderSuggestion.objects.all().delete()
+        ReorderSuggestion.objects.bulk_create(suggestions, batch_size=5000)
+    return len(suggestions)
@@ -0,0 +1,70 @@
+"""
+Password hashing profile.
+
+``PASSWORD_HASHER`` picks PBKDF2 (default) or Argon2 (needs ``argon2-cffi``)
+and the ``PASSWORD_*`` settings set their cost; ``manage.py calibrate_hasher``
+measures this host and prints values to use.  Django verifies old hashes with
+whichever hasher made them and, on the next successful login, re-hashes any
+password whose algorithm or cost differs from the current profile.
+
+Async views should use ``amake_password`` / ``acheck_user_password`` (or
+``CachedModelBackend.aauthenticate``): they hash on a small thread pool
+(``PASSWORD_HASH_THREADS``) so the event loop keeps serving other requests.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, make_password, verify_password
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def hash_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_THREADS, thread_name_prefix='password-hash')
+    return _executor
+
+
+async def run_hasher(func, *args):
+    """Run ``func(*args)`` on the hashing pool."""
+    return await sync_to_async(func, thread_sensitive=False, executor=hash_executor())(*args)
+
+
+async def amake_password(raw_password):
+    return await run_hasher(make_password, raw_password)
+
+
+async def acheck_user_password(user, raw_password):
+    """``user.check_password`` for async views; an outdated hash is replaced and saved."""
+    is_correct, must_update = await run_hasher(verify_password, raw_password, user.password)
+    if is_correct and must_update:
+        user.password = await amake_password(raw_password)
+        await user.asave(update_fields=['password'])
+    return is_correct
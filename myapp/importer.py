@@ -0,0 +1,244 @@
+"""
+Bulk product import (``POST /api/products/import/``, ``manage.py import_products``).
+
+Rows are read one at a time from a CSV or JSON Lines stream (a JSON array is
+also accepted), validated, and upserted by ``sku`` in batches with
+``bulk_create(update_conflicts=True)``.  Category names are resolved through
+one name -> id map.  A bad row is reported and skipped; it never aborts the
+rest of the batch.  If the file itself becomes unreadable part way (bad
+encoding, broken CSV), every row before that point is still imported and the
+result says where reading stopped.  Quantity changes are recorded in the stock
+ledger and the low-stock watchlist like any other stock change.
+"""
+
+import csv
+from decimal import Decimal, InvalidOperation
+import io
+import itertools
+import json
+
+from django.db import transaction
+from django.utils import timezone
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from .categories import assign_root_paths, product_counts_changed
+from .inventory import record_movements, refresh_watchlist
+from .pricing import set_prices
+from .models import Category, Product, StockMovement
+
+MAX_REPORTED_ERRORS = 1000
+# Raised by read_rows when the file cannot be read any further.
+READ_ERRORS = (UnicodeDecodeError, ValueError, csv.Error)
+
+
+def parse_json(data):
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError.
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        # Why reading stopped early, if it did; earlier rows were imported.
+        self.read_error = None
+
+    def add_error(self, line, sku, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line, 'sku': sku, 'error': message})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'read_error': self.read_error,
+        }
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line, dict)`` from a binary stream in ``'csv'`` or ``'json'`` format."""
+    if fmt == 'csv':
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {key.strip().lower(): value for key, value in row.items() if key}
+        text.detach()
+        return
+
+    first = stream.read(1)
+    while first.isspace():
+        first = stream.read(1)
+    if first == b'[':
+        # A JSON array has to be parsed whole; JSON Lines is streamed.
+        for index, item in enumerate(parse_json(first + stream.read()), start=1):
+            yield index, item
+        return
+    lines = itertools.chain([first + stream.readline()], iter(stream.readline, b'')) if first else []
+    for index, line in enumerate(lines, start=1):
+        if line.strip():
+            try:
+                yield index, parse_json(line)
+            except json.JSONDecodeError:
+                yield index, None
+
+
+def clean_row(row):
+    """Validate one input row; returns model field values or raises ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError('Row is not an object.')
+    sku = str(row.get('sku') or '').strip()
+    name = str(row.get('name') or '').strip()
+    if not sku:
+        raise ValueError('sku is required.')
+    if len(sku) > 64:
+        raise ValueError('sku is longer than 64 characters.')
+    if not name:
+        raise ValueError('name is required.')
+    if len(name) > 200:
+        raise ValueError('name is longer than 200 characters.')
+    try:
+        price = Decimal(str(row.get('price')).strip())
+    except (InvalidOperation, TypeError):
+        raise ValueError('price must be a number.')
+    if not price.is_finite() or price < 0 or price.as_tuple().exponent < -2 or abs(price) >= 10 ** 8:
+        raise ValueError('price must be a non-negative amount with at most 2 decimals.')
+    quantity = _non_negative_int(row.get('quantity', 0), 'quantity')
+    threshold = row.get('reorder_threshold')
+    threshold = None if threshold in (None, '') else _non_negative_int(threshold, 'reorder_threshold')
+    category = str(row.get('category') or '').strip()
+    if len(category) > 100:
+        raise ValueError('category is longer than 100 characters.')
+    return {
+        'sku': sku,
+        'name': name,
+        'category': category,
+        'price': price,
+        'quantity': quantity,
+        'reorder_threshold': threshold,
+    }
+
+
+def _non_negative_int(value, field):
+    try:
+        number = int(str(value).strip() or 0)
+    except ValueError:
+        raise ValueError(f'{field} must be a whole number.')
+    if number < 0:
+        raise ValueError(f'{field} cannot be negative.')
+    return number
+
+
+def import_products(rows, batch_size=1000, create_categories=True, user=None):
+    """Upsert ``(line, row)`` pairs in batches and return an ``ImportResult``."""
+    result = ImportResult()
+    categories = {name.lower(): pk for pk, name in Category.objects.values_list('pk', 'name')}
+    batch = {}
+    rows = iter(rows)
+    while True:
+        try:
+            line, row = next(rows)
+        except StopIteration:
+            break
+        except READ_ERRORS as exc:
+            result.read_error = f'Could not read the file after {result.rows} rows: {exc}'
+            break
+        result.rows += 1
+        try:
+            cleaned = clean_row(row)
+        except ValueError as exc:
+            result.add_error(line, (row or {}).get('sku') if isinstance(row, dict) else None, str(exc))
+            continue
+        # A SKU repeated within a batch: the later row wins.
+        batch[cleaned['sku']] = (line, cleaned)
+        if len(batch) >= batch_size:
+            _write_batch(batch, categories, create_categories, user, result)
+            batch = {}
+    if batch:
+        _write_batch(batch, categories, create_categories, user, result)
+    return result
+
+
+def _write_batch(batch, categories, create_categories, user, result):
+    missing = {row['category'] for _, row in batch.values() if row['category'] and row['category'].lower() not in categories}
+    if missing:
+        if create_categories:
+            Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+            assign_root_paths(Category.objects.filter(name__in=missing))
+        categories.update(
+            (name.lower(), pk)
+            for pk, name in Category.objects.filter(name__in=missing).values_list('pk', 'name')
+        )
+
+    now = timezone.now()
+    products = []
+    for line, row in batch.values():
+        category_id = None
+        if row['category']:
+            category_id = categories.get(row['category'].lower())
+            if category_id is None:
+                result.add_error(line, row['sku'], f"Unknown category {row['category']!r}.")
+                continue
+        products.append(Product(
+            sku=row['sku'],
+            name=row['name'],
+            category_id=category_id,
+            price=row['price'],
+            quantity=row['quantity'],
+            reorder_threshold=row['reorder_threshold'],
+            created_at=now,
+            updated_at=now,
+        ))
+    if not products:
+        return
+
+    skus = [product.sku for product in products]
+    with transaction.atomic():
+        before, prices_before = {}, {}
+        for sku, category_id, quantity, price in (
+            Product.objects.select_for_update().filter(sku__in=skus).values_list('sku', 'category_id', 'quantity', 'price')
+        ):
+            before[sku] = (category_id, quantity)
+            prices_before[sku] = price
+        Product.objects.bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=['name', 'category', 'price', 'quantity', 'reorder_threshold', 'updated_at'],
+        )
+        ids = dict(Product.objects.filter(sku__in=skus).values_list('sku', 'pk'))
+
+        movements = []
+        for product in products:
+            pk = ids[product.sku]
+            _, previous = before.get(product.sku, (None, None))
+            if previous is None:
+                delta, kind = product.quantity, StockMovement.RESTOCK
+            else:
+                delta, kind = product.quantity - previous, StockMovement.ADJUSTMENT
+            if delta:
+                movements.append(StockMovement(product_id=pk, kind=kind, quantity=delta, user=user, note='Bulk import', created_at=now))
+        record_movements(movements)
+        product_counts_changed(
+            (*before.get(product.sku, (None, None)), product.category_id, product.quantity)
+            for product in products
+        )
+        set_prices(
+            {ids[product.sku]: product.price for product in products if prices_before.get(product.sku) != product.price},
+            user=user,
+            note='Bulk import',
+        )
+        refresh_watchlist(ids.values())
+
+    result.created += len(products) - len(before)
+    result.updated += len(before)
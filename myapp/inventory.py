@@ -0,0 +1,248 @@
+"""
+Stock ledger helpers.
+
+``Product.quantity`` stays the fast "current stock" column; every change to it
+is also appended to ``StockMovement``.  Code that moves stock should call
+``apply_stock_changes`` (set-based UPDATE + batched ledger INSERT) rather than
+editing ``quantity`` by hand.  ``StockSnapshot`` rows taken by
+``manage.py snapshot_stock`` let ``stock_as_of`` answer historical questions
+from the nearest snapshot instead of replaying the whole ledger.
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import outbox
+from .categories import product_counts_changed
+from .models import LowStockAlert, Product, StockAlertEvent, StockMovement, StockSnapshot
+
+_batch = threading.local()
+
+
+@contextmanager
+def ledger_batch(user=None):
+    """
+    Collect movements recorded inside the block and write them in one INSERT.
+
+    ``user`` is attributed to movements recorded without one (e.g. admin
+    edits that go through ``Product.save``).  Nested blocks join the
+    outermost batch.  Nothing is written if the block raises.
+    """
+    if getattr(_batch, 'pending', None) is not None:
+        yield
+        return
+
+    _batch.pending, _batch.user = [], user
+    try:
+        yield
+        pending = _batch.pending
+    finally:
+        _batch.pending, _batch.user = None, None
+    if pending:
+        write_movements(pending)
+
+
+def write_movements(movements):
+    """Insert ledger rows and their ``stock.changed`` outbox events."""
+    StockMovement.objects.bulk_create(movements)
+    outbox.publish_many(
+        (outbox.STOCK_CHANGED, movement.product_id, {
+            'product': movement.product_id,
+            'kind': movement.kind,
+            'quantity': movement.quantity,
+            'reference_id': movement.reference_id,
+        })
+        for movement in movements
+    )
+
+
+def record_movements(movements):
+    """Append movements to the ledger, or to the open ``ledger_batch``."""
+    movements = list(movements)
+    if not movements:
+        return
+    pending = getattr(_batch, 'pending', None)
+    if pending is None:
+        write_movements(movements)
+        return
+    for movement in movements:
+        if movement.user_id is None and _batch.user is not None:
+            movement.user = _batch.user
+    pending.extend(movements)
+
+
+def update_quantities(changes):
+    """
+    Add ``{product_id: delta}`` to ``Product.quantity`` in one statement.
+
+    A single ``UPDATE ... CASE`` relative to the stored value, so concurrent
+    writers cannot lose updates.  Callers are responsible for checking that
+    no balance goes negative.
+    """
+    changes = {product_id: delta for product_id, delta in changes.items() if delta}
+    if not changes:
+        return
+    delta = Case(
+        *[When(pk=product_id, then=Value(change)) for product_id, change in changes.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    with transaction.atomic():
+        # .update() skips auto_now; delta sync clients rely on updated_at.
+        Product.objects.filter(pk__in=list(changes)).update(quantity=F('quantity') + delta, updated_at=timezone.now())
+        # The rows stay locked until commit, so quantity - delta is the value
+        # this update started from.
+        product_counts_changed(
+            (category_id, quantity - changes[pk], category_id, quantity)
+            for pk, quantity, category_id in Product.objects.filter(pk__in=list(changes), category__isnull=False)
+            .values_list('pk', 'quantity', 'category_id')
+            if (quantity > 0) != (quantity - changes[pk] > 0)
+        )
+    refresh_watchlist(changes)
+
+
+def apply_movements(lines, kind, user=None, note=''):
+    """
+    Apply ledger ``lines`` of ``(product_id, delta, reference_id)``.
+
+    Stock is updated once per product with the aggregated delta, while the
+    ledger keeps one movement per line so each can be traced to its order.
+    """
+    lines = [line for line in lines if line[1]]
+    totals = defaultdict(int)
+    for product_id, delta, _reference_id in lines:
+        totals[product_id] += delta
+    update_quantities(totals)
+
+    now = timezone.now()
+    record_movements(
+        StockMovement(
+            product_id=product_id,
+            kind=kind,
+            quantity=delta,
+            reference_id=reference_id,
+            user=user,
+            note=note,
+            created_at=now,
+        )
+        for product_id, delta, reference_id in lines
+    )
+
+
+def apply_stock_changes(changes, kind, reference_id=None, user=None, note=''):
+    """Apply ``{product_id: delta}`` to stock and log one movement per product."""
+    apply_movements(
+        [(product_id, delta, reference_id) for product_id, delta in changes.items()],
+        kind,
+        user=user,
+        note=note,
+    )
+
+
+def refresh_watchlist(product_ids):
+    """
+    Bring ``LowStockAlert`` up to date for ``product_ids`` only.
+
+    Called whenever those products' stock or thresholds change, so the
+    watchlist never needs a catalogue scan.  Crossings in either direction
+    are appended to ``StockAlertEvent`` for the alert feed.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+
+    default = settings.DEFAULT_REORDER_THRESHOLD
+    rows = Product.objects.filter(pk__in=product_ids).values_list(
+        'pk', 'quantity', 'reorder_threshold', 'category__reorder_threshold',
+    )
+    alerts = LowStockAlert.objects.in_bulk(product_ids)
+    now = timezone.now()
+
+    created, updated, recovered, events = [], [], [], []
+    for pk, quantity, own, from_category in rows:
+        threshold = own if own is not None else from_category if from_category is not None else default
+        alert = alerts.get(pk)
+        if quantity < threshold:
+            if alert is None:
+                created.append(LowStockAlert(product_id=pk, quantity=quantity, threshold=threshold, since=now))
+                events.append(StockAlertEvent(product_id=pk, kind=StockAlertEvent.LOW, quantity=quantity, threshold=threshold, created_at=now))
+            elif (alert.quantity, alert.threshold) != (quantity, threshold):
+                alert.quantity, alert.threshold = quantity, threshold
+                updated.append(alert)
+        elif alert is not None:
+            recovered.append(pk)
+            events.append(StockAlertEvent(product_id=pk, kind=StockAlertEvent.RECOVERED, quantity=quantity, threshold=threshold, created_at=now))
+
+    if created:
+        LowStockAlert.objects.bulk_create(created)
+    if updated:
+        LowStockAlert.objects.bulk_update(updated, ['quantity', 'threshold'])
+    if recovered:
+        LowStockAlert.objects.filter(pk__in=recovered).delete()
+    if events:
+        StockAlertEvent.objects.bulk_create(events)
+
+
+def take_snapshots(taken_at=None):
+    """
+    Write a ``StockSnapshot`` for every product and return how many were taken.
+
+    Each balance is the product's previous snapshot plus the ledger entries
+    recorded since it, computed in one grouped query.
+    """
+    taken_at = taken_at or timezone.now()
+    cursor = StockMovement.objects.aggregate(last=Max('id'))['last'] or 0
+
+    latest = StockSnapshot.objects.filter(product=OuterRef('pk')).order_by('-taken_at', '-id')
+    base = dict(
+        Product.objects
+        .annotate(base_quantity=Coalesce(Subquery(latest.values('quantity')[:1]), 0))
+        .values_list('pk', 'base_quantity')
+    )
+    if not base:
+        return 0
+
+    previous = StockSnapshot.objects.filter(product=OuterRef('product')).order_by('-taken_at', '-id')
+    deltas = dict(
+        StockMovement.objects
+        .filter(id__lte=cursor)
+        .filter(id__gt=Coalesce(Subquery(previous.values('last_movement_id')[:1]), 0))
+        .values('product')
+        .annotate(total=Sum('quantity'))
+        .values_list('product', 'total')
+    )
+
+    StockSnapshot.objects.bulk_create(
+        StockSnapshot(
+            product_id=pk,
+            quantity=quantity + deltas.get(pk, 0),
+            taken_at=taken_at,
+            last_movement_id=cursor,
+        )
+        for pk, quantity in base.items()
+    )
+    return len(base)
+
+
+def stock_as_of(product_id, when):
+    """Stock level of ``product_id`` at ``when``: nearest snapshot plus later movements."""
+    snapshot = (
+        StockSnapshot.objects
+        .filter(product_id=product_id, taken_at__lte=when)
+        .order_by('-taken_at', '-id')
+        .values('quantity', 'last_movement_id')
+        .first()
+    )
+    quantity = snapshot['quantity'] if snapshot else 0
+    cursor = snapshot['last_movement_id'] if snapshot else 0
+    delta = StockMovement.objects.filter(
+        product_id=product_id, id__gt=cursor, created_at__lte=when,
+    ).aggregate(total=Sum('quantity'))['total'] or 0
+    return quantity + delta
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.archive import archive_orders, archive_sales, cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed orders and old sales into the archive tables in small "
+        "batches. Run periodically (e.g. nightly) to keep the live tables small."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS, help='Archive history older than this')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows moved per transaction')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1.')
+        before = cutoff(options['days'])
+        batch_size = max(1, options['batch_size'])
+        started = time.perf_counter()
+        orders = archive_orders(before, batch_size)
+        sales = archive_sales(before, batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {orders} orders and {sales} sales older than {options["days"]} days '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
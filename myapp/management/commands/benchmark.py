@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.benchmarks import SUITES
+
+
+class Command(BaseCommand):
+    help = 'Run the API micro-benchmarks (all suites unless some are named).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suites', nargs='*', help=f"Suites to run: {', '.join(sorted(SUITES))}")
+        parser.add_argument('--size', type=int, default=5000, help='Rows of synthetic data per suite')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (fastest is reported)')
+
+    def handle(self, *args, **options):
+        names = options['suites'] or sorted(SUITES)
+        unknown = [name for name in names if name not in SUITES]
+        if unknown:
+            raise CommandError(f"Unknown suite(s): {', '.join(unknown)}")
+
+        for name in names:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} (size={options['size']}, repeat={options['repeat']})"))
+            for label, value, unit in SUITES[name](options['size'], options['repeat']):
+                self.stdout.write(f'  {label:<45} {value:>12.3f} {unit}')
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.recommendations import build_recommendations, np
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild "frequently bought together" recommendations from sales and '
+        'order baskets. Run periodically (e.g. nightly).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=settings.RECOMMENDATION_TOP_K, help='Neighbours kept per product')
+        parser.add_argument('--window-hours', type=float, default=settings.RECOMMENDATION_ORDER_WINDOW_HOURS,
+                            help="Orders by one customer within this many hours form one basket")
+        parser.add_argument('--min-support', type=int, default=settings.RECOMMENDATION_MIN_SUPPORT,
+                            help='Minimum shared baskets for a pair')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('NumPy is required: pip install numpy')
+        if options['top_k'] < 1 or options['min_support'] < 1 or options['window_hours'] <= 0:
+            raise CommandError('--top-k, --min-support and --window-hours must be positive.')
+
+        count = build_recommendations(
+            top_k=options['top_k'],
+            window_hours=options['window_hours'],
+            min_support=options['min_support'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} related-product links.'))
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# OWASP's minimum for PBKDF2-HMAC-SHA256; calibration never goes below it.
+MIN_PBKDF2_ITERATIONS = 600000
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure password hashing on this host and print PASSWORD_* settings "
+        "that take about --target-ms per hash."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=['pbkdf2', 'argon2'], default=None, help='Defaults to PASSWORD_HASHER')
+        parser.add_argument('--target-ms', type=float, default=250.0, help='Wanted time per hash')
+        parser.add_argument('--min-iterations', type=int, default=MIN_PBKDF2_ITERATIONS)
+
+    def handle(self, *args, **options):
+        profile = options['profile'] or settings.PASSWORD_HASHER
+        target = options['target_ms'] / 1000
+        if profile == 'argon2':
+            self.calibrate_argon2(target)
+        else:
+            self.calibrate_pbkdf2(target, options['min_iterations'])
+
+    def calibrate_pbkdf2(self, target, minimum):
+        sample = 100000
+        salt = os.urandom(16)
+        per_iteration = timed(lambda: hashlib.pbkdf2_hmac('sha256', b'calibration', salt, sample)) / sample
+        iterations = max(minimum, int(target / per_iteration) // 10000 * 10000)
+        if iterations == minimum and minimum * per_iteration > target:
+            self.stdout.write(self.style.WARNING(
+                f'{minimum} iterations already take {minimum * per_iteration * 1000:.0f} ms here; '
+                'consider PASSWORD_HASHER=argon2 rather than fewer iterations.'
+            ))
+        self.stdout.write(f'# ~{iterations * per_iteration * 1000:.0f} ms per hash')
+        self.stdout.write(f'PASSWORD_HASHER=pbkdf2\nPASSWORD_PBKDF2_ITERATIONS={iterations}')
+
+    def calibrate_argon2(self, target):
+        try:
+            import argon2
+        except ImportError:
+            raise CommandError('The argon2 profile needs the argon2-cffi package.')
+
+        memory, parallelism = settings.PASSWORD_ARGON2_MEMORY_COST, settings.PASSWORD_ARGON2_PARALLELISM
+        chosen, elapsed = 1, None
+        for time_cost in range(1, 11):
+            hasher = argon2.PasswordHasher(time_cost=time_cost, memory_cost=memory, parallelism=parallelism)
+            took = timed(lambda: hasher.hash('calibration'))
+            if took > target and elapsed is not None:
+                break
+            chosen, elapsed = time_cost, took
+        self.stdout.write(f'# ~{elapsed * 1000:.0f} ms per hash with {memory} KiB, {parallelism} lanes')
+        self.stdout.write(
+            f'PASSWORD_HASHER=argon2\nPASSWORD_ARGON2_TIME_COST={chosen}\n'
+            f'PASSWORD_ARGON2_MEMORY_COST={memory}\nPASSWORD_ARGON2_PARALLELISM={parallelism}'
+        )
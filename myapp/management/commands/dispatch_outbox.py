@@ -0,0 +1,50 @@
+from datetime import timedelta
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from myapp.outbox import CONSUMERS, dispatch, prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver outbox events to the registered consumers in order, advancing "
+        "each consumer's cursor. Use --follow to keep running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('consumers', nargs='*', help='Consumers to run (default: all registered)')
+        parser.add_argument('--batch', type=int, default=500, help='Events per batch')
+        parser.add_argument('--follow', action='store_true', help='Keep polling for new events')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to sleep when idle (with --follow)')
+        parser.add_argument('--prune-days', type=int, help='Afterwards delete events older than this that all consumers have read')
+
+    def handle(self, *args, **options):
+        names = options['consumers'] or sorted(CONSUMERS)
+        unknown = [name for name in names if name not in CONSUMERS]
+        if unknown:
+            raise CommandError(f"Unknown consumer(s): {', '.join(unknown)}. Registered: {', '.join(sorted(CONSUMERS)) or 'none'}")
+
+        delivered = dict.fromkeys(names, 0)
+        try:
+            while True:
+                close_old_connections()
+                busy = False
+                for name in names:
+                    count = dispatch(name, max(1, options['batch']))
+                    delivered[name] += count
+                    busy = busy or count > 0
+                if not busy:
+                    if not options['follow']:
+                        break
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
+
+        for name, count in delivered.items():
+            self.stdout.write(f'{name}: {count} events')
+        if options['prune_days'] is not None:
+            removed = prune(timedelta(days=options['prune_days']))
+            self.stdout.write(f'Pruned {removed} events.')
+        self.stdout.write(self.style.SUCCESS('Outbox dispatched.'))
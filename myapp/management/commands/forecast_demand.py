@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.forecasting import np, run_forecast
+
+
+class Command(BaseCommand):
+    help = (
+        "Forecast daily demand per product from sales and order history and "
+        "rebuild the reorder suggestion list. Run periodically (e.g. nightly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=settings.FORECAST_HISTORY_DAYS)
+        parser.add_argument('--lead-time', type=int, default=settings.FORECAST_LEAD_TIME_DAYS, help='Supplier lead time in days')
+        parser.add_argument('--cover-days', type=int, default=settings.FORECAST_COVER_DAYS, help='Days of stock a reorder should cover')
+        parser.add_argument('--alpha', type=float, default=settings.FORECAST_SMOOTHING, help='Exponential smoothing factor (0-1)')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Products evaluated per array block')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('NumPy is required: pip install numpy')
+        if not 0 < options['alpha'] <= 1:
+            raise CommandError('--alpha must be in (0, 1].')
+        if options['history_days'] < 1:
+            raise CommandError('--history-days must be positive.')
+
+        count = run_forecast(
+            history_days=options['history_days'],
+            chunk_size=max(1, options['chunk_size']),
+            alpha=options['alpha'],
+            lead_time=options['lead_time'],
+            cover_days=options['cover_days'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'{count} products need reordering.'))
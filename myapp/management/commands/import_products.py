@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.importer import import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products from a CSV or JSON Lines file, matched by SKU. "
+        "Columns: sku, name, category, price, quantity, reorder_threshold."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--no-create-categories', action='store_true', help='Reject rows with unknown categories')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('json' if path.lower().endswith(('.json', '.jsonl', '.ndjson')) else 'csv')
+        started = time.perf_counter()
+        try:
+            with open(path, 'rb') as stream:
+                result = import_products(
+                    read_rows(stream, fmt),
+                    batch_size=max(1, options['batch_size']),
+                    create_categories=not options['no_create_categories'],
+                )
+        except OSError as exc:
+            raise CommandError(exc)
+        elapsed = time.perf_counter() - started
+
+        for error in result.errors:
+            self.stderr.write(f"row {error['row']} ({error['sku'] or '-'}): {error['error']}")
+        if result.read_error:
+            self.stderr.write(self.style.ERROR(result.read_error))
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.rows} rows in {elapsed:.1f}s: {result.created} created, '
+            f'{result.updated} updated, {result.error_count} rejected.'
+        ))
@@ -0,0 +1,51 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from myapp.tasks import claim_tasks, requeue_stale, run_task
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background tasks queued in the database. Start one or more "
+        "alongside the web process; stop with Ctrl-C or SIGTERM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=10, help='Tasks claimed per poll')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is ready')
+        parser.add_argument('--worker-id', default=f'{socket.gethostname()}:{os.getpid()}')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        worker = options['worker_id']
+        done = failed = 0
+        self.stdout.write(f'Worker {worker} started.')
+
+        try:
+            while not self.stopping:
+                close_old_connections()
+                requeue_stale()
+                claimed = claim_tasks(worker, max(1, options['batch']))
+                for task in claimed:
+                    if run_task(task):
+                        done += 1
+                    else:
+                        failed += 1
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} stopped: {done} done, {failed} failed.'))
+
+    def stop(self, signum, frame):
+        # Finish the current batch, then exit.
+        self.stopping = True
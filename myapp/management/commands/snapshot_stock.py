@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from myapp.inventory import take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Record a StockSnapshot for every product from the stock ledger. "
+        "Run periodically (e.g. nightly) so stock-as-of queries stay fast."
+    )
+
+    def handle(self, *args, **options):
+        count = take_snapshots()
+        self.stdout.write(self.style.SUCCESS(f'Snapshotted stock for {count} products.'))
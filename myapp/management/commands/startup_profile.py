@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+import subprocess
+import sys
+import time
+
+
+# What each target imports in a fresh interpreter.
+TARGETS = {
+    'settings': 'import vunjabei.settings',
+    'setup': 'import django; django.setup()',
+    'urls': 'import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns',
+    'wsgi': 'import vunjabei.wsgi',
+}
+
+
+def parse_importtime(stderr):
+    """Parse ``python -X importtime`` output into (module, self_us, cumulative_us) rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            # header line: "self [us] | cumulative | imported package"
+            continue
+        rows.append((parts[2].strip(), self_us, cumulative_us))
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile process start-up with `python -X importtime` and report the slowest imports. "
+        "Use it to check that optional integrations stay out of the cold-start path."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=sorted(TARGETS), default='wsgi', help='What to import (default: wsgi)')
+        parser.add_argument('--top', type=int, default=25, help='Number of modules to list')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs to take the fastest of')
+        parser.add_argument('--sort', choices=['self', 'cumulative'], default='cumulative')
+
+    def run_once(self, code):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'vunjabei.settings')
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        elapsed = time.perf_counter() - started
+        if proc.returncode != 0:
+            raise CommandError(f'Start-up failed:\n{proc.stderr[-2000:]}')
+        return elapsed, parse_importtime(proc.stderr)
+
+    def handle(self, *args, **options):
+        code = TARGETS[options['target']]
+        repeat = max(1, options['repeat'])
+
+        best_elapsed, best_rows = None, []
+        for _ in range(repeat):
+            elapsed, rows = self.run_once(code)
+            if best_elapsed is None or elapsed < best_elapsed:
+                best_elapsed, best_rows = elapsed, rows
+
+        index = 1 if options['sort'] == 'self' else 2
+        ranked = sorted(best_rows, key=lambda row: row[index], reverse=True)
+        total_self_ms = sum(row[1] for row in best_rows) / 1000
+
+        self.stdout.write(f"Target: {options['target']} ({code})")
+        self.stdout.write(f'Wall time (best of {repeat}): {best_elapsed * 1000:.1f} ms')
+        self.stdout.write(f'Modules imported: {len(best_rows)}, total import time: {total_self_ms:.1f} ms')
+        self.stdout.write('')
+        self.stdout.write(f"{'self ms':>9} {'cumul ms':>9}  module")
+        for module, self_us, cumulative_us in ranked[:options['top']]:
+            self.stdout.write(f'{self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}  {module}')
+
+        lazy = [name for name in ('cloudinary', 'cloudinary_storage', 'whitenoise', 'dj_database_url') if any(row[0] == name for row in best_rows)]
+        if lazy:
+            self.stdout.write('')
+            self.stdout.write(self.style.WARNING(f"Optional integrations imported at start-up: {', '.join(lazy)}"))
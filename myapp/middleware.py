@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+def parse_accept_encoding(header):
+    """Return ``{coding: q}`` for an Accept-Encoding header, ignoring malformed parts."""
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(header):
+    """Pick the best supported coding the client accepts: ``'br'``, ``'gzip'`` or None."""
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get('*', 0)
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = None, 0
+    for coding in candidates:
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Content-negotiated brotli/gzip compression for API responses.
+
+    Only paths under ``API_COMPRESSION_PATHS`` are touched (static files are
+    served precompressed by WhiteNoise), bodies below
+    ``API_COMPRESSION_MIN_SIZE`` are sent as-is, and streaming responses
+    (exports) are compressed chunk by chunk.  Endpoints returning credentials
+    are listed in ``API_COMPRESSION_EXCLUDE`` to stay clear of BREACH.
+    """
+
+    max_random_bytes = 100
+    skip_content_types = ('text/event-stream', 'image/', 'video/', 'application/zip', 'application/gzip')
+
+    def should_compress(self, request, response):
+        path = request.path_info
+        if not path.startswith(tuple(getattr(settings, 'API_COMPRESSION_PATHS', ['/api/']))):
+            return False
+        if path.startswith(tuple(getattr(settings, 'API_COMPRESSION_EXCLUDE', []))):
+            return False
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return False
+        if response.has_header('Content-Encoding'):
+            return False
+        if response.get('Content-Type', '').startswith(self.skip_content_types):
+            return False
+        if not response.streaming and len(response.content) < getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024):
+            return False
+        return True
+
+    def process_response(self, request, response):
+        if not self.should_compress(request, response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                # Async streams (e.g. long-lived feeds) are passed through untouched.
+                return response
+            response.streaming_content = self.compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            compressed = self.compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compress(self, content, encoding):
+        if encoding == 'br':
+            return brotli.compress(content, quality=getattr(settings, 'API_COMPRESSION_BROTLI_QUALITY', 5))
+        return compress_string(content, max_random_bytes=self.max_random_bytes)
+
+    def compress_stream(self, sequence, encoding):
+        if encoding == 'br':
+            return brotli_sequence(sequence, getattr(settings, 'API_COMPRESSION_BROTLI_QUALITY', 5))
+        return compress_sequence(sequence, max_random_bytes=self.max_random_bytes)
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.3 on 2026-10-19 14:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    """Record today's stock as the opening balance of the new ledger."""
+    Product = apps.get_model('myapp', 'Product')
+    StockSnapshot = apps.get_model('myapp', 'StockSnapshot')
+    StockSnapshot.objects.bulk_create(
+        StockSnapshot(product_id=pk, quantity=quantity, last_movement_id=0)
+        for pk, quantity in Product.objects.values_list('pk', 'quantity').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_alter_product_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('order', 'Order'), ('sale', 'Sale'), ('restock', 'Restock'), ('adjustment', 'Adjustment'), ('cancellation', 'Cancellation')], max_length=20)),
+                ('quantity', models.IntegerField(help_text='Signed change in stock (negative when stock leaves)')),
+                ('reference_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='myapp.product')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['product', 'created_at'], name='myapp_stock_product_24994b_idx'), models.Index(fields=['created_at'], name='myapp_stock_created_8b6207_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='myapp.product')),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+                'indexes': [models.Index(fields=['product', 'taken_at'], name='myapp_stock_product_fca082_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
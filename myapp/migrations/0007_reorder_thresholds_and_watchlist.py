@@ -0,0 +1,65 @@
+# Generated by Django 5.0.3 on 2026-10-19 14:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_watchlist(apps, schema_editor):
+    """Seed the watchlist with products already below the default threshold."""
+    Product = apps.get_model('myapp', 'Product')
+    LowStockAlert = apps.get_model('myapp', 'LowStockAlert')
+    threshold = settings.DEFAULT_REORDER_THRESHOLD
+    LowStockAlert.objects.bulk_create(
+        LowStockAlert(product_id=pk, quantity=quantity, threshold=threshold)
+        for pk, quantity in Product.objects.filter(quantity__lt=threshold).values_list('pk', 'quantity').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='reorder_threshold',
+            field=models.PositiveIntegerField(blank=True, help_text='Low-stock level for products in this category (default applies when empty)', null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reorder_threshold',
+            field=models.PositiveIntegerField(blank=True, help_text="Low-stock level for this product (falls back to the category's)", null=True),
+        ),
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='low_stock_alert', serialize=False, to='myapp.product')),
+                ('quantity', models.IntegerField()),
+                ('threshold', models.PositiveIntegerField()),
+                ('since', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['quantity'],
+                'indexes': [models.Index(fields=['quantity'], name='myapp_lowst_quantit_19cc7f_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockAlertEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('low', 'Fell below threshold'), ('recovered', 'Back above threshold')], max_length=10)),
+                ('quantity', models.IntegerField()),
+                ('threshold', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alert_events', to='myapp.product')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(build_watchlist, migrations.RunPython.noop),
+    ]
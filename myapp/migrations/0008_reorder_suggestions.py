@@ -0,0 +1,32 @@
+# Generated by Django 5.0.3 on 2026-10-19 14:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_reorder_thresholds_and_watchlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderSuggestion',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reorder_suggestion', serialize=False, to='myapp.product')),
+                ('on_hand', models.IntegerField()),
+                ('avg_daily_7', models.FloatField(help_text='Mean units per day over the last 7 days')),
+                ('avg_daily_28', models.FloatField(help_text='Mean units per day over the last 28 days')),
+                ('forecast_daily', models.FloatField(help_text='Exponentially smoothed units per day')),
+                ('days_of_cover', models.FloatField(blank=True, help_text='Days current stock lasts at the forecast rate', null=True)),
+                ('suggested_quantity', models.PositiveIntegerField()),
+                ('generated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['days_of_cover'],
+                'indexes': [models.Index(fields=['days_of_cover'], name='myapp_reord_days_of_5067b4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:10
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_order_updated_at(apps, schema_editor):
+    """Existing orders were last changed no earlier than they were placed."""
+    Order = apps.get_model('myapp', 'Order')
+    Order.objects.update(updated_at=F('date_ordered'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(help_text='app_label.model of the deleted row', max_length=50)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('owner_id', models.PositiveBigIntegerField(blank=True, help_text='User the row belonged to (orders)', null=True)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['deleted_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at'], name='myapp_produ_updated_38dfa6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model', 'deleted_at'], name='myapp_tombs_model_8fe65a_idx'),
+        ),
+        migrations.RunPython(backfill_order_updated_at, migrations.RunPython.noop),
+    ]
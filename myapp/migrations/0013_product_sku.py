@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_delta_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Stock keeping unit; the key for bulk imports', max_length=64, null=True, unique=True),
+        ),
+    ]
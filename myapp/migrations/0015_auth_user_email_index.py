@@ -0,0 +1,29 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:40
+
+from django.db import migrations
+
+
+def create_email_index(apps, schema_editor):
+    # Login by email filters on UPPER(email) (``email__iexact``); PostgreSQL can
+    # serve that from an expression index.  Other databases scan.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS myapp_auth_user_email_upper ON auth_user (UPPER(email::text))'
+        )
+
+
+def drop_email_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS myapp_auth_user_email_upper')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('myapp', '0014_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_index, drop_email_index),
+    ]
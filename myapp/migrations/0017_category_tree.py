@@ -0,0 +1,52 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def seed_tree(apps, schema_editor):
+    """Existing categories are all roots; count their products once."""
+    Category = apps.get_model('myapp', 'Category')
+    Product = apps.get_model('myapp', 'Product')
+    counts = {
+        category_id: (products, in_stock)
+        for category_id, products, in_stock in Product.objects.filter(category__isnull=False).order_by()
+        .values_list('category_id').annotate(products=Count('pk'), in_stock=Count('pk', filter=Q(quantity__gt=0)))
+    }
+    categories = list(Category.objects.only('pk'))
+    for category in categories:
+        category.path = f'{category.pk}/'
+        category.product_count, category.in_stock_count = counts.get(category.pk, (0, 0))
+    Category.objects.bulk_update(categories, ['path', 'product_count', 'in_stock_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0016_history_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='in_stock_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Of those, products with stock left'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='myapp.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Products in this category and its subcategories'),
+        ),
+        migrations.RunPython(seed_tree, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.3 on 2026-10-19 15:45
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_history(apps, schema_editor):
+    """Each product's current price becomes its base price since it was created."""
+    Product = apps.get_model('myapp', 'Product')
+    PriceHistory = apps.get_model('myapp', 'PriceHistory')
+    PriceHistory.objects.bulk_create(
+        (
+            PriceHistory(product_id=pk, kind='base', price=price, valid_from=created_at, note='Price before history was kept')
+            for pk, price, created_at in Product.objects.values_list('pk', 'price', 'created_at').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0017_category_tree'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='next_price_change',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('base', 'Base price'), ('promotion', 'Promotion')], default='base', max_length=10)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('valid_from', models.DateTimeField(default=django.utils.timezone.now)),
+                ('valid_to', models.DateTimeField(blank=True, null=True)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='myapp.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Price history',
+                'ordering': ['-valid_from', '-id'],
+                'indexes': [models.Index(fields=['product', 'kind', 'valid_from'], name='myapp_price_product_708ac0_idx')],
+            },
+        ),
+        migrations.RunPython(seed_history, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
@@ -9,13 +12,52 @@ from decimal import Decimal
 class Category(models.Model):
     """
     Model for product categories (e.g., T-shirts, Trousers, Shoes).
+
+    Categories form a tree: ``path`` lists the ids from the root down to this
+    category (``"3/17/"``), so a subtree is one indexed prefix match.  The
+    counts cover the whole subtree and are kept up to date by
+    ``myapp/categories.py`` whenever products move, appear, disappear or go
+    in or out of stock.
     """
     name = models.CharField(max_length=100, unique=True)
+    parent = models.ForeignKey(
+        'self', on_delete=models.PROTECT, null=True, blank=True, related_name='children'
+    )
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    reorder_threshold = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Low-stock level for products in this category (default applies when empty)"
+    )
+    product_count = models.IntegerField(default=0, editable=False, help_text="Products in this category and its subcategories")
+    in_stock_count = models.IntegerField(default=0, editable=False, help_text="Of those, products with stock left")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         ordering = ['name']
         verbose_name_plural = "Categories"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored parent so save() can move the subtree.
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+
+    def clean(self):
+        from .categories import validate_parent
+        validate_parent(self.pk, self.parent_id)
+
+    def save(self, *args, **kwargs):
+        from .categories import category_saved, validate_parent
+        adding = self._state.adding
+        validate_parent(self.pk, self.parent_id)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            category_saved(self, adding, getattr(self, '_loaded_parent_id', self.parent_id))
+        self._loaded_parent_id = self.parent_id
+        if not adding:
+            from .inventory import refresh_watchlist
+            refresh_watchlist(self.products.values_list('pk', flat=True))
+
     def __str__(self):
         return self.name
 
@@ -23,18 +65,78 @@ class Category(models.Model):
 # 2. Product Model
 class Product(models.Model):
     name = models.CharField(max_length=200)
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True, help_text="Stock keeping unit; the key for bulk imports")
     category = models.ForeignKey(
         Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='products'
     )
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField(default=0)
+    reorder_threshold = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Low-stock level for this product (falls back to the category's)"
+    )
     image = models.ImageField(upload_to='product_images/', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # ``price`` is the current-price projection of PriceHistory; this is when it
+    # next changes (a scheduled price or a promotion starting or ending).
+    next_price_change = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
-        indexes = [models.Index(fields=['name']), models.Index(fields=['category'])]
+        indexes = [models.Index(fields=['name']), models.Index(fields=['category']), models.Index(fields=['updated_at'])]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored stock so save() can log edits to the ledger.
+        instance._loaded_quantity = instance.__dict__.get('quantity')
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        instance._loaded_price = instance.__dict__.get('price')
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        previous = getattr(self, '_loaded_quantity', None)
+        previous_price = getattr(self, '_loaded_price', None)
+        super().save(*args, **kwargs)
+
+        from .categories import product_counts_changed
+        from .inventory import record_movements, refresh_watchlist
+        from .pricing import set_prices
+        if update_fields is None or 'price' in update_fields:
+            if adding or (previous_price is not None and previous_price != self.price):
+                # An edited price becomes the base price from now on; a running
+                # promotion still wins until it ends.
+                self.price = set_prices({self.pk: self.price}, refresh=not adding)[self.pk]
+            self._loaded_price = self.price
+        if update_fields is None or {'quantity', 'reorder_threshold', 'category'} & set(update_fields):
+            refresh_watchlist([self.pk])
+        if update_fields is None or {'quantity', 'category'} & set(update_fields):
+            if adding:
+                product_counts_changed([(None, None, self.category_id, self.quantity)])
+            elif previous is not None:
+                product_counts_changed([(getattr(self, '_loaded_category_id', self.category_id), previous, self.category_id, self.quantity)])
+            self._loaded_category_id = self.category_id
+        if update_fields is not None and 'quantity' not in update_fields:
+            return
+        if adding:
+            delta, kind = self.quantity, StockMovement.RESTOCK
+        elif previous is not None:
+            delta, kind = self.quantity - previous, StockMovement.ADJUSTMENT
+        else:
+            delta = 0
+        self._loaded_quantity = self.quantity
+        if delta:
+            record_movements([StockMovement(product=self, kind=kind, quantity=delta, note='Product edit')])
+
+    @property
+    def effective_reorder_threshold(self):
+        if self.reorder_threshold is not None:
+            return self.reorder_threshold
+        if self.category_id and self.category.reorder_threshold is not None:
+            return self.category.reorder_threshold
+        return settings.DEFAULT_REORDER_THRESHOLD
 
     def __str__(self):
         return self.name
@@ -42,7 +144,7 @@ class Product(models.Model):
 
 # 3. Customer Model
 class Customer(models.Model):
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, db_index=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
     email = models.EmailField(blank=True, null=True)
     address = models.TextField(blank=True, null=True)
@@ -59,7 +161,7 @@ class Customer(models.Model):
 class Sale(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True)
-    date = models.DateTimeField(default=timezone.now)
+    date = models.DateTimeField(default=timezone.now, db_index=True)
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
 
     class Meta:
@@ -91,19 +193,327 @@ class Order(models.Model):
         ('Delivered', 'Delivered'),
         ('Cancelled', 'Cancelled'),
     ]
+    # Allowed status changes. Delivered and Cancelled are final: cancelling
+    # returns the ordered quantity to stock, so reopening would sell it twice.
+    # Mirrored by STATUS_TRANSITIONS in frontend/src/OrderManagement.jsx.
+    STATUS_TRANSITIONS = {
+        'Pending': {'Processing', 'Shipped', 'Delivered', 'Cancelled'},
+        'Processing': {'Pending', 'Shipped', 'Delivered', 'Cancelled'},
+        'Shipped': {'Delivered', 'Cancelled'},
+        'Delivered': set(),
+        'Cancelled': set(),
+    }
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
-    date_ordered = models.DateTimeField(auto_now_add=True)
+    date_ordered = models.DateTimeField(auto_now_add=True, db_index=True)
     address = models.TextField(blank=True, null=True, help_text="Delivery Address / Maelekezo ya kufika")
     phone = models.CharField(max_length=20, blank=True, null=True, help_text="Contact Phone Number")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def can_transition_to(self, new_status):
+        return new_status == self.status or new_status in self.STATUS_TRANSITIONS.get(self.status, set())
 
     def save(self, *args, **kwargs):
-        if self.product and self.quantity:
+        # Priced once, when placed; later saves (status changes) keep the price.
+        if self._state.adding and self.total_price is None and self.product_id and self.quantity:
             self.total_price = self.product.price * self.quantity
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"Order #{self.id} - {self.product.name} ({self.status})"
\ No newline at end of file
+        return f"Order #{self.id} - {self.product.name} ({self.status})"
+
+
+# 7. StockMovement Model (append-only stock ledger)
+class StockMovement(models.Model):
+    ORDER = 'order'
+    SALE = 'sale'
+    RESTOCK = 'restock'
+    ADJUSTMENT = 'adjustment'
+    CANCELLATION = 'cancellation'
+    KIND_CHOICES = [
+        (ORDER, 'Order'),
+        (SALE, 'Sale'),
+        (RESTOCK, 'Restock'),
+        (ADJUSTMENT, 'Adjustment'),
+        (CANCELLATION, 'Cancellation'),
+    ]
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField(help_text="Signed change in stock (negative when stock leaves)")
+    # Order or Sale id, depending on kind; not a FK so history survives archiving.
+    reference_id = models.PositiveBigIntegerField(null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [models.Index(fields=['product', 'created_at']), models.Index(fields=['created_at'])]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Stock movements are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Stock movements are append-only.")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} of product #{self.product_id}"
+
+
+# 8. StockSnapshot Model (periodic balances so history queries skip the full ledger)
+class StockSnapshot(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    quantity = models.IntegerField()
+    taken_at = models.DateTimeField(default=timezone.now)
+    # Highest StockMovement id folded into ``quantity``.
+    last_movement_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-taken_at']
+        indexes = [models.Index(fields=['product', 'taken_at'])]
+
+    def __str__(self):
+        return f"Product #{self.product_id}: {self.quantity} at {self.taken_at:%Y-%m-%d %H:%M}"
+
+
+
+# 9. LowStockAlert Model (watchlist of products currently below their threshold)
+class LowStockAlert(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='low_stock_alert')
+    quantity = models.IntegerField()
+    threshold = models.PositiveIntegerField()
+    since = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['quantity']
+        indexes = [models.Index(fields=['quantity'])]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.quantity} < {self.threshold}"
+
+
+# 10. StockAlertEvent Model (feed of threshold crossings)
+class StockAlertEvent(models.Model):
+    LOW = 'low'
+    RECOVERED = 'recovered'
+    KIND_CHOICES = [(LOW, 'Fell below threshold'), (RECOVERED, 'Back above threshold')]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_alert_events')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    quantity = models.IntegerField()
+    threshold = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: product #{self.product_id} ({self.quantity}/{self.threshold})"
+
+
+# 11. ReorderSuggestion Model (latest output of the demand forecast job)
+class ReorderSuggestion(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='reorder_suggestion')
+    on_hand = models.IntegerField()
+    avg_daily_7 = models.FloatField(help_text="Mean units per day over the last 7 days")
+    avg_daily_28 = models.FloatField(help_text="Mean units per day over the last 28 days")
+    forecast_daily = models.FloatField(help_text="Exponentially smoothed units per day")
+    days_of_cover = models.FloatField(null=True, blank=True, help_text="Days current stock lasts at the forecast rate")
+    suggested_quantity = models.PositiveIntegerField()
+    generated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['days_of_cover']
+        indexes = [models.Index(fields=['days_of_cover'])]
+
+    def __str__(self):
+        return f"Reorder {self.suggested_quantity} of product #{self.product_id}"
+
+
+# 12. RelatedProduct Model (precomputed "frequently bought together")
+class RelatedProduct(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_products')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommended_for')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField(help_text="Cosine similarity of the two products' baskets")
+    together = models.PositiveIntegerField(help_text="Baskets containing both products")
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_related_product_rank'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} for product #{self.product_id}: #{self.related_id}"
+
+
+# 13. Task Model (database-backed background job queue, see myapp/tasks.py)
+class Task(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+# 14. DeadTask Model (tasks that ran out of attempts)
+class DeadTask(models.Model):
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveSmallIntegerField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    failed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-failed_at']
+
+    def __str__(self):
+        return f"{self.name} failed after {self.attempts} attempts"
+
+
+# 15. OutboxEvent Model (transactional outbox for downstream consumers)
+class OutboxEvent(models.Model):
+    topic = models.CharField(max_length=50)
+    subject_id = models.PositiveBigIntegerField(help_text="Id of the order/product the event is about")
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.pk} {self.topic} ({self.subject_id})"
+
+
+# 16. OutboxCursor Model (how far each outbox consumer has read)
+class OutboxCursor(models.Model):
+    consumer = models.CharField(max_length=100, primary_key=True)
+    position = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.consumer} @ {self.position}"
+
+
+# 17. Tombstone Model (deletions, for delta sync clients)
+class Tombstone(models.Model):
+    model = models.CharField(max_length=50, help_text="app_label.model of the deleted row")
+    object_id = models.PositiveBigIntegerField()
+    owner_id = models.PositiveBigIntegerField(null=True, blank=True, help_text="User the row belonged to (orders)")
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['deleted_at']
+        indexes = [models.Index(fields=['model', 'deleted_at'])]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted"
+
+
+# 18. ArchivedOrder Model (closed orders moved out of the live table; see archive.py)
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True, help_text="Id the order had in the live table")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=1)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    date_ordered = models.DateTimeField(db_index=True)
+    address = models.TextField(blank=True, null=True)
+    phone = models.CharField(max_length=20, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    updated_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'date_ordered'])]
+
+    def __str__(self):
+        return f"Archived order #{self.id} ({self.status})"
+
+
+# 19. ArchivedSale / ArchivedSaleItem Models (old sales moved out of the live tables)
+class ArchivedSale(models.Model):
+    id = models.BigIntegerField(primary_key=True, help_text="Id the sale had in the live table")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    date = models.DateTimeField(db_index=True)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Archived sale #{self.pk} on {self.date.strftime('%Y-%m-%d')}"
+
+
+class ArchivedSaleItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    sale = models.ForeignKey(ArchivedSale, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='+')
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def get_total(self):
+        return self.price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} of product #{self.product_id}"
+
+
+# 20. PriceHistory Model (effective-dated prices and promotions; see pricing.py)
+class PriceHistory(models.Model):
+    BASE = 'base'
+    PROMOTION = 'promotion'
+    KIND_CHOICES = [
+        (BASE, 'Base price'),
+        (PROMOTION, 'Promotion'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=BASE)
+    price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    valid_from = models.DateTimeField(default=timezone.now)
+    # Promotions end at valid_to; a base price lasts until the next base price.
+    valid_to = models.DateTimeField(null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-valid_from', '-id']
+        verbose_name_plural = "Price history"
+        indexes = [models.Index(fields=['product', 'kind', 'valid_from'])]
+
+    def clean(self):
+        from .pricing import validate_window
+        try:
+            validate_window(self.kind, self.valid_from or timezone.now(), self.valid_to)
+        except ValueError as exc:
+            raise ValidationError({'valid_to': str(exc)})
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.price} for product #{self.product_id} from {self.valid_from:%Y-%m-%d %H:%M}"
@@ -0,0 +1,87 @@
+"""
+Order status changes.
+
+``transition_orders`` validates each change against
+``Order.STATUS_TRANSITIONS`` and applies a whole batch in one transaction:
+one locking SELECT, one ``bulk_update`` and, for cancellations, one
+aggregated stock update that returns the ordered quantities to
+``Product.quantity``.  Each change is published to the outbox.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import inventory, outbox
+from .models import Order, StockMovement
+
+
+class OrderTransitionError(Exception):
+    """Raised with ``{order_id: message}`` when any change in a batch is invalid."""
+
+    def __init__(self, errors):
+        super().__init__('Invalid order status change.')
+        self.errors = errors
+
+
+def transition_orders(updates, user=None):
+    """
+    Apply ``{order_id: new_status}`` atomically and return the changed orders.
+
+    Nothing is written if any order is missing or any change is not allowed.
+    Orders already in the requested status are left untouched.
+    """
+    valid_statuses = {choice[0] for choice in Order.STATUS_CHOICES}
+    with transaction.atomic():
+        orders = Order.objects.select_for_update().only('id', 'status', 'product_id', 'quantity', 'user_id').in_bulk(list(updates))
+
+        errors = {}
+        for order_id, new_status in updates.items():
+            order = orders.get(order_id)
+            if order is None:
+                errors[order_id] = 'Order not found.'
+            elif new_status not in valid_statuses:
+                errors[order_id] = 'Invalid status value.'
+            elif not order.can_transition_to(new_status):
+                errors[order_id] = f'Cannot change status from {order.status} to {new_status}.'
+        if errors:
+            raise OrderTransitionError(errors)
+
+        now = timezone.now()
+        changed = []
+        cancelled = []
+        events = []
+        for order_id, new_status in updates.items():
+            order = orders[order_id]
+            if order.status == new_status:
+                continue
+            events.append((outbox.ORDER_STATUS_CHANGED, order.pk, {
+                'order': order.pk, 'user': order.user_id, 'from': order.status, 'to': new_status,
+            }))
+            order.status = new_status
+            order.updated_at = now
+            changed.append(order)
+            if new_status == 'Cancelled':
+                cancelled.append(order)
+
+        if changed:
+            Order.objects.bulk_update(changed, ['status', 'updated_at'])
+            outbox.publish_many(events)
+        if cancelled:
+            inventory.apply_movements(
+                [(order.product_id, order.quantity, order.pk) for order in cancelled],
+                StockMovement.CANCELLATION,
+                user=user,
+                note='Order cancelled',
+            )
+    return changed
+
+
+def order_created_payload(order):
+    return {
+        'order': order.pk,
+        'user': order.user_id,
+        'product': order.product_id,
+        'quantity': order.quantity,
+        'total_price': order.total_price,
+        'status': order.status,
+    }
@@ -0,0 +1,127 @@
+"""
+Transactional outbox.
+
+Order and stock changes call ``publish`` inside the same ``transaction.atomic()``
+that writes them, so an ``OutboxEvent`` exists exactly when the change was
+committed.  Consumers read the log in id order from a cursor:
+
+* in-process consumers register with ``@consumer('name')`` and are driven by
+  ``manage.py dispatch_outbox``, which hands them batches and advances their
+  ``OutboxCursor`` in the same transaction (at-least-once delivery);
+* external consumers poll ``GET /api/events/?after=<cursor>``;
+* order events are also pushed to live SSE subscribers once committed.
+
+Ids are allocated before commit, so a slow transaction can commit an id
+lower than one already visible.  Readers therefore only see events older
+than ``OUTBOX_SETTLE_SECONDS``, so cursors do not skip events from
+transactions that commit within that window.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxCursor, OutboxEvent
+from .pubsub import get_broker
+
+CONSUMERS = {}
+
+ORDER_CREATED = 'order.created'
+ORDER_STATUS_CHANGED = 'order.status_changed'
+STOCK_CHANGED = 'stock.changed'
+ORDER_TOPICS = (ORDER_CREATED, ORDER_STATUS_CHANGED)
+
+
+def consumer(name, topics=None):
+    """Register ``handler(events)`` as outbox consumer ``name``, optionally for some topics only."""
+    def register(handler):
+        CONSUMERS[name] = (handler, set(topics) if topics else None)
+        return handler
+    return register
+
+
+def publish(topic, subject_id, payload):
+    return publish_many([(topic, subject_id, payload)])[0]
+
+
+def publish_many(events):
+    """Publish ``(topic, subject_id, payload)`` tuples with one INSERT."""
+    now = timezone.now()
+    created = OutboxEvent.objects.bulk_create(
+        OutboxEvent(topic=topic, subject_id=subject_id, payload=payload, created_at=now)
+        for topic, subject_id, payload in events
+    )
+    live = [event for event in created if event.topic in ORDER_TOPICS]
+    if live:
+        transaction.on_commit(lambda: broadcast(live))
+    return created
+
+
+def order_channels(event):
+    """Live-stream channels for an order event: all staff and the order's owner."""
+    channels = ['orders.staff']
+    if event.payload.get('user'):
+        channels.append(f"orders.user.{event.payload['user']}")
+    return channels
+
+
+def event_message(event):
+    return {
+        'id': event.pk,
+        'topic': event.topic,
+        'subject_id': event.subject_id,
+        'payload': event.payload,
+        'created_at': event.created_at,
+    }
+
+
+def broadcast(events):
+    """Push committed order events to live subscribers (``/api/orders/stream/``)."""
+    broker = get_broker()
+    for event in events:
+        message = event_message(event)
+        for channel in order_channels(event):
+            broker.publish(channel, message)
+
+
+def visible_events(after=0, limit=500):
+    settled = timezone.now() - timedelta(seconds=settings.OUTBOX_SETTLE_SECONDS)
+    return OutboxEvent.objects.filter(id__gt=after, created_at__lte=settled).order_by('id')[:limit]
+
+
+def dispatch(name, batch_size=500):
+    """Hand consumer ``name`` its next batch; returns how many events were read."""
+    handler, topics = CONSUMERS[name]
+    with transaction.atomic():
+        cursor, _ = OutboxCursor.objects.select_for_update().get_or_create(consumer=name)
+        events = list(visible_events(cursor.position, batch_size))
+        if not events:
+            return 0
+        wanted = [event for event in events if topics is None or event.topic in topics]
+        if wanted:
+            handler(wanted)
+        cursor.position = events[-1].id
+        cursor.save(update_fields=['position', 'updated_at'])
+    return len(events)
+
+
+def drain(name, batch_size=500):
+    total = 0
+    while True:
+        count = dispatch(name, batch_size)
+        if not count:
+            return total
+        total += count
+
+
+def prune(older_than):
+    """Delete events older than ``older_than`` that every registered consumer has read."""
+    positions = list(OutboxCursor.objects.filter(consumer__in=list(CONSUMERS)).values_list('position', flat=True))
+    if len(positions) < len(CONSUMERS):
+        return 0
+    events = OutboxEvent.objects.filter(created_at__lt=timezone.now() - older_than)
+    if positions:
+        events = events.filter(id__lte=min(positions))
+    return events.delete()[0]
@@ -0,0 +1,51 @@
+import codecs
+import re
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# orjson turns integers wider than 64 bits into floats; the stdlib keeps them exact.
+WIDE_INTEGER = re.compile(rb'\d{19}')
+
+
+class FastJSONParser(JSONParser):
+    """
+    ``JSONParser`` that decodes UTF-8 bodies with orjson.
+
+    orjson rejects ``NaN``/``Infinity`` just like DRF's strict mode.  Anything
+    it cannot handle (other charsets, wide integers, malformed input) is handed
+    to the stdlib parser, so accepted payloads and error messages stay the same.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read() if stream is not None else b''
+        if WIDE_INTEGER.search(body):
+            return super().parse(_Replay(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(_Replay(body), media_type, parser_context)
+
+
+class _Replay:
+    """Minimal file-like wrapper so the stdlib parser can re-read a consumed body."""
+
+    def __init__(self, body):
+        self.body = body
+
+    def read(self, size=-1):
+        body, self.body = self.body, b''
+        return body
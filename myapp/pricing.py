@@ -0,0 +1,165 @@
+"""
+Price history and scheduled price changes.
+
+Every price a product has had, or is scheduled to have, is a ``PriceHistory``
+row:
+
+* a base price applies from ``valid_from`` until the product's next base price;
+* a promotion applies from ``valid_from`` to ``valid_to`` and wins over the
+  base price while it runs (the latest-starting one if several overlap).
+
+``Product.price`` stays the current-price projection of that history, so the
+storefront, orders and sales keep reading one column, and
+``Product.next_price_change`` (indexed) says when the projection goes stale.
+``refresh_prices`` recomputes the projection for any set of products with one
+``UPDATE`` of correlated subqueries.  It runs when prices are recorded, from
+the ``prices.refresh`` task queued for every scheduled start and end, before
+product reads (``refresh_due``) and lazily (``ensure_current``) when an order
+or sale is priced, so a late or missing worker never lets a stale price be
+shown or charged.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from . import tasks
+from .models import PriceHistory, Product
+
+CENT = Decimal('0.01')
+
+
+def base_price_at(when):
+    return Subquery(
+        PriceHistory.objects.filter(product=OuterRef('pk'), kind=PriceHistory.BASE, valid_from__lte=when)
+        .order_by('-valid_from', '-id').values('price')[:1]
+    )
+
+
+def promotion_price_at(when):
+    return Subquery(
+        PriceHistory.objects.filter(
+            product=OuterRef('pk'), kind=PriceHistory.PROMOTION, valid_from__lte=when, valid_to__gt=when,
+        ).order_by('-valid_from', '-id').values('price')[:1]
+    )
+
+
+def price_at(when):
+    """Expression for a product's effective price at ``when``."""
+    return Coalesce(promotion_price_at(when), base_price_at(when), F('price'))
+
+
+def next_change_after(when):
+    starts = Subquery(
+        PriceHistory.objects.filter(product=OuterRef('pk'), valid_from__gt=when)
+        .order_by('valid_from').values('valid_from')[:1]
+    )
+    ends = Subquery(
+        PriceHistory.objects.filter(product=OuterRef('pk'), kind=PriceHistory.PROMOTION, valid_to__gt=when)
+        .order_by('valid_to').values('valid_to')[:1]
+    )
+    # The earlier of the two, or whichever exists (LEAST of a NULL is NULL on SQLite).
+    return Least(Coalesce(starts, ends), Coalesce(ends, starts))
+
+
+def prices_at(products, when):
+    """``{product_id: price}`` in effect at ``when`` for the ``products`` queryset."""
+    return dict(products.annotate(effective=price_at(when)).values_list('pk', 'effective'))
+
+
+def refresh_prices(products, now=None):
+    """Bring ``Product.price`` up to date for the ``products`` queryset in one statement."""
+    now = now or timezone.now()
+    return products.update(price=price_at(now), next_price_change=next_change_after(now), updated_at=now)
+
+
+def refresh_due(now=None):
+    """
+    Refresh every product whose scheduled price change has come.
+
+    Cheap when nothing is due (one indexed EXISTS), so product reads call it
+    and never show a price the checkout would not charge, worker or not.
+    """
+    now = now or timezone.now()
+    due = Product.objects.filter(next_price_change__lte=now)
+    if not due.exists():
+        return 0
+    return refresh_prices(due, now)
+
+
+def ensure_current(products, now=None):
+    """Refresh, in place, any of the (locked) ``products`` whose price change is due."""
+    now = now or timezone.now()
+    due = {product.pk: product for product in products if product.next_price_change and product.next_price_change <= now}
+    if not due:
+        return
+    refresh_prices(Product.objects.filter(pk__in=list(due)), now)
+    for pk, price, next_change in Product.objects.filter(pk__in=list(due)).values_list('pk', 'price', 'next_price_change'):
+        due[pk].price = due[pk]._loaded_price = price
+        due[pk].next_price_change = next_change
+
+
+def validate_window(kind, valid_from, valid_to):
+    if kind == PriceHistory.PROMOTION:
+        if valid_to is None:
+            raise ValueError('A promotion needs an end (valid_to).')
+        if valid_to <= valid_from:
+            raise ValueError('valid_to must be after valid_from.')
+    elif valid_to is not None:
+        raise ValueError('A base price has no end; it lasts until the next base price.')
+
+
+def set_prices(prices, kind=PriceHistory.BASE, valid_from=None, valid_to=None, user=None, note='', refresh=True):
+    """
+    Record ``{product_id: price}`` and return the products' current prices.
+
+    Prices starting now take effect immediately; later starts and ends are
+    applied by the ``prices.refresh`` task queued for those times.
+    """
+    now = timezone.now()
+    valid_from = valid_from or now
+    validate_window(kind, valid_from, valid_to)
+    if any(price < 0 for price in prices.values()):
+        raise ValueError('Prices cannot be negative.')
+    with transaction.atomic():
+        PriceHistory.objects.bulk_create([
+            PriceHistory(
+                product_id=pk, kind=kind, price=price, valid_from=valid_from, valid_to=valid_to,
+                note=note, created_by=user, created_at=now,
+            )
+            for pk, price in prices.items()
+        ], batch_size=1000)
+        if not refresh:
+            return dict(prices)
+        products = Product.objects.filter(pk__in=list(prices))
+        refresh_prices(products, now)
+        for boundary in {valid_from, valid_to} - {None}:
+            if boundary > now:
+                tasks.enqueue('prices.refresh', delay=boundary - now)
+        return dict(products.values_list('pk', 'price'))
+
+
+def reprice(products, percent, valid_from=None, valid_to=None, user=None, note=''):
+    """
+    Change the price of every product in the ``products`` queryset by ``percent``.
+
+    Without ``valid_to`` this sets new base prices from ``valid_from`` (default
+    now); with it, a promotion for that window.  The change is relative to the
+    base price in effect at ``valid_from``.  Set-based whatever the number of
+    products: one SELECT of base prices, one INSERT into the history and one
+    UPDATE of the projection.  Returns the number of products repriced.
+    """
+    percent = Decimal(percent)
+    if percent <= -100:
+        raise ValueError('percent must be greater than -100.')
+    factor = 1 + percent / 100
+    start = valid_from or timezone.now()
+    bases = products.order_by().annotate(base=Coalesce(base_price_at(start), F('price'))).values_list('pk', 'base')
+    prices = {pk: (base * factor).quantize(CENT, ROUND_HALF_UP) for pk, base in bases}
+    if prices:
+        kind = PriceHistory.PROMOTION if valid_to is not None else PriceHistory.BASE
+        set_prices(prices, kind, valid_from, valid_to, user=user, note=note)
+    return len(prices)
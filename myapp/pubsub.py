@@ -0,0 +1,146 @@
+"""
+Publish/subscribe for live streams (``/api/orders/stream/``).
+
+``get_broker()`` returns the backend named by ``PUBSUB_BACKEND``:
+
+* ``InMemoryBroker`` fans messages out to subscribers in the same process,
+  which suits a single ASGI worker;
+* ``RedisBroker`` (the default when ``REDIS_URL`` is set) publishes through
+  Redis, so subscribers in every worker receive messages published anywhere,
+  including by the task worker.
+
+Subscribers are asyncio consumers (SSE responses) while publishers run in
+request/worker threads, so delivery hops onto the subscriber's event loop.
+"""
+
+import asyncio
+from collections import defaultdict
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+RESYNC = {'topic': 'resync'}
+
+
+class Subscription:
+    """A bounded queue of messages for one subscriber on its event loop."""
+
+    def __init__(self, broker, channels, maxsize):
+        self.broker = broker
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self.put, message)
+        except RuntimeError:
+            # The subscriber's loop is gone; it will never read again.
+            self.close()
+
+    def put(self, message):
+        if self.queue.full():
+            # A slow client: drop the backlog and ask it to refetch.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def subscribe(self, channels, maxsize=100):
+        """Subscribe the running event loop to ``channels``."""
+        subscription = Subscription(self, list(channels), maxsize)
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscribers[channel]
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+
+class RedisBroker(InMemoryBroker):
+    """
+    Publishes through Redis; each process relays what it hears to its own subscribers.
+
+    The relay is a daemon thread started by the first subscription, so
+    processes that only publish (the task worker) never listen.
+    """
+
+    prefix = 'vunjabei:pubsub:'
+
+    def __init__(self):
+        super().__init__()
+        if redis is None:
+            raise RuntimeError('RedisBroker needs the redis package: pip install redis')
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+        self.relay = None
+
+    def subscribe(self, channels, maxsize=100):
+        with self.lock:
+            if self.relay is None:
+                self.relay = threading.Thread(target=self.listen, name='pubsub-relay', daemon=True)
+                self.relay.start()
+        return super().subscribe(channels, maxsize)
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, json.dumps(message, cls=DjangoJSONEncoder))
+
+    def listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.prefix + '*')
+                for item in pubsub.listen():
+                    channel = item['channel'].decode()[len(self.prefix):]
+                    super().publish(channel, json.loads(item['data']))
+            except redis.RedisError:
+                # Messages sent while disconnected are lost; clients catch up
+                # from the outbox when they reconnect.
+                logger.exception('Lost the Redis pub/sub connection; reconnecting.')
+                time.sleep(1)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.PUBSUB_BACKEND)()
+    return _broker
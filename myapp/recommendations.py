@@ -0,0 +1,145 @@
+"""
+"Frequently bought together" recommendations.
+
+A basket is one POS ``Sale`` or a run of online orders by one customer, each
+placed within ``RECOMMENDATION_ORDER_WINDOW_HOURS`` of the one before.  Baskets are turned into
+sparse (basket, product) pairs and product co-occurrence counts are built
+with NumPy, a chunk of baskets at a time, without a dense products x
+products matrix.  ``build_recommendations`` stores the top-K neighbours of
+every product in ``RelatedProduct`` so the API reads them with one indexed query.
+"""
+
+from django.conf import settings
+from django.db import transaction
+
+from . import archive
+from .models import Order, RelatedProduct, SaleItem
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("Recommendations need NumPy: pip install numpy")
+
+
+def load_baskets(window_hours):
+    """Return ``(basket_ids, product_ids)`` arrays, one row per distinct pair."""
+    # Archived rows keep their ids, so sale ids stay unique across both tables.
+    sale_rows = [
+        row
+        for queryset in archive.across_history(SaleItem, lambda items: items.order_by().values_list('sale_id', 'product_id'))
+        for row in queryset.iterator()
+    ]
+    order_rows = [
+        row
+        for queryset in archive.across_history(Order, lambda orders: (
+            orders.exclude(status='Cancelled').order_by().values_list('user_id', 'date_ordered', 'product_id')
+        ))
+        for row in queryset.iterator()
+    ]
+
+    baskets = [np.fromiter((row[0] for row in sale_rows), dtype=np.int64, count=len(sale_rows))]
+    products = [np.fromiter((row[1] for row in sale_rows), dtype=np.int64, count=len(sale_rows))]
+    if order_rows:
+        users = np.fromiter((row[0] for row in order_rows), dtype=np.int64, count=len(order_rows))
+        times = np.fromiter((row[1].timestamp() for row in order_rows), dtype=np.float64, count=len(order_rows))
+        # Walk each customer's orders in time order; a gap longer than the
+        # window, or a new customer, starts a new basket.
+        order = np.lexsort((times, users))
+        users, times = users[order], times[order]
+        starts = np.ones(len(order), dtype=bool)
+        starts[1:] = (users[1:] != users[:-1]) | (np.diff(times) > window_hours * 3600)
+        session = np.empty(len(order), dtype=np.int64)
+        session[order] = np.cumsum(starts) - 1
+        offset = baskets[0].max() + 1 if len(sale_rows) else 0
+        baskets.append(session + offset)
+        products.append(np.fromiter((row[2] for row in order_rows), dtype=np.int64, count=len(order_rows)))
+
+    pairs = np.unique(np.column_stack([np.concatenate(baskets), np.concatenate(products)]), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def cooccurrence(basket_ids, items, item_count, max_basket=50, chunk_pairs=5_000_000):
+    """
+    Sparse co-occurrence counts as ``(item_a, item_b, count)`` arrays, a != b.
+
+    ``basket_ids`` must be sorted and ``items`` are dense indexes below
+    ``item_count``.  Baskets larger than ``max_basket`` (bulk purchases)
+    are skipped, and pairs are expanded a chunk of baskets at a time so
+    memory stays bounded by ``chunk_pairs``.
+    """
+    _, starts, sizes = np.unique(basket_ids, return_index=True, return_counts=True)
+    keep = (sizes > 1) & (sizes <= max_basket)
+    starts, sizes = starts[keep], sizes[keep]
+
+    keys, counts = [], []
+    pair_totals = np.cumsum(sizes.astype(np.int64) ** 2)
+    first = 0
+    while first < len(starts):
+        base = pair_totals[first - 1] if first else 0
+        last = max(first + 1, int(np.searchsorted(pair_totals, base + chunk_pairs, side='right')))
+        chunk_starts, chunk_sizes = starts[first:last], sizes[first:last]
+
+        # Pair every row of a basket with every row of the same basket.
+        row_sizes = np.repeat(chunk_sizes, chunk_sizes)
+        row_starts = np.repeat(chunk_starts, chunk_sizes)
+        positions = row_starts + np.arange(len(row_sizes)) - np.repeat(np.cumsum(chunk_sizes) - chunk_sizes, chunk_sizes)
+        owners = np.repeat(positions, row_sizes)
+        block_starts = np.cumsum(row_sizes) - row_sizes
+        partners = np.repeat(row_starts, row_sizes) + np.arange(len(owners)) - np.repeat(block_starts, row_sizes)
+
+        a, b = items[owners], items[partners]
+        distinct = a != b
+        chunk_keys, chunk_counts = np.unique(a[distinct] * item_count + b[distinct], return_counts=True)
+        keys.append(chunk_keys)
+        counts.append(chunk_counts)
+        first = last
+
+    if not keys:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    totals = np.bincount(inverse.reshape(-1), weights=np.concatenate(counts)).astype(np.int64)
+    return keys // item_count, keys % item_count, totals
+
+
+def top_neighbours(a, b, together, frequency, top_k, min_support=1):
+    """Rank each item's neighbours by cosine similarity; return the top ``top_k`` rows."""
+    keep = together >= min_support
+    a, b, together = a[keep], b[keep], together[keep]
+    score = together / np.sqrt(frequency[a] * frequency[b])
+    order = np.lexsort((b, -together, -score, a))
+    a, b, together, score = a[order], b[order], together[order], score[order]
+    group_start = np.searchsorted(a, a, side='left')
+    rank = np.arange(len(a)) - group_start
+    keep = rank < top_k
+    return a[keep], b[keep], rank[keep] + 1, score[keep], together[keep]
+
+
+def build_recommendations(top_k=None, window_hours=None, min_support=None):
+    """Rebuild ``RelatedProduct`` from sales and orders; returns the number of rows stored."""
+    require_numpy()
+    top_k = top_k or settings.RECOMMENDATION_TOP_K
+    window_hours = window_hours or settings.RECOMMENDATION_ORDER_WINDOW_HOURS
+    min_support = min_support or settings.RECOMMENDATION_MIN_SUPPORT
+
+    basket_ids, product_ids = load_baskets(window_hours)
+    catalog, items = np.unique(product_ids, return_inverse=True)
+    items = items.reshape(-1)
+    frequency = np.bincount(items, minlength=len(catalog)).astype(np.float64)
+
+    a, b, together = cooccurrence(basket_ids, items, max(len(catalog), 1))
+    a, b, rank, score, together = top_neighbours(a, b, together, frequency, top_k, min_support)
+
+    rows = [
+        RelatedProduct(product_id=int(catalog[i]), related_id=int(catalog[j]), rank=int(r), score=float(s), together=int(t))
+        for i, j, r, s, t in zip(a, b, rank, score, together)
+    ]
+    with transaction.atomic():
+        RelatedProduct.objects.all().delete()
+        RelatedProduct.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
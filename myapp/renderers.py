@@ -0,0 +1,47 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's ``JSONRenderer`` backed by orjson.
+
+    orjson handles str/int/float/list/dict/datetime natively; everything else
+    (``Decimal``, lazy translation strings, querysets, ...) is routed through
+    DRF's own ``JSONEncoder.default`` so the output matches the stdlib
+    renderer byte for byte.  Pretty-printing, ``ensure_ascii`` and
+    non-compact output, or any value orjson refuses (e.g. integers wider than
+    64 bits), fall back to the stdlib path.
+    """
+    encoder = encoders.JSONEncoder()
+
+    def can_use_orjson(self, indent):
+        return orjson is not None and indent is None and self.compact and not self.ensure_ascii
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if not self.can_use_orjson(indent):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder.default,
+                option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same as JSONRenderer: keep the output a strict JavaScript subset.
+        if b'\xe2\x80' in ret:
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
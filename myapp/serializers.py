@@ -1,16 +1,38 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Category, Product, Customer, Sale, SaleItem
+from .categories import validate_parent
+from .models import Category, Product, Customer, OutboxEvent, PriceHistory, ReorderSuggestion, Sale, SaleItem, StockAlertEvent, StockMovement
+from .fieldsets import SparseFieldsetSerializerMixin
+from .inventory import apply_stock_changes
+from .pricing import ensure_current, validate_window
 from django.contrib.auth.models import User
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'parent', 'path', 'reorder_threshold', 'product_count', 'in_stock_count', 'updated_at']
+        read_only_fields = ['path', 'product_count', 'in_stock_count', 'updated_at']
+
+    def validate(self, attrs):
+        parent = attrs.get('parent', self.instance.parent if self.instance else None)
+        try:
+            validate_parent(self.instance.pk if self.instance else None, parent.pk if parent else None)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.message_dict)
+        return attrs
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
+    # Only rendered with ?expand=category_detail.
+    category_detail = CategorySerializer(source='category', read_only=True)
     image = serializers.SerializerMethodField()
 
     class Meta:
@@ -18,15 +40,24 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = [
             'id',
             'name',
+            'sku',
             'category',
             'category_name',
+            'category_detail',
             'price',
             'quantity',
+            'reorder_threshold',
             'image',
             'created_at',
             'updated_at',
         ]
         read_only_fields = ['created_at', 'updated_at']
+        field_sources = {'image': ['image']}
+        expandable_fields = ['category_detail']
+
+    def validate_sku(self, value):
+        # Blank SKUs are stored as NULL so they do not collide on the unique index.
+        return value or None
 
     def get_image(self, obj):
         """Return a fully qualified URL for the product image.
@@ -62,7 +93,6 @@ class ProductSerializer(serializers.ModelSerializer):
 
         # 2. SAFETY NET: If we are on Render (USE_CLOUDINARY is True) but got a relative path,
         # force construct the Cloudinary URL. This fixes the "disappearing image" issue.
-        from django.conf import settings
         if getattr(settings, 'USE_CLOUDINARY', False):
             cloud_name = settings.CLOUDINARY_STORAGE.get('CLOUD_NAME')
 
@@ -80,7 +110,7 @@ class ProductSerializer(serializers.ModelSerializer):
         return url
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = ['id', 'name', 'phone', 'address', 'created_at']
@@ -88,29 +118,100 @@ class CustomerSerializer(serializers.ModelSerializer):
 
 
 class SaleItemSerializer(serializers.ModelSerializer):
+    # Plain ids: validating a PrimaryKeyRelatedField costs one query per line,
+    # SaleSerializer.create resolves every product in a single locked query.
+    product = serializers.IntegerField(source='product_id')
     product_name = serializers.CharField(source='product.name', read_only=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+    quantity = serializers.IntegerField(min_value=1)
     total = serializers.SerializerMethodField()
 
     class Meta:
         model = SaleItem
         fields = ['id', 'product', 'product_name', 'quantity', 'price', 'total']
+        field_sources = {'total': ['price', 'quantity']}
 
     def get_total(self, obj):
         return obj.get_total()
 
 
-class SaleSerializer(serializers.ModelSerializer):
-    items = SaleItemSerializer(many=True, read_only=True)
+class SaleSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """
+    Sales with nested line items.
+
+    POST accepts ``items: [{product, quantity, price?}]``; the sale, its items
+    and the stock decrements are written in one transaction and
+    ``total_amount`` is computed from the lines (``price`` defaults to the
+    product's current price).  Updates may change the header but not the lines.
+    """
+    items = SaleItemSerializer(many=True, required=False)
     user_name = serializers.CharField(source='user.username', read_only=True)
     customer_name = serializers.CharField(source='customer.name', read_only=True, allow_null=True)
 
     class Meta:
         model = Sale
         fields = ['id', 'user', 'user_name', 'customer', 'customer_name', 'date', 'total_amount', 'items']
-        read_only_fields = ['date']
+        read_only_fields = ['date', 'total_amount']
+        extra_kwargs = {'user': {'required': False}}
+
+    def validate_items(self, items):
+        # Only called when the request sends ``items``.
+        if self.instance is not None:
+            raise serializers.ValidationError('Line items cannot be changed after a sale is recorded.')
+        return items
+
+    def validate(self, attrs):
+        if self.instance is None and not attrs.get('items'):
+            raise serializers.ValidationError({'items': 'A sale needs at least one item.'})
+        return attrs
+
+    def create(self, validated_data):
+        items_data = validated_data.pop('items')
+        needed = defaultdict(int)
+        for item in items_data:
+            needed[item['product_id']] += item['quantity']
+
+        with transaction.atomic():
+            products = Product.objects.select_for_update().in_bulk(list(needed))
+            ensure_current(products.values())
+            errors = []
+            for product_id, quantity in needed.items():
+                product = products.get(product_id)
+                if product is None:
+                    errors.append(f'Product {product_id} not found.')
+                elif product.quantity < quantity:
+                    errors.append(f'Insufficient stock for {product.name}.')
+            if errors:
+                raise serializers.ValidationError({'items': errors})
+
+            sale_items = [
+                SaleItem(
+                    product=products[item['product_id']],
+                    quantity=item['quantity'],
+                    price=item.get('price', products[item['product_id']].price),
+                )
+                for item in items_data
+            ]
+            validated_data['total_amount'] = sum((item.get_total() for item in sale_items), 0)
+            sale = Sale.objects.create(**validated_data)
+            for item in sale_items:
+                item.sale = sale
+            SaleItem.objects.bulk_create(sale_items)
+
+            apply_stock_changes(
+                {product_id: -quantity for product_id, quantity in needed.items()},
+                StockMovement.SALE,
+                reference_id=sale.pk,
+                user=sale.user,
+            )
+        return sale
 
+    def update(self, instance, validated_data):
+        validated_data.pop('items', None)
+        return super().update(instance, validated_data)
 
-class SaleDetailSerializer(serializers.ModelSerializer):
+
+class SaleDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     items = SaleItemSerializer(many=True)
 
     class Meta:
@@ -118,6 +219,73 @@ class SaleDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'customer', 'date', 'total_amount', 'items']
 
 
+class StockMovementSerializer(serializers.ModelSerializer):
+    user_name = serializers.CharField(source='user.username', read_only=True, allow_null=True)
+
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'product', 'kind', 'quantity', 'reference_id', 'user', 'user_name', 'note', 'created_at']
+
+
+class PriceHistorySerializer(serializers.ModelSerializer):
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'))
+
+    class Meta:
+        model = PriceHistory
+        fields = ['id', 'product', 'kind', 'price', 'valid_from', 'valid_to', 'note', 'created_by', 'created_at']
+        read_only_fields = ['product', 'created_by', 'created_at']
+        extra_kwargs = {'valid_from': {'required': False}}
+
+    def validate(self, attrs):
+        check_price_window(attrs.get('kind', PriceHistory.BASE), attrs.get('valid_from'), attrs.get('valid_to'))
+        return attrs
+
+
+class RepriceSerializer(serializers.Serializer):
+    """``percent`` change for a category; with ``valid_to`` it is a promotion."""
+    percent = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=Decimal('-99.99'))
+    valid_from = serializers.DateTimeField(required=False)
+    valid_to = serializers.DateTimeField(required=False)
+    note = serializers.CharField(max_length=255, required=False, default='')
+
+    def validate(self, attrs):
+        kind = PriceHistory.PROMOTION if attrs.get('valid_to') else PriceHistory.BASE
+        check_price_window(kind, attrs.get('valid_from'), attrs.get('valid_to'))
+        return attrs
+
+
+def check_price_window(kind, valid_from, valid_to):
+    try:
+        validate_window(kind, valid_from or timezone.now(), valid_to)
+    except ValueError as exc:
+        raise serializers.ValidationError({'valid_to': str(exc)})
+
+
+class StockAlertEventSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = StockAlertEvent
+        fields = ['id', 'product', 'product_name', 'kind', 'quantity', 'threshold', 'created_at']
+
+
+class ReorderSuggestionSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = ReorderSuggestion
+        fields = [
+            'product', 'product_name', 'on_hand', 'avg_daily_7', 'avg_daily_28',
+            'forecast_daily', 'days_of_cover', 'suggested_quantity', 'generated_at',
+        ]
+
+
+class OutboxEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OutboxEvent
+        fields = ['id', 'topic', 'subject_id', 'payload', 'created_at']
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
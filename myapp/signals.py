@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .archive import is_archiving
+from .authentication import forget_user
+from .categories import category_deleted, product_counts_changed
+from .models import Category, Order, Product, Tombstone
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def record_tombstone(sender, instance, **kwargs):
+    if is_archiving():
+        # Moved to the archive tables, still part of the history.
+        return
+    # Delta sync clients learn about deletions from these rows.
+    Tombstone.objects.create(
+        model=sender._meta.label_lower,
+        object_id=instance.pk,
+        owner_id=getattr(instance, 'user_id', None),
+    )
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_counts(sender, instance, **kwargs):
+    product_counts_changed([(instance.category_id, instance.quantity, None, None)])
+
+
+@receiver(pre_delete, sender=Category)
+def remove_category_from_counts(sender, instance, **kwargs):
+    # Before the delete, while the path and counts can still be read.
+    category_deleted(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
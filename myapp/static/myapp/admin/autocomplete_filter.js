@@ -0,0 +1,13 @@
+'use strict';
+{
+    // Reload the changelist when a value is picked in an AutocompleteFilter.
+    const $ = django.jQuery;
+    $(document).on('change', '.autocomplete-filter select', function() {
+        const box = this.closest('.autocomplete-filter');
+        const params = new URLSearchParams(box.dataset.baseQuery);
+        if (this.value) {
+            params.set(box.dataset.param, this.value);
+        }
+        window.location.search = params.toString();
+    });
+}
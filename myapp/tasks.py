@@ -0,0 +1,158 @@
+"""
+Database-backed background jobs.
+
+Views call ``enqueue('name', {...})`` to write a ``Task`` row in the current
+transaction, so a job exists exactly when the data it refers to was
+committed, and return immediately.  ``manage.py run_worker`` claims ready
+tasks in batches (``SELECT ... FOR UPDATE SKIP LOCKED`` where the database
+supports it, a compare-and-set UPDATE elsewhere, e.g. SQLite), runs them,
+retries failures with exponential backoff and moves tasks that run out of
+attempts to ``DeadTask``.
+"""
+
+import base64
+from datetime import timedelta
+import logging
+import traceback
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DeadTask, Product, Task
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name, max_attempts=5):
+    """Register a function as the handler for task ``name``; it receives the payload as kwargs."""
+    def register(func):
+        func.task_name = name
+        func.max_attempts = max_attempts
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, delay=None):
+    """
+    Queue task ``name`` to run after ``delay``.
+
+    With ``TASKS_ALWAYS_EAGER`` a task without a delay runs after commit
+    instead; delayed tasks are always queued, since running them early would
+    do their work before it is due.
+    """
+    func = TASKS[name]
+    payload = payload or {}
+    if settings.TASKS_ALWAYS_EAGER and not delay:
+        transaction.on_commit(lambda: func(**payload))
+        return None
+    run_at = timezone.now() + (delay or timedelta())
+    return Task.objects.create(name=name, payload=payload, max_attempts=func.max_attempts, run_at=run_at)
+
+
+def claim_tasks(worker, limit=10):
+    """Mark up to ``limit`` ready tasks as running for ``worker`` and return them."""
+    now = timezone.now()
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'[-64:]
+    with transaction.atomic():
+        ready = Task.objects.filter(status=Task.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            ready = ready.select_for_update(skip_locked=True)
+        ids = list(ready.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        # The status filter makes this a compare-and-set where rows cannot be
+        # locked: a task another worker claimed first is simply not updated.
+        Task.objects.filter(id__in=ids, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+        )
+    return list(Task.objects.filter(locked_by=token, status=Task.RUNNING).order_by('run_at', 'id'))
+
+
+def run_task(task):
+    """Run a claimed task; returns True on success."""
+    func = TASKS.get(task.name)
+    try:
+        if func is None:
+            raise LookupError(f'No handler registered for task {task.name!r}')
+        with transaction.atomic():
+            func(**task.payload)
+    except Exception:
+        fail_task(task, traceback.format_exc())
+        return False
+    Task.objects.filter(pk=task.pk).delete()
+    return True
+
+
+def fail_task(task, error):
+    if task.attempts >= task.max_attempts:
+        logger.error('Task %s #%s moved to dead letters after %s attempts', task.name, task.pk, task.attempts)
+        with transaction.atomic():
+            DeadTask.objects.create(
+                name=task.name, payload=task.payload, attempts=task.attempts,
+                last_error=error, created_at=task.created_at,
+            )
+            Task.objects.filter(pk=task.pk).delete()
+        return
+
+    backoff = min(settings.TASKS_RETRY_BACKOFF * 2 ** (task.attempts - 1), 3600)
+    logger.warning('Task %s #%s failed (attempt %s), retrying in %ss', task.name, task.pk, task.attempts, backoff)
+    Task.objects.filter(pk=task.pk).update(
+        status=Task.QUEUED, locked_by='', locked_at=None, last_error=error,
+        run_at=timezone.now() + timedelta(seconds=backoff),
+    )
+
+
+def requeue_stale(timeout=None):
+    """Return tasks whose worker died mid-run (locked longer than ``timeout`` seconds) to the queue."""
+    timeout = timeout or settings.TASKS_LOCK_TIMEOUT
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Task.objects.filter(status=Task.RUNNING, locked_at__lt=cutoff).update(
+        status=Task.QUEUED, locked_by='', locked_at=None,
+    )
+
+
+def run_pending(worker='inline', limit=100):
+    """Run every task that is ready now; returns the number processed."""
+    processed = 0
+    while True:
+        claimed = claim_tasks(worker, limit)
+        if not claimed:
+            return processed
+        for claimed_task in claimed:
+            run_task(claimed_task)
+        processed += len(claimed)
+
+
+# Side effects moved out of the request/response cycle.
+
+def defer_product_image(product, upload):
+    """Upload ``upload`` to ``product.image`` from the worker instead of the request."""
+    return enqueue('products.attach_image', {
+        'product_id': product.pk,
+        'filename': upload.name,
+        'content': base64.b64encode(upload.read()).decode('ascii'),
+    })
+
+
+@task('products.attach_image', max_attempts=8)
+def attach_product_image(product_id, filename, content):
+    product = Product.objects.filter(pk=product_id).first()
+    if product is None:
+        return
+    product.image.save(filename, ContentFile(base64.b64decode(content)), save=False)
+    product.save(update_fields=['image', 'updated_at'])
+
+
+@task('prices.refresh')
+def refresh_due_prices():
+    # Queued for each scheduled price start/end; see pricing.py.
+    from .pricing import refresh_due
+    refresh_due()
+
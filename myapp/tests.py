@@ -1,10 +1,68 @@
-from django.test import TestCase
+import asyncio
+import csv
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
 from rest_framework.test import APIClient, APIRequestFactory
-from .models import Category, Product
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .admin_tools import EstimatedCountPaginator
+from .archive import archive_orders, archive_sales, cutoff
+from .authentication import CachedJWTAuthentication, CachedModelBackend
+from .categories import rebuild_tree
+from .coalescing import coalesce, coalescing_stats, publish, request_key
+from .forecasting import compute_forecasts, run_forecast
+from .inventory import apply_stock_changes, stock_as_of, take_snapshots
+from .management.commands.startup_profile import parse_importtime
+from .middleware import CompressionMiddleware, brotli
+from .models import (
+    ArchivedOrder, ArchivedSaleItem, Category, Customer, DeadTask, LowStockAlert, Order, OutboxCursor, OutboxEvent,
+    PriceHistory, Product, ReorderSuggestion, Sale, SaleItem, StockMovement, StockSnapshot, Task, Tombstone,
+)
+from .orders import transition_orders
+from .outbox import CONSUMERS, ORDER_STATUS_CHANGED, broadcast, consumer, dispatch
+from .parsers import FastJSONParser
+from .pricing import prices_at, refresh_due, set_prices
+from .pubsub import get_broker
+from .recommendations import load_baskets
+from .renderers import FastJSONRenderer
 from .serializers import ProductSerializer
-from decimal import Decimal
+from .snapshots import pa, pq
+from .tasks import TASKS, claim_tasks, enqueue, run_pending, run_task, task
+from .throttling import MemoryBucketStore
+from .views import missed_order_events, order_event_lines
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
 class CategoryModelTest(TestCase):
     def setUp(self):
@@ -92,7 +150,6 @@ class ProductSerializerTest(TestCase):
 
     def test_save_strips_full_url_from_name(self):
         """Product.save() removes MEDIA_URL or http prefix from image name."""
-        from django.conf import settings
         p = Product(
             name='Foo',
             category=self.category,
@@ -170,3 +227,1151 @@ class OrderApiAuthTest(TestCase):
         resp2 = self.client.post('/api/login/', {'username': 'customer1', 'password': 'wrong'}, format='json')
         self.assertEqual(resp2.status_code, 400)
         self.assertIn('error', resp2.data)
+
+
+class StartupProfileTest(TestCase):
+    def test_parse_importtime_skips_header_and_keeps_nesting_names(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     encodings.idna\n"
+            "import time:      2000 |       5000 | django\n"
+            "some unrelated warning\n"
+        )
+        self.assertEqual(parse_importtime(stderr), [('encodings.idna', 120, 120), ('django', 2000, 5000)])
+
+    def test_optional_integrations_not_imported_by_settings(self):
+        self.assertNotIn('dj_database_url', sys.modules)
+        self.assertNotIn('cloudinary_storage', sys.modules)
+
+
+class FastJSONRendererTest(TestCase):
+    def test_output_matches_stdlib_renderer(self):
+        data = {
+            'price': Decimal('12.50'),
+            'date': datetime(2024, 5, 1, 8, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'day': date(2024, 5, 1),
+            'label': gettext_lazy('Pending'),
+            'note': 'line separator',
+            1: [None, True, 1.5],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back_to_stdlib(self):
+        data = {'a': [1, 2]}
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type),
+        )
+
+    def test_parser_handles_big_integers_and_rejects_nan(self):
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO(b'{"n": 123456789012345678901234567890}')), {'n': 123456789012345678901234567890})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"n": NaN}'))
+
+
+class CompressionMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name="Bulk")
+        Product.objects.bulk_create([
+            Product(name=f"Shirt {i}", category=category, price=Decimal('5000.00'), quantity=20)
+            for i in range(30)
+        ])
+
+    def test_large_api_response_is_gzipped(self):
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_brotli_preferred_when_accepted(self):
+        if brotli is None:
+            self.skipTest('brotli not installed')
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+    def test_small_and_unaccepted_responses_untouched(self):
+        response = self.client.get('/api/health/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_response_is_compressed(self):
+        request = RequestFactory().get('/api/export/', HTTP_ACCEPT_ENCODING='gzip')
+        middleware = CompressionMiddleware(lambda req: StreamingHttpResponse(iter([b'id,name\n', b'1,Cap\n'])))
+        response = middleware(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'id,name\n1,Cap\n')
+
+
+class SparseFieldsetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(username="staff", password="pass12345", is_staff=True)
+        category = Category.objects.create(name="Jackets")
+        self.product = Product.objects.create(name="Parka", category=category, price=Decimal('90.00'), quantity=4)
+        sale = Sale.objects.create(user=self.staff_user, total_amount=Decimal('180.00'))
+        SaleItem.objects.create(sale=sale, product=self.product, quantity=2, price=Decimal('90.00'))
+
+    def test_product_fields_are_pruned_and_sql_trimmed(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/products/', {'fields': 'id,name,price,image'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'price', 'image'})
+        select_sql = ctx.captured_queries[-1]['sql']
+        self.assertNotIn('myapp_category', select_sql)
+        self.assertNotIn('"myapp_product"."updated_at"', select_sql)
+
+    def test_category_name_still_joined_when_requested(self):
+        response = self.client.get('/api/products/', {'fields': 'id,category_name'})
+        self.assertEqual(response.data['results'][0], {'id': self.product.id, 'category_name': 'Jackets'})
+
+    def test_category_detail_is_opt_in_and_joined(self):
+        response = self.client.get('/api/products/')
+        self.assertNotIn('category_detail', response.data['results'][0])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/products/', {'fields': 'id,name', 'expand': 'category_detail'})
+        product = response.data['results'][0]
+        self.assertEqual(set(product), {'id', 'name', 'category_detail'})
+        self.assertEqual(product['category_detail']['name'], 'Jackets')
+        # Joined into the product select, no per-row category lookups.
+        select_sql = ctx.captured_queries[-1]['sql']
+        self.assertIn('JOIN "myapp_category"', select_sql)
+        self.assertNotIn('"myapp_product"."updated_at"', select_sql)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('SELECT "myapp_category"')])
+
+    def test_sale_items_nested_unless_pruned(self):
+        self.client.force_authenticate(self.staff_user)
+        response = self.client.get('/api/sales/')
+        self.assertEqual(response.data['results'][0]['items'][0]['product_name'], 'Parka')
+
+        response = self.client.get('/api/sales/', {'fields': 'id,total_amount'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'total_amount'})
+
+        response = self.client.get('/api/sales/', {'fields': 'id,total_amount,items'})
+        sale = response.data['results'][0]
+        self.assertEqual(set(sale), {'id', 'total_amount', 'items'})
+        self.assertEqual(sale['items'][0]['total'], Decimal('180.00'))
+
+
+class SaleApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(username="cashier", password="pass12345", is_staff=True)
+        self.client.force_authenticate(self.staff_user)
+        category = Category.objects.create(name="Shoes")
+        self.boots = Product.objects.create(name="Boots", category=category, price=Decimal('40.00'), quantity=10)
+        self.sandals = Product.objects.create(name="Sandals", category=category, price=Decimal('15.00'), quantity=3)
+        for _ in range(3):
+            sale = Sale.objects.create(user=self.staff_user, total_amount=Decimal('55.00'))
+            SaleItem.objects.create(sale=sale, product=self.boots, quantity=1, price=Decimal('40.00'))
+            SaleItem.objects.create(sale=sale, product=self.sandals, quantity=1, price=Decimal('15.00'))
+
+    def test_listing_with_items_uses_constant_queries(self):
+        # count + sales + one prefetch for items joined with products
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/sales/')
+        self.assertEqual(len(response.data['results'][0]['items']), 2)
+        with self.assertNumQueries(2):
+            self.client.get(f"/api/sales/{response.data['results'][0]['id']}/")
+
+    def test_create_sale_with_nested_items(self):
+        response = self.client.post('/api/sales/', {
+            'items': [
+                {'product': self.boots.id, 'quantity': 2},
+                {'product': self.sandals.id, 'quantity': 1, 'price': '12.00'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['total_amount'], '92.00')
+        self.assertEqual(response.data['user'], self.staff_user.id)
+        self.assertEqual(len(response.data['items']), 2)
+
+        self.boots.refresh_from_db()
+        self.sandals.refresh_from_db()
+        self.assertEqual((self.boots.quantity, self.sandals.quantity), (8, 2))
+
+    def test_create_sale_rejects_insufficient_stock_atomically(self):
+        before = Sale.objects.count()
+        response = self.client.post('/api/sales/', {
+            'items': [
+                {'product': self.boots.id, 'quantity': 1},
+                {'product': self.sandals.id, 'quantity': 4},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+        self.assertEqual(Sale.objects.count(), before)
+        self.boots.refresh_from_db()
+        self.assertEqual(self.boots.quantity, 10)
+
+    def test_update_changes_header_but_not_items(self):
+        sale = Sale.objects.first()
+        customer = Customer.objects.create(name="Rehema")
+
+        response = self.client.put(f'/api/sales/{sale.id}/', {'customer': customer.id}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['customer'], customer.id)
+
+        response = self.client.put(f'/api/sales/{sale.id}/', {'customer': customer.id, 'items': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+        self.assertEqual(self.client.post('/api/sales/', {}, format='json').status_code, 400)
+
+
+class StockLedgerTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(username="stockist", password="pass12345", is_staff=True)
+        self.customer_user = User.objects.create_user(username="buyer", password="pass12345")
+        self.product = Product.objects.create(name="Scarf", price=Decimal('8.00'), quantity=10)
+
+    def kinds(self):
+        return list(
+            StockMovement.objects.filter(product=self.product).order_by('id').values_list('kind', 'quantity')
+        )
+
+    def test_creation_edits_orders_and_restocks_are_logged(self):
+        self.product.quantity = 12
+        self.product.save()
+
+        self.client.force_authenticate(self.customer_user)
+        response = self.client.post('/api/place-order/', {'product_id': self.product.id, 'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.client.force_authenticate(self.staff_user)
+        response = self.client.post(f'/api/products/{self.product.id}/restock/', {'quantity': 5}, format='json')
+        self.assertEqual(response.data['quantity'], 14)
+
+        self.assertEqual(self.kinds(), [('restock', 10), ('adjustment', 2), ('order', -3), ('restock', 5)])
+
+    def test_ledger_endpoints_404_for_unknown_products(self):
+        self.client.force_authenticate(self.staff_user)
+        for pk in (999999, 'abc'):
+            self.assertEqual(self.client.get(f'/api/products/{pk}/movements/').status_code, 404)
+            self.assertEqual(self.client.get(f'/api/products/{pk}/stock_as_of/').status_code, 404)
+
+    def test_movements_are_append_only(self):
+        movement = StockMovement.objects.get(product=self.product)
+        movement.quantity = 99
+        with self.assertRaises(ValueError):
+            movement.save()
+
+    def test_stock_as_of_uses_snapshots_and_later_movements(self):
+        take_snapshots()
+        checkpoint = timezone.now()
+        apply_stock_changes({self.product.id: -4}, StockMovement.SALE)
+        take_snapshots()
+        apply_stock_changes({self.product.id: 7}, StockMovement.RESTOCK)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 13)
+        self.assertEqual(StockSnapshot.objects.filter(product=self.product).first().quantity, 6)
+        self.assertEqual(stock_as_of(self.product.id, checkpoint), 10)
+        self.assertEqual(stock_as_of(self.product.id, timezone.now() + timedelta(seconds=1)), 13)
+
+
+class OrderStatusTransitionTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(username="dispatcher", password="pass12345", is_staff=True)
+        customer = User.objects.create_user(username="shopper", password="pass12345")
+        self.hat = Product.objects.create(name="Hat", price=Decimal('5.00'), quantity=0)
+        self.belt = Product.objects.create(name="Belt", price=Decimal('7.00'), quantity=1)
+        self.orders = [
+            Order.objects.create(product=self.hat, user=customer, quantity=2),
+            Order.objects.create(product=self.hat, user=customer, quantity=3),
+            Order.objects.create(product=self.belt, user=customer, quantity=1, status='Shipped'),
+        ]
+        self.client.force_authenticate(self.staff_user)
+
+    def test_bulk_cancel_restores_stock_with_one_movement_per_order(self):
+        response = self.client.post('/api/orders/bulk-update-status/', {
+            'order_ids': [self.orders[0].id, self.orders[1].id],
+            'status': 'Cancelled',
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(sorted(response.data['updated']), [self.orders[0].id, self.orders[1].id])
+
+        self.hat.refresh_from_db()
+        self.assertEqual(self.hat.quantity, 5)
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(kind='cancellation').values_list('reference_id', 'quantity')),
+            [(self.orders[0].id, 2), (self.orders[1].id, 3)],
+        )
+
+    def test_invalid_transition_rejects_whole_batch(self):
+        response = self.client.post('/api/orders/bulk-update-status/', {
+            'updates': [
+                {'id': self.orders[0].id, 'status': 'Processing'},
+                {'id': self.orders[2].id, 'status': 'Pending'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.orders[2].id), {str(key) for key in response.data['errors']})
+        self.orders[0].refresh_from_db()
+        self.assertEqual(self.orders[0].status, 'Pending')
+
+    def test_single_update_uses_state_machine(self):
+        response = self.client.post(f'/api/orders/{self.orders[2].id}/update-status/', {'status': 'Delivered'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(f'/api/orders/{self.orders[2].id}/update-status/', {'status': 'Cancelled'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.belt.refresh_from_db()
+        self.assertEqual(self.belt.quantity, 1)
+
+    def test_bulk_update_requires_json_lists(self):
+        bad_bodies = [
+            ({'order_ids': f'{self.orders[0].id}{self.orders[1].id}', 'status': 'Cancelled'}, 'json'),
+            ({'order_ids': [str(self.orders[0].id)], 'status': 'Cancelled'}, 'json'),
+            ({'updates': {'id': self.orders[0].id, 'status': 'Cancelled'}}, 'json'),
+            ({'order_ids': [self.orders[0].id, self.orders[1].id], 'status': 'Cancelled'}, 'multipart'),
+        ]
+        for body, fmt in bad_bodies:
+            response = self.client.post('/api/orders/bulk-update-status/', body, format=fmt)
+            self.assertEqual(response.status_code, 400, body)
+        self.hat.refresh_from_db()
+        self.assertEqual(self.hat.quantity, 0)
+
+    def test_shipped_order_can_be_cancelled_and_pending_delivered(self):
+        response = self.client.post('/api/orders/bulk-update-status/', {
+            'updates': [
+                {'id': self.orders[0].id, 'status': 'Delivered'},
+                {'id': self.orders[2].id, 'status': 'Cancelled'},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.belt.refresh_from_db()
+        self.assertEqual(self.belt.quantity, 2)
+
+
+class LowStockWatchlistTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(username="planner", password="pass12345", is_staff=True)
+        self.client.force_authenticate(self.staff_user)
+        self.socks = Category.objects.create(name="Socks", reorder_threshold=20)
+        self.plenty = Product.objects.create(name="Wool Socks", category=self.socks, price=Decimal('3.00'), quantity=25)
+        self.scarce = Product.objects.create(name="Gloves", price=Decimal('9.00'), quantity=4)
+
+    def watchlist(self):
+        return dict(LowStockAlert.objects.values_list('product_id', 'threshold'))
+
+    def test_thresholds_fall_back_from_product_to_category_to_default(self):
+        self.assertEqual(self.watchlist(), {self.scarce.id: 10})
+        self.plenty.reorder_threshold = 30
+        self.plenty.save()
+        self.assertEqual(self.watchlist(), {self.scarce.id: 10, self.plenty.id: 30})
+
+    def test_stock_movements_update_watchlist_and_feed(self):
+        apply_stock_changes({self.plenty.id: -10, self.scarce.id: 10}, StockMovement.ADJUSTMENT)
+        self.assertEqual(self.watchlist(), {self.plenty.id: 20})
+
+        response = self.client.get('/api/stock-alerts/')
+        kinds = [(event['product'], event['kind']) for event in response.data['results']]
+        self.assertEqual(sorted(kinds[-2:]), sorted([(self.plenty.id, 'low'), (self.scarce.id, 'recovered')]))
+
+        response = self.client.get('/api/stock-alerts/', {'after': response.data['next_after']})
+        self.assertEqual(response.data['results'], [])
+
+    def test_low_stock_endpoint_and_dashboard_read_watchlist(self):
+        response = self.client.get('/api/products/low_stock/')
+        self.assertEqual([product['id'] for product in response.data], [self.scarce.id])
+
+        response = self.client.get('/api/dashboard-stats/')
+        self.assertEqual(response.data['low_stock_items'], [{'quantity': 4, 'id': self.scarce.id, 'name': 'Gloves'}])
+
+
+class DemandForecastTest(TestCase):
+    def setUp(self):
+        if np is None:
+            self.skipTest('numpy not installed')
+        self.np = np
+        self.staff_user = User.objects.create_user(username="buyer", password="pass12345", is_staff=True)
+        self.busy = Product.objects.create(name="Kitenge", price=Decimal('20.00'), quantity=10)
+        self.idle = Product.objects.create(name="Kikoi", price=Decimal('15.00'), quantity=10)
+
+    def test_constant_demand_forecasts_the_constant(self):
+        demand = self.np.full((2, 60), 3.0)
+        demand[1] = 0
+        result = compute_forecasts(demand, self.np.array([30, 5]), lead_time=7, cover_days=14)
+        self.assertAlmostEqual(result['forecast'][0], 3.0)
+        self.assertAlmostEqual(result['cover'][0], 10.0)
+        self.assertEqual(result['suggested'].tolist(), [3 * 21 - 30, 0])
+        self.assertTrue(self.np.isinf(result['cover'][1]))
+
+    def test_command_rebuilds_suggestions_from_sales_and_orders(self):
+        now = timezone.now()
+        for day in range(28):
+            sale = Sale.objects.create(user=self.staff_user, date=now - timedelta(days=day))
+            SaleItem.objects.create(sale=sale, product=self.busy, quantity=2, price=Decimal('20.00'))
+        Order.objects.create(
+            product=self.idle, user=self.staff_user, quantity=50, phone='0712345678',
+            address='Arusha', status='Cancelled', date_ordered=now,
+        )
+
+        call_command('forecast_demand', stdout=io.StringIO())
+        suggestions = list(ReorderSuggestion.objects.all())
+        self.assertEqual([s.product_id for s in suggestions], [self.busy.id])
+        self.assertAlmostEqual(suggestions[0].avg_daily_28, 2.0)
+
+        client = APIClient()
+        client.force_authenticate(self.staff_user)
+        response = client.get('/api/reorder-suggestions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['product_name'], 'Kitenge')
+
+    def test_future_dated_demand_is_ignored(self):
+        for days in (0, 3):
+            sale = Sale.objects.create(user=self.staff_user, date=timezone.now() + timedelta(days=days))
+            SaleItem.objects.create(sale=sale, product=self.busy, quantity=30, price=Decimal('20.00'))
+        self.assertEqual(run_forecast(history_days=28), 1)
+
+
+class RelatedProductsTest(TestCase):
+    def setUp(self):
+        if np is None:
+            self.skipTest('numpy not installed')
+        self.cashier = User.objects.create_user(username="cashier", password="pass12345", is_staff=True)
+        self.shirt, self.tie, self.belt, self.hat = [
+            Product.objects.create(name=name, price=Decimal('10.00'), quantity=100)
+            for name in ("Shirt", "Tie", "Belt", "Hat")
+        ]
+
+    def sell(self, *products):
+        sale = Sale.objects.create(user=self.cashier)
+        for product in products:
+            SaleItem.objects.create(sale=sale, product=product, quantity=1, price=product.price)
+
+    def test_order_baskets_follow_gaps_not_clock_buckets(self):
+        # A minute either side of an hour boundary, then three hours later.
+        boundary = datetime(2026, 3, 2, 11, 0, tzinfo=dt_timezone.utc)
+        for product, when in ((self.shirt, boundary - timedelta(seconds=30)), (self.tie, boundary + timedelta(seconds=30)), (self.hat, boundary + timedelta(hours=3))):
+            order = Order.objects.create(product=product, user=self.cashier, quantity=1, phone='0712345678', address='Dodoma')
+            Order.objects.filter(pk=order.pk).update(date_ordered=when)
+
+        basket_ids, product_ids = load_baskets(window_hours=1)
+        basket_of = dict(zip(product_ids.tolist(), basket_ids.tolist()))
+        self.assertEqual(basket_of[self.shirt.id], basket_of[self.tie.id])
+        self.assertNotEqual(basket_of[self.shirt.id], basket_of[self.hat.id])
+
+    def test_related_lists_products_bought_together(self):
+        self.sell(self.shirt, self.tie)
+        self.sell(self.shirt, self.tie, self.belt)
+        # Two online orders by the same customer on the same day share a basket.
+        for product in (self.shirt, self.hat):
+            Order.objects.create(product=product, user=self.cashier, quantity=1, phone='0712345678', address='Mwanza')
+
+        call_command('build_recommendations', stdout=io.StringIO())
+
+        # The product, the related products and the check for due scheduled prices.
+        with self.assertNumQueries(3):
+            response = APIClient().get(f'/api/products/{self.shirt.id}/related/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.data], ["Tie", "Belt", "Hat"])
+        response = APIClient().get(f'/api/products/{self.hat.id}/related/')
+        self.assertEqual([item['name'] for item in response.data], ["Shirt"])
+
+    def test_related_for_unknown_product_is_404(self):
+        self.assertEqual(APIClient().get('/api/products/999999/related/').status_code, 404)
+        self.assertEqual(APIClient().get('/api/products/abc/related/').status_code, 404)
+
+
+class TaskQueueTest(TestCase):
+    def test_register_creates_customer_profile_without_a_worker(self):
+        response = APIClient().post('/api/register/', {'username': 'Neema', 'email': 'neema@example.com', 'password': 'pass12345'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Customer.objects.filter(name='neema').exists())
+        self.assertFalse(Task.objects.exists())
+
+    def test_failures_retry_then_move_to_dead_letters(self):
+        @task('tests.explode', max_attempts=2)
+        def explode():
+            raise ValueError('boom')
+        self.addCleanup(TASKS.pop, 'tests.explode')
+
+        with override_settings(TASKS_RETRY_BACKOFF=0):
+            enqueue('tests.explode')
+            for _ in range(2):
+                self.assertFalse(run_task(claim_tasks('test')[0]))
+        self.assertFalse(Task.objects.exists())
+        dead = DeadTask.objects.get()
+        self.assertEqual(dead.attempts, 2)
+        self.assertIn('boom', dead.last_error)
+
+    def test_product_image_upload_is_deferred(self):
+        upload = SimpleUploadedFile('kanga.jpg', b'fakeimagecontent', content_type='image/jpeg')
+        with override_settings(TASKS_DEFER_IMAGE_UPLOADS=True):
+            response = APIClient().post('/api/products/', {'name': 'Kanga', 'price': '12.00', 'quantity': 3, 'image': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        product = Product.objects.get(pk=response.data['id'])
+        self.assertFalse(product.image)
+
+        run_pending()
+        product.refresh_from_db()
+        self.assertTrue(product.image.name.startswith('product_images/kanga'))
+
+
+@override_settings(OUTBOX_SETTLE_SECONDS=0)
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(username="clerk", password="pass12345", is_staff=True)
+        self.product = Product.objects.create(name="Dera", price=Decimal('25.00'), quantity=5)
+
+    def place_order(self):
+        self.client.force_authenticate(self.staff_user)
+        response = self.client.post('/api/place-order/', {'product_id': self.product.id, 'quantity': 2, 'phone': '0712345678', 'address': 'Dodoma'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['order_id']
+
+    def test_feed_returns_only_new_order_events(self):
+        order_id = self.place_order()
+        response = self.client.get('/api/events/', {'topic': 'order.created,order.status_changed'})
+        self.assertEqual([(e['topic'], e['subject_id']) for e in response.data['results']], [('order.created', order_id)])
+        cursor = response.data['next_after']
+
+        transition_orders({order_id: 'Cancelled'})
+        response = self.client.get('/api/events/', {'after': cursor})
+        topics = [event['topic'] for event in response.data['results']]
+        self.assertEqual(topics, ['order.status_changed', 'stock.changed'])
+        self.assertEqual(response.data['results'][0]['payload']['to'], 'Cancelled')
+
+    def test_dispatcher_advances_cursor_only_after_success(self):
+        seen, broken = [], [True]
+
+        @consumer('tests.orders', topics=['order.created'])
+        def handle(events):
+            if broken[0]:
+                raise RuntimeError('downstream unavailable')
+            seen.extend(event.subject_id for event in events)
+        self.addCleanup(CONSUMERS.pop, 'tests.orders')
+
+        order_id = self.place_order()
+        with self.assertRaises(RuntimeError):
+            dispatch('tests.orders')
+        self.assertFalse(OutboxCursor.objects.filter(consumer='tests.orders', position__gt=0).exists())
+
+        broken[0] = False
+        self.assertEqual(dispatch('tests.orders'), 3)
+        self.assertEqual(seen, [order_id])
+        self.assertEqual(dispatch('tests.orders'), 0)
+
+
+class OrderEventStreamTest(TestCase):
+    def test_stream_requires_authentication(self):
+        response = self.client.get('/api/orders/stream/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_stream_is_not_served_under_wsgi(self):
+        # The test client is WSGI, where an endless stream would hold a worker.
+        self.client.force_login(User.objects.create_user(username="zawadi", password="pass12345"))
+        response = self.client.get('/api/orders/stream/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_order_events_reach_staff_and_owner_only(self):
+
+        staff = get_broker().subscribe(['orders.staff'])
+        owner = get_broker().subscribe(['orders.user.7'])
+        other = get_broker().subscribe(['orders.user.8'])
+        self.addCleanup(other.close)
+
+        event = OutboxEvent(pk=41, topic=ORDER_STATUS_CHANGED, subject_id=3, payload={'order': 3, 'user': 7, 'to': 'Shipped'})
+        broadcast([event])
+        await asyncio.sleep(0)
+
+        for subscription in (staff, owner):
+            lines = order_event_lines(subscription)
+            self.assertTrue((await lines.__anext__()).startswith('retry:'))
+            chunk = await lines.__anext__()
+            self.assertIn('id: 41\nevent: order.status_changed\n', chunk)
+            await lines.aclose()
+        self.assertTrue(other.queue.empty())
+
+    def test_reconnect_replays_only_own_missed_events(self):
+        customer = User.objects.create_user(username="amani", password="pass12345")
+        someone = User.objects.create_user(username="baraka", password="pass12345")
+        product = Product.objects.create(name="Shuka", price=Decimal('8.00'), quantity=10)
+        mine = Order.objects.create(product=product, user=customer, quantity=1, phone='0712345678', address='Moshi')
+        theirs = Order.objects.create(product=product, user=someone, quantity=1, phone='0712345678', address='Tanga')
+
+        transition_orders({mine.id: 'Processing', theirs.id: 'Processing'})
+        replayed = missed_order_events(customer, 0)
+        self.assertEqual([message['subject_id'] for message in replayed], [mine.id])
+
+
+class DeltaSyncTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(username="sync", password="pass12345", is_staff=True)
+        self.shirt = Product.objects.create(name="Shirt", price=Decimal('10.00'), quantity=5)
+        self.cap = Product.objects.create(name="Cap", price=Decimal('4.00'), quantity=5)
+
+    def test_products_delta_returns_changes_and_tombstones(self):
+        first = self.client.get('/api/products/', {'updated_since': '0'}).data
+        self.assertEqual({row['name'] for row in first['results']}, {"Shirt", "Cap"})
+
+        with override_settings(SYNC_OVERLAP_SECONDS=0):
+            token = self.client.get('/api/products/', {'updated_since': '0'}).data['sync_token']
+        apply_stock_changes({self.shirt.id: -1}, StockMovement.SALE)
+        cap_id = self.cap.id
+        self.cap.delete()
+
+        delta = self.client.get('/api/products/', {'sync_token': token}).data
+        self.assertEqual([row['name'] for row in delta['results']], ["Shirt"])
+        self.assertEqual(delta['results'][0]['quantity'], 4)
+        self.assertEqual(delta['deleted'], [cap_id])
+
+    def test_order_delta_is_scoped_to_the_customer(self):
+        other = User.objects.create_user(username="other", password="pass12345")
+        mine = Order.objects.create(product=self.shirt, user=self.staff_user, quantity=1, phone='0712345678', address='Iringa')
+        Order.objects.create(product=self.shirt, user=other, quantity=1, phone='0712345678', address='Mbeya')
+        self.client.force_authenticate(self.staff_user)
+
+        with override_settings(SYNC_OVERLAP_SECONDS=0):
+            token = self.client.get('/api/my-orders/', {'updated_since': '0'}).data['sync_token']
+        transition_orders({mine.id: 'Processing'})
+
+        delta = self.client.get('/api/my-orders/', {'sync_token': token}).data
+        self.assertEqual([(row['id'], row['status']) for row in delta['results']], [(mine.id, 'Processing')])
+        self.assertEqual(self.client.get('/api/orders/', {'updated_since': 'yesterday'}).status_code, 400)
+
+
+class ProductImportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="stocker", password="pass12345", is_staff=True))
+        self.shoes = Category.objects.create(name="Shoes")
+
+    def upload(self, name, content):
+        return self.client.post('/api/products/import/', {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def test_csv_upserts_by_sku_and_reports_bad_rows(self):
+        Product.objects.create(name="Old Sandal", sku="SND-1", category=self.shoes, price=Decimal('5.00'), quantity=2)
+        response = self.upload('products.csv', (
+            "sku,name,category,price,quantity\n"
+            "SND-1,Sandal,shoes,6.50,7\n"
+            "BAG-1,Tote Bag,Bags,12.00,3\n"
+            "BAD-1,Broken,,not-a-price,1\n"
+        ).encode())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['error_count']), (1, 1, 1))
+        self.assertEqual(response.data['errors'][0]['row'], 4)
+        sandal = Product.objects.get(sku="SND-1")
+        self.assertEqual((sandal.name, sandal.price, sandal.quantity, sandal.category_id), ("Sandal", Decimal('6.50'), 7, self.shoes.id))
+        self.assertEqual(Product.objects.get(sku="BAG-1").category.name, "Bags")
+        self.assertEqual(
+            list(StockMovement.objects.filter(note='Bulk import').order_by('product__sku').values_list('product__sku', 'quantity')),
+            [("BAG-1", 3), ("SND-1", 5)],
+        )
+
+    def test_json_lines_import(self):
+        response = self.upload('products.jsonl', b'{"sku": "HAT-1", "name": "Hat", "price": 4}\nnot json\n')
+        self.assertEqual((response.data['created'], response.data['error_count']), (1, 1))
+        self.assertEqual(Product.objects.get(sku="HAT-1").quantity, 0)
+
+    def test_unreadable_tail_reports_the_rows_imported(self):
+        rows = ''.join(f"SOK-{i},Sock {i},,1.00,1\n" for i in range(500))
+        response = self.upload('products.csv', b"sku,name,category,price,quantity\n" + rows.encode() + b"BAD,\xff\xfe,,1.00,1\n")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], Product.objects.filter(sku__startswith='SOK-').count())
+        self.assertGreater(response.data['created'], 0)
+        self.assertIn('Could not read the file after', response.data['read_error'])
+
+        response = self.upload('products.csv', b"\xff\xfe\x00bad")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class AdminChangelistTest(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser(username="boss", email="boss@example.com", password="pass12345"))
+        buyer = User.objects.create_user(username="buyer", password="pass12345")
+        self.hat = Product.objects.create(name="Hat", price=Decimal('4.00'), quantity=10)
+        self.scarf = Product.objects.create(name="Scarf", price=Decimal('6.00'), quantity=10)
+        self.hat_order = Order.objects.create(product=self.hat, user=buyer, quantity=1)
+        Order.objects.create(product=self.scarf, user=buyer, quantity=2)
+
+    def test_order_changelist_uses_autocomplete_filter(self):
+        response = self.client.get('/admin/myapp/order/', {'product__id__exact': self.hat.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), [self.hat_order])
+        self.assertContains(response, 'data-param="product__id__exact"')
+        # The sidebar no longer links to every product.
+        self.assertNotContains(response, f'product__id__exact={self.scarf.id}')
+
+    def test_search_by_number_matches_id(self):
+        response = self.client.get('/admin/myapp/order/', {'q': str(self.hat_order.id)})
+        self.assertIn(self.hat_order, response.context['cl'].result_list)
+
+    def test_status_actions_go_through_transitions(self):
+        response = self.client.post('/admin/myapp/order/', {
+            'action': 'mark_cancelled', '_selected_action': [self.hat_order.id],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.hat_order.refresh_from_db()
+        self.hat.refresh_from_db()
+        self.assertEqual(self.hat_order.status, 'Cancelled')
+        self.assertEqual(self.hat.quantity, 11)
+
+        self.client.post('/admin/myapp/order/', {
+            'action': 'mark_pending', '_selected_action': [self.hat_order.id],
+        })
+        self.assertEqual(Order.objects.get(pk=self.hat_order.pk).status, 'Cancelled')
+
+    def test_paginator_counts_exactly_without_postgres(self):
+        with self.settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=0):
+            self.assertEqual(EstimatedCountPaginator(Order.objects.all(), 10).count, 2)
+
+
+@override_settings(AUTH_USER_CACHE_SECONDS=60)
+class CachedAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="ann", email="Ann@Example.com", password="pass12345")
+
+    def test_jwt_user_is_cached_until_saved(self):
+        token = AccessToken.for_user(self.user)
+        request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+        authenticator = CachedJWTAuthentication()
+        authenticator.authenticate(request)
+        with self.assertNumQueries(0):
+            self.assertEqual(authenticator.authenticate(request)[0], self.user)
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            authenticator.authenticate(request)
+
+    def test_login_by_username_or_email(self):
+        client = APIClient()
+        self.assertEqual(client.post('/api/login/', {'username': 'ann', 'password': 'pass12345'}).status_code, 200)
+        self.assertEqual(client.post('/api/login/', {'username': 'ann@example.com', 'password': 'pass12345'}).status_code, 200)
+        self.assertEqual(client.post('/api/login/', {'username': 'ann@example.com', 'password': 'wrong'}).status_code, 400)
+        self.assertEqual(client.post('/api/login/', {'username': 'nobody', 'password': 'pass12345'}).status_code, 400)
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class PasswordHasherTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="hashed", password="pass12345")
+
+    def test_login_rehashes_with_current_cost(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            response = APIClient().post('/api/login/', {'username': 'hashed', 'password': 'pass12345'})
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+    async def test_async_authenticate_hashes_on_pool_and_rehashes(self):
+
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            user = await CachedModelBackend().aauthenticate(None, username='hashed', password='pass12345')
+            self.assertIsNone(await CachedModelBackend().aauthenticate(None, username='hashed', password='wrong'))
+        self.assertEqual(user.pk, self.user.pk)
+        await self.user.arefresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+
+@override_settings(REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={
+    'login': '2/min', 'register': '5/hour', 'place_order': '20/min', 'place_order_all': '600/min',
+}))
+class ThrottleTest(TestCase):
+    def test_login_is_limited_per_ip(self):
+        client = APIClient()
+        codes = [client.post('/api/login/', {'username': 'x', 'password': 'y'}).status_code for _ in range(3)]
+        self.assertEqual(codes, [400, 400, 429])
+        response = client.post('/api/login/', {'username': 'x', 'password': 'y'})
+        self.assertEqual(response['Retry-After'], '30')
+
+        other = client.post('/api/login/', {'username': 'x', 'password': 'y'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other.status_code, 400)
+
+    def test_spoofed_forwarded_for_does_not_reset_the_bucket(self):
+        client = APIClient()
+        rest_framework = dict(settings.REST_FRAMEWORK, NUM_PROXIES=1)
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            codes = [
+                # The client forges the first address; the proxy appends the real one.
+                client.post('/api/login/', {'username': 'x', 'password': 'y'}, HTTP_X_FORWARDED_FOR=f'1.2.3.{i}, 10.0.0.9').status_code
+                for i in range(3)
+            ]
+        self.assertEqual(codes, [400, 400, 429])
+
+    def test_memory_store_is_capped(self):
+        store = MemoryBucketStore()
+        store.max_buckets = 10
+        for i in range(25):
+            store.consume(f'spoof{i}', 5, 3600)
+        self.assertLessEqual(len(store.buckets), 10)
+        self.assertIn('spoof24', store.buckets)
+        self.assertNotIn('spoof0', store.buckets)
+
+    def test_memory_bucket_refills_at_rate(self):
+        store = MemoryBucketStore()
+        with mock.patch('myapp.throttling.time.monotonic', return_value=100.0):
+            self.assertEqual([store.consume('k', 2, 60)[0] for _ in range(3)], [True, True, False])
+            self.assertEqual(store.consume('k', 2, 60), (False, 30.0))
+        with mock.patch('myapp.throttling.time.monotonic', return_value=130.0):
+            self.assertEqual(store.consume('k', 2, 60), (True, 0))
+            self.assertFalse(store.consume('k', 2, 60)[0])
+
+
+class HistoryArchiveTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="regular", password="pass12345")
+        self.shirt = Product.objects.create(name="Shirt", price=Decimal('10.00'), quantity=50)
+        long_ago = timezone.now() - timedelta(days=400)
+        self.old = Order.objects.create(product=self.shirt, user=self.user, quantity=2, status='Delivered')
+        self.open = Order.objects.create(product=self.shirt, user=self.user, quantity=1, status='Pending')
+        Order.objects.filter(pk__in=[self.old.pk, self.open.pk]).update(date_ordered=long_ago, updated_at=long_ago)
+        self.sale = Sale.objects.create(user=self.user, date=long_ago, total_amount=Decimal('30.00'))
+        SaleItem.objects.create(sale=self.sale, product=self.shirt, quantity=3, price=Decimal('10.00'))
+
+    def test_archives_closed_orders_and_old_sales_in_batches(self):
+        self.assertEqual(archive_orders(cutoff(180), batch_size=1), 1)
+        self.assertEqual(archive_sales(cutoff(180), batch_size=1), 1)
+
+        self.assertEqual(list(Order.objects.values_list('pk', flat=True)), [self.open.pk])
+        self.assertEqual(ArchivedOrder.objects.get().pk, self.old.pk)
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(ArchivedSaleItem.objects.get().sale_id, self.sale.pk)
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_reports_include_archived_history(self):
+        archive_orders(cutoff(180))
+        archive_sales(cutoff(180))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual([row['id'] for row in client.get('/api/my-orders/').data], [self.open.pk, self.old.pk])
+        delta = client.get('/api/my-orders/', {'updated_since': '0'}).data
+        self.assertEqual(sorted(row['id'] for row in delta['results']), sorted([self.open.pk, self.old.pk]))
+        cards = {card['id']: card['value'] for card in client.get('/api/dashboard-stats/').data['summary_cards']}
+        self.assertEqual((cards['total_orders'], cards['delivered_orders'], cards['pending_orders']), (2, 1, 1))
+
+        client.force_authenticate(User.objects.create_user(username="boss", password="pass12345", is_staff=True))
+        self.assertEqual(client.get('/api/sales/sales_summary/').data, {'total_sales': 1, 'total_amount': 30.0})
+
+
+class SalesAnalyticsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="analyst", password="pass12345", is_staff=True))
+        buyer = User.objects.create_user(username="buyer", password="pass12345")
+        shoes = Category.objects.create(name="Shoes")
+        self.boot = Product.objects.create(name="Boot", category=shoes, price=Decimal('50.00'), quantity=100)
+        self.sock = Product.objects.create(name="Sock", price=Decimal('5.00'), quantity=100)
+        self.now = timezone.now()
+        yesterday = self.now - timedelta(days=1)
+
+        sale = Sale.objects.create(user=buyer, date=yesterday, total_amount=Decimal('110.00'))
+        SaleItem.objects.create(sale=sale, product=self.boot, quantity=2, price=Decimal('50.00'))
+        SaleItem.objects.create(sale=sale, product=self.sock, quantity=2, price=Decimal('5.00'))
+        Order.objects.create(product=self.boot, user=buyer, quantity=1)
+        Order.objects.create(product=self.sock, user=buyer, quantity=4)
+        Order.objects.create(product=self.boot, user=buyer, quantity=3, status='Cancelled')
+
+    def test_revenue_by_day_and_top_products(self):
+        by_day = self.client.get('/api/analytics/', {'group': 'day'}).data
+        self.assertEqual(by_day['total_revenue'], 180.0)
+        self.assertEqual([(row['revenue'], row['units']) for row in by_day['rows']], [(110.0, 4), (70.0, 5)])
+
+        top = self.client.get('/api/analytics/', {'group': 'product', 'top': 1}).data['rows']
+        self.assertEqual([(row['id'], row['name'], row['revenue'], row['share']) for row in top], [(self.boot.id, 'Boot', 150.0, 0.8333)])
+
+    def test_baskets_and_repeat_rate(self):
+        baskets = {row['kind']: row for row in self.client.get('/api/analytics/', {'report': 'baskets'}).data['rows']}
+        self.assertEqual((baskets['sales']['baskets'], baskets['sales']['avg_units']), (1, 4.0))
+        self.assertEqual((baskets['orders']['baskets'], baskets['orders']['avg_value']), (2, 35.0))
+
+        customers = self.client.get('/api/analytics/', {'report': 'customers', 'source': 'orders'}).data['rows']
+        self.assertEqual(customers, [{'kind': 'orders', 'customers': 1, 'repeat_customers': 1, 'repeat_rate': 1.0}])
+
+    def test_results_are_cached_per_query_and_params_validated(self):
+        self.client.get('/api/analytics/', {'group': 'month'})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/analytics/', {'group': 'month'})
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.client.get('/api/analytics/', {'group': 'hour'}).status_code, 400)
+
+
+class SnapshotExportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="analyst", password="pass12345", is_staff=True))
+        self.buyer = User.objects.create_user(username="buyer", password="pass12345")
+        self.product = Product.objects.create(name="Boot", sku="BOOT-1", price=Decimal('50.00'), quantity=100)
+        self.order = Order.objects.create(product=self.product, user=self.buyer, quantity=2, phone="0712345678")
+
+    def test_csv_snapshot_and_incremental_token(self):
+        response = self.client.get('/api/snapshots/orders/', {'output': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(gzip.decompress(b''.join(response.streaming_content)).decode())))
+        self.assertEqual(rows[0], ['id', 'product_id', 'user_id', 'quantity', 'total_price', 'status', 'date_ordered', 'updated_at'])
+        self.assertEqual(rows[1][:6], [str(self.order.pk), str(self.product.pk), str(self.buyer.pk), '2', '100.00', 'Pending'])
+
+        with override_settings(SYNC_OVERLAP_SECONDS=0):
+            token = self.client.get('/api/snapshots/orders/', {'output': 'csv'})['X-Snapshot-Token']
+            later = Order.objects.create(product=self.product, user=self.buyer, quantity=1)
+            delta = self.client.get('/api/snapshots/orders/', {'output': 'csv', 'since': token})
+        self.assertEqual(delta['X-Snapshot-Rows'], '1')
+        self.assertIn(f'{later.pk},', gzip.decompress(b''.join(delta.streaming_content)).decode())
+
+    def test_parquet_snapshot_covers_archived_history(self):
+        if pa is None:
+            self.skipTest('pyarrow not installed')
+        self.order.status = 'Delivered'
+        self.order.save()
+        archive_orders(timezone.now() + timedelta(days=1), 100)
+
+        response = self.client.get('/api/snapshots/orders/', {'output': 'parquet'})
+        table = pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.column('id').to_pylist(), [self.order.pk])
+        self.assertEqual(table.column('total_price').to_pylist(), [Decimal('100.00')])
+
+    def test_command_writes_manifest_and_incremental_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_snapshot', 'products', 'sales', format='csv', output_dir=directory, stdout=io.StringIO())
+            call_command('export_snapshot', 'sales', format='csv', output_dir=directory, incremental=True, stdout=io.StringIO())
+            with open(os.path.join(directory, 'manifest.json')) as stream:
+                manifest = json.load(stream)
+        self.assertEqual([entry['rows'] for entry in manifest['products']['files']], [1])
+        first, delta = manifest['sales']['files']
+        self.assertEqual([(first['rows'], first['since']), delta['rows']], [(0, None), 0])
+        self.assertIsNotNone(parse_datetime(delta['since']))
+
+    def test_sale_committed_late_is_in_next_delta(self):
+        with override_settings(SYNC_OVERLAP_SECONDS=60):
+            token = self.client.get('/api/snapshots/sale_items/', {'output': 'csv'})['X-Snapshot-Token']
+            # Stamped before the token was issued but committed after it.
+            sale = Sale.objects.create(user=self.buyer, date=timezone.now() - timedelta(seconds=30))
+            SaleItem.objects.create(sale=sale, product=self.product, quantity=1, price=Decimal('50.00'))
+            for dataset in ('sales', 'sale_items'):
+                delta = self.client.get(f'/api/snapshots/{dataset}/', {'output': 'csv', 'since': token})
+                self.assertEqual(delta['X-Snapshot-Rows'], '1', dataset)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get('/api/snapshots/customers/').status_code, 404)
+        self.assertEqual(self.client.get('/api/snapshots/orders/', {'output': 'xlsx'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/snapshots/sales/', {'output': 'csv', 'since': 'yesterday'}).status_code, 400)
+
+
+class CategoryTreeTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.clothing = Category.objects.create(name="Clothing")
+        self.shoes = Category.objects.create(name="Shoes", parent=self.clothing)
+        self.boots = Category.objects.create(name="Boots", parent=self.shoes)
+        self.boot = Product.objects.create(name="Boot", category=self.boots, price=Decimal('50.00'), quantity=5)
+        self.sandal = Product.objects.create(name="Sandal", category=self.shoes, price=Decimal('20.00'), quantity=0)
+
+    def counts(self):
+        return {row['name']: (row['product_count'], row['in_stock_count']) for row in self.client.get('/api/categories/').data}
+
+    def test_paths_and_subtree_counts(self):
+        self.assertEqual(Category.objects.get(pk=self.boots.pk).path, f'{self.clothing.pk}/{self.shoes.pk}/{self.boots.pk}/')
+        self.assertEqual(self.counts(), {'Clothing': (2, 1), 'Shoes': (2, 1), 'Boots': (1, 1)})
+        names = [row['name'] for row in self.client.get('/api/products/by_category/', {'category_id': self.clothing.pk}).data]
+        self.assertEqual(sorted(names), ['Boot', 'Sandal'])
+
+    def test_counts_follow_stock_moves_and_deletes(self):
+        apply_stock_changes({self.boot.pk: -5}, StockMovement.SALE)
+        apply_stock_changes({self.sandal.pk: 3}, StockMovement.RESTOCK)
+        self.assertEqual(self.counts(), {'Clothing': (2, 1), 'Shoes': (2, 1), 'Boots': (1, 0)})
+
+        sandal = Product.objects.get(pk=self.sandal.pk)
+        sandal.category = self.boots
+        sandal.save()
+        Product.objects.get(pk=self.boot.pk).delete()
+        self.assertEqual(self.counts(), {'Clothing': (1, 1), 'Shoes': (1, 1), 'Boots': (1, 1)})
+
+    def test_moving_a_subtree_moves_its_counts(self):
+        sale = Category.objects.create(name="Sale")
+        response = self.client.patch(f'/api/categories/{self.shoes.pk}/', {'parent': sale.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Category.objects.get(pk=self.boots.pk).path, f'{sale.pk}/{self.shoes.pk}/{self.boots.pk}/')
+        expected = {'Clothing': (0, 0), 'Sale': (2, 1), 'Shoes': (2, 1), 'Boots': (1, 1)}
+        self.assertEqual(self.counts(), expected)
+
+        rebuild_tree()
+        self.assertEqual(self.counts(), expected)
+
+    def test_invalid_tree_changes_are_rejected(self):
+        response = self.client.patch(f'/api/categories/{self.clothing.pk}/', {'parent': self.boots.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.delete(f'/api/categories/{self.shoes.pk}/').status_code, 400)
+
+        Category.objects.get(pk=self.boots.pk).delete()
+        self.assertIsNone(Product.objects.get(pk=self.boot.pk).category_id)
+        self.assertEqual(self.counts(), {'Clothing': (1, 0), 'Shoes': (1, 0)})
+
+
+class PriceHistoryTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username="pricer", password="pass12345", is_staff=True)
+        self.client.force_authenticate(self.staff)
+        self.category = Category.objects.create(name="Jackets")
+        self.jacket = Product.objects.create(name="Jacket", category=self.category, price=Decimal('50.00'), quantity=10)
+
+    def test_price_edits_are_history_and_orders_keep_their_price(self):
+        order = Order.objects.create(product=self.jacket, user=self.staff, quantity=2)
+        product = Product.objects.get(pk=self.jacket.pk)
+        product.price = Decimal('80.00')
+        product.save()
+        order.status = 'Processing'
+        order.save()
+
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal('100.00'))
+        history = self.client.get(f'/api/products/{self.jacket.pk}/prices/').data['history']
+        self.assertEqual([row['price'] for row in history], ['80.00', '50.00'])
+
+    def test_scheduled_promotion_starts_and_ends(self):
+        start = timezone.now() + timedelta(hours=1)
+        end = start + timedelta(hours=1)
+        response = self.client.post(f'/api/products/{self.jacket.pk}/prices/', {
+            'price': '40.00', 'kind': 'promotion', 'valid_from': start.isoformat(), 'valid_to': end.isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.jacket.refresh_from_db()
+        self.assertEqual((self.jacket.price, self.jacket.next_price_change), (Decimal('50.00'), start))
+        self.assertEqual(prices_at(Product.objects.all(), start + timedelta(minutes=30)), {self.jacket.pk: Decimal('40.00')})
+
+        refresh_due(start + timedelta(minutes=1))
+        self.jacket.refresh_from_db()
+        self.assertEqual((self.jacket.price, self.jacket.next_price_change), (Decimal('40.00'), end))
+        refresh_due(end)
+        self.jacket.refresh_from_db()
+        self.assertEqual((self.jacket.price, self.jacket.next_price_change), (Decimal('50.00'), None))
+
+        bad = self.client.post(f'/api/products/{self.jacket.pk}/prices/', {'price': '40.00', 'kind': 'promotion'}, format='json')
+        self.assertEqual(bad.status_code, 400)
+
+    def test_orders_are_priced_at_the_due_price(self):
+        # A promotion that has started but which the worker has not applied yet.
+        now = timezone.now()
+        PriceHistory.objects.create(product=self.jacket, kind=PriceHistory.PROMOTION, price=Decimal('30.00'), valid_from=now, valid_to=now + timedelta(days=1))
+        Product.objects.filter(pk=self.jacket.pk).update(next_price_change=now)
+
+        response = self.client.post('/api/place-order/', {'product_id': self.jacket.pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.get(pk=response.data['order_id']).total_price, Decimal('60.00'))
+
+    def test_category_reprice_is_set_based(self):
+        small, large = Category.objects.create(name="Small"), Category.objects.create(name="Large", parent=self.category)
+        Product.objects.create(name="Cap", category=small, price=Decimal('10.00'))
+        for i in range(20):
+            Product.objects.create(name=f"Coat {i}", category=large, price=Decimal('19.99'))
+
+        queries = []
+        for category in (small, self.category):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.post(f'/api/categories/{category.pk}/reprice/', {'percent': '-10'}, format='json')
+            queries.append(len(captured))
+        self.assertEqual(response.data['products'], 21)
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(Product.objects.get(name="Cap").price, Decimal('9.00'))
+        self.assertEqual(Product.objects.get(name="Coat 3").price, Decimal('17.99'))
+        self.assertEqual(Product.objects.get(pk=self.jacket.pk).price, Decimal('45.00'))
+
+    def test_scheduled_changes_show_on_reads_without_a_worker(self):
+        now = timezone.now()
+        with override_settings(TASKS_ALWAYS_EAGER=True), self.captureOnCommitCallbacks(execute=True):
+            set_prices({self.jacket.pk: Decimal('35.00')}, PriceHistory.PROMOTION, now - timedelta(hours=2), now + timedelta(hours=1))
+        # Eager mode must not run the end-of-promotion refresh early.
+        self.assertEqual(Task.objects.get().name, 'prices.refresh')
+        self.assertEqual(self.client.get(f'/api/products/{self.jacket.pk}/').data['price'], '35.00')
+
+        # The promotion ends and no worker runs the queued refresh.
+        PriceHistory.objects.filter(kind=PriceHistory.PROMOTION).update(valid_to=now - timedelta(minutes=1))
+        Product.objects.filter(pk=self.jacket.pk).update(next_price_change=now - timedelta(minutes=1))
+        self.assertEqual(self.client.get(f'/api/products/{self.jacket.pk}/').data['price'], '50.00')
+
+
+class RequestCoalescingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    def request(self, path):
+        return Request(self.factory.get(path))
+
+    def test_identical_requests_share_one_computation(self):
+        release, calls, responses = threading.Event(), [], []
+
+        @coalesce('test.products')
+        def handler(request):
+            calls.append(request.GET.get('page'))
+            release.wait(5)
+            return Response({'page': request.GET.get('page')})
+
+        def client(path):
+            responses.append(handler(self.request(path)))
+
+        threads = [threading.Thread(target=client, args=('/api/products/',)) for _ in range(5)]
+        threads.append(threading.Thread(target=client, args=('/api/products/?page=2',)))
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(calls, key=str), ['2', None])
+        self.assertEqual(sorted(str(response.data['page']) for response in responses), ['2'] + ['None'] * 5)
+        self.assertEqual(sum(response.get('X-Coalesced') == 'coalesced' for response in responses), 4)
+        self.assertEqual(coalescing_stats()['test.products'], {'computed': 2, 'coalesced': 4, 'shared': 0, 'fallback': 0})
+
+    @override_settings(COALESCE_CROSS_WORKER=True)
+    def test_waits_for_another_workers_result(self):
+        calls = []
+
+        @coalesce('test.dashboard')
+        def handler(request):
+            calls.append(1)
+            return Response({'fresh': True})
+
+        request = self.request('/api/dashboard-stats/')
+        key = request_key('test.dashboard', request)
+        # Another worker holds the lock and publishes its result shortly.
+        cache.add(f'{key}:lock', 1)
+        timer = threading.Timer(0.1, publish, (key, {'data': {'fresh': False}}))
+        timer.start()
+        response = handler(request)
+        timer.join()
+        self.assertEqual((response.data, response['X-Coalesced'], calls), ({'fresh': False}, 'shared', []))
+
+        cache.delete(f'{key}:result')
+        self.assertEqual(handler(request).data, {'fresh': True})
+        self.assertEqual(calls, [1])
+        self.assertEqual(cache.get(f'{key}:result'), {'data': {'fresh': True}})
+        self.assertIsNone(cache.get(f'{key}:lock'))
+
+    def test_errors_are_not_shared_and_metrics_are_reported(self):
+        @coalesce('test.analytics')
+        def handler(request):
+            return Response({'error': 'bad'}, status=400)
+
+        request = self.request('/api/analytics/?report=nope')
+        with override_settings(COALESCE_CROSS_WORKER=True):
+            self.assertEqual(handler(request).status_code, 400)
+        self.assertIsNone(cache.get(request_key('test.analytics', request) + ':result'))
+
+        client = APIClient()
+        self.assertEqual(client.get('/api/products/').status_code, 200)
+        self.assertEqual(client.get('/api/metrics/coalescing/').status_code, 401)
+        client.force_authenticate(User.objects.create_user(username="ops", password="pass12345", is_staff=True))
+        stats = client.get('/api/metrics/coalescing/').data
+        self.assertEqual(stats['products.list']['computed'], 1)
+        self.assertEqual(stats['test.analytics']['computed'], 1)
+        self.assertEqual(stats['analytics']['coalesced'], 0)
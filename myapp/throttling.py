@@ -0,0 +1,167 @@
+"""
+Token-bucket throttles for the expensive endpoints (login, registration,
+order placement).
+
+A rate such as ``'10/min'`` (from ``DEFAULT_THROTTLE_RATES``) is a bucket of
+10 tokens refilled continuously at 10 per minute: short bursts up to the
+bucket size pass, sustained traffic is held to the rate.  Each check is one
+call to the store named by ``THROTTLE_STORE``:
+
+* ``MemoryBucketStore`` keeps buckets in this process (no I/O; limits are per
+  worker);
+* ``RedisBucketStore`` keeps them in the Redis behind the default cache and
+  updates a bucket atomically with one ``EVALSHA`` round trip.
+"""
+
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class MemoryBucketStore:
+    max_buckets = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def consume(self, key, capacity, period):
+        """Take a token from bucket ``key``; returns ``(allowed, seconds until the next token)``."""
+        rate = capacity / period
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated, _ = self.buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # Re-inserted so the dict stays in least-recently-used order.
+            if self.buckets.pop(key, None) is None and len(self.buckets) >= self.max_buckets:
+                self.prune(now)
+            self.buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+    def prune(self, now):
+        """Drop refilled buckets, then the least recently used, down to half of ``max_buckets``."""
+        # A bucket that has refilled is the same as a new one.
+        buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+        # Halving keeps the O(n) rebuild rare however many keys are active.
+        for key in list(buckets)[:max(0, len(buckets) - self.max_buckets // 2)]:
+            del buckets[key]
+        self.buckets = buckets
+
+
+class RedisBucketStore:
+    # Uses the Redis clock so every web process agrees on the time.
+    script_source = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self):
+        self.scripts = {}
+
+    def consume(self, key, capacity, period):
+        key = cache.make_key(key)
+        client = cache._cache.get_client(key, write=True)
+        script = self.scripts.get(id(client))
+        if script is None:
+            script = self.scripts[id(client)] = client.register_script(self.script_source)
+        rate = capacity / period
+        allowed, tokens = script(keys=[key], args=[capacity, rate])
+        return bool(allowed), 0 if allowed else (1 - float(tokens)) / rate
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = import_string(settings.THROTTLE_STORE)()
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    global _store
+    if setting in ('THROTTLE_STORE', 'REST_FRAMEWORK'):
+        _store = None
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    def get_rate(self):
+        # Read at request time so settings overrides apply.
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self.retry_after = get_store().consume(self.key, self.num_requests, self.duration)
+        return allowed
+
+    def wait(self):
+        return math.ceil(self.retry_after) if self.retry_after else None
+
+
+class PerIPThrottle(TokenBucketThrottle):
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class PerUserThrottle(TokenBucketThrottle):
+    """Per user when authenticated, per IP otherwise."""
+
+    def get_cache_key(self, request, view):
+        user = request.user
+        ident = f'user:{user.pk}' if user and user.is_authenticated else self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class PerEndpointThrottle(TokenBucketThrottle):
+    """One bucket shared by every client of the endpoint."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': 'all'}
+
+
+class LoginThrottle(PerIPThrottle):
+    scope = 'login'
+
+
+class RegisterThrottle(PerIPThrottle):
+    scope = 'register'
+
+
+class PlaceOrderThrottle(PerUserThrottle):
+    scope = 'place_order'
+
+
+class PlaceOrderEndpointThrottle(PerEndpointThrottle):
+    scope = 'place_order_all'
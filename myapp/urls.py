@@ -21,7 +21,15 @@ urlpatterns = [
     path('register-staff/', views.api_register_staff, name='api_register_staff'),
     path('my-orders/', views.api_user_orders, name='api_user_orders'),
     path('orders/', views.api_orders, name='api_orders'),
+    path('orders/stream/', views.order_event_stream, name='order_event_stream'),
     path('orders/<int:pk>/update-status/', views.api_update_order_status, name='api_update_order_status'),
+    path('stock-alerts/', views.api_stock_alerts, name='api_stock_alerts'),
+    path('events/', views.api_events, name='api_events'),
+    path('reorder-suggestions/', views.api_reorder_suggestions, name='api_reorder_suggestions'),
+    path('analytics/', views.api_analytics, name='api_analytics'),
+    path('snapshots/<str:dataset>/', views.api_snapshot, name='api_snapshot'),
+    path('metrics/coalescing/', views.api_coalescing_metrics, name='api_coalescing_metrics'),
+    path('orders/bulk-update-status/', views.api_bulk_update_order_status, name='api_bulk_update_order_status'),
     path('', include(router.urls)),
 ]
 
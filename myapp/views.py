@@ -1,40 +1,108 @@
 ﻿from django.contrib.auth import authenticate, login as auth_login
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
-from django.db.models import Sum
-from django.shortcuts import get_object_or_404
+from django.db.models import F, Prefetch, ProtectedError, Sum
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.authentication import SessionAuthentication
-from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework import permissions, status, viewsets
-from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes, throttle_classes
+# DRF's version also answers 404 (not 500) for malformed ids such as "abc".
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+import asyncio
+import heapq
+import json
+import tempfile
 import traceback
 
-from .models import Category, Customer, Order, Product, Sale
+from . import analytics, archive, importer, inventory, outbox, pricing, snapshots, tasks
+from .authentication import CachedJWTAuthentication
+from .coalescing import coalesce, coalescing_stats
+from .fieldsets import SparseFieldsetViewMixin
+from .models import (
+    Category, Customer, LowStockAlert, Order, OutboxEvent, PriceHistory, Product, ReorderSuggestion, Sale, SaleItem, StockAlertEvent,
+    StockMovement,
+)
+from .orders import OrderTransitionError, order_created_payload, transition_orders
+from .parsers import FastJSONParser
+from .pubsub import RESYNC, get_broker
+from .sync import DeltaSyncMixin, delta_payload, next_sync_token, parse_since
+from .throttling import LoginThrottle, PlaceOrderEndpointThrottle, PlaceOrderThrottle, RegisterThrottle
 from .serializers import (
     CategorySerializer,
     CustomerSerializer,
+    OutboxEventSerializer,
+    PriceHistorySerializer,
     ProductSerializer,
+    ReorderSuggestionSerializer,
+    RepriceSerializer,
     SaleDetailSerializer,
     SaleSerializer,
+    StockAlertEventSerializer,
+    StockMovementSerializer,
     UserRegistrationSerializer,
 )
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(DeltaSyncMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
+    # Counts are stored on the rows, so the menu with counts is this one query.
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = None
 
-
-class ProductViewSet(viewsets.ModelViewSet):
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response({'error': 'Move or delete the subcategories first.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def reprice(self, request, pk=None):
+        """
+        Change every price in the category and its subcategories by ``percent``.
+
+        With ``valid_to`` the change is a promotion from ``valid_from`` (default
+        now); otherwise new base prices from ``valid_from``.
+        """
+        category = self.get_object()
+        serializer = RepriceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        count = pricing.reprice(
+            Product.objects.filter(category__path__startswith=category.path),
+            data['percent'],
+            data.get('valid_from'),
+            data.get('valid_to'),
+            user=request.user,
+            note=data['note'],
+        )
+        return Response({'category': category.pk, 'products': count})
+
+
+class ProductViewSet(DeltaSyncMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all().select_related('category')
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    parser_classes = [MultiPartParser, FormParser, FastJSONParser]
+
+    def get_queryset(self):
+        # Apply scheduled price starts and ends the worker has not applied yet.
+        pricing.refresh_due()
+        return super().get_queryset()
+
+    @coalesce('products.list')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         try:
@@ -50,23 +118,150 @@ class ProductViewSet(viewsets.ModelViewSet):
             print(f"Error updating product: {e}")
             return Response({'detail': f"Error: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
+    def perform_create(self, serializer):
+        self.save_image(serializer.save())
+
+    def perform_update(self, serializer):
+        self.save_image(serializer.save())
+
+    def save_image(self, product):
+        upload = self.request.FILES.get('image')
+        if upload is None:
+            return
+        if settings.TASKS_DEFER_IMAGE_UPLOADS:
+            # Remote storage uploads are slow; the worker attaches the image.
+            tasks.defer_product_image(product, upload)
+            return
+        product.image.save(upload.name, upload, save=False)
+        product.save(update_fields=['image', 'updated_at'])
+
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[permissions.IsAdminUser])
+    def import_products(self, request):
+        """Upsert products by SKU from an uploaded CSV or JSON (Lines) ``file``."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload a CSV or JSON file as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.data.get('format') or ('json' if upload.name.lower().endswith(('.json', '.jsonl', '.ndjson')) else 'csv')
+        if fmt not in ('csv', 'json'):
+            return Response({'error': 'format must be csv or json.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = importer.import_products(importer.read_rows(upload.file, fmt), user=request.user)
+        if result.read_error and not result.rows:
+            return Response({'error': result.read_error}, status=status.HTTP_400_BAD_REQUEST)
+        # Rows before a read error are imported; read_error says where it stopped.
+        return Response(result.as_dict())
+
     @action(detail=False, methods=['get'])
     def by_category(self, request):
         category_id = request.query_params.get('category_id')
-        queryset = self.queryset
+        queryset = self.get_queryset()
         if category_id:
-            queryset = queryset.filter(category_id=category_id)
+            # The category and all of its subcategories.
+            category = get_object_or_404(Category.objects.only('path'), pk=category_id)
+            queryset = queryset.filter(category__path__startswith=category.path)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def low_stock(self, request):
-        products = self.queryset.filter(quantity__lt=10)
+        # Driven by the LowStockAlert watchlist, so cost scales with alerts, not the catalogue.
+        products = self.get_queryset().filter(low_stock_alert__isnull=False).order_by('low_stock_alert__quantity')
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """Frequently bought together, precomputed by ``manage.py build_recommendations``."""
+        product = get_object_or_404(Product.objects.only('pk'), pk=pk)
+        products = self.get_queryset().filter(recommended_for__product=product).order_by('recommended_for__rank')
+        serializer = self.get_serializer(products, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def movements(self, request, pk=None):
+        """Ledger entries for one product, newest first (?since=<ISO datetime>)."""
+        product = get_object_or_404(Product.objects.only('pk'), pk=pk)
+        movements = StockMovement.objects.filter(product=product).select_related('user')
+        since = request.query_params.get('since')
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return Response({'error': 'since must be an ISO 8601 datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+            movements = movements.filter(created_at__gt=since)
+        page = self.paginate_queryset(movements)
+        serializer = StockMovementSerializer(page if page is not None else movements, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def stock_as_of(self, request, pk=None):
+        at_raw = request.query_params.get('at')
+        at = parse_datetime(at_raw) if at_raw else timezone.now()
+        if at is None:
+            return Response({'error': 'at must be an ISO 8601 datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        product = get_object_or_404(Product.objects.only('pk'), pk=pk)
+        return Response({'product': product.pk, 'at': at, 'quantity': inventory.stock_as_of(product.pk, at)})
+
+    @action(detail=True, methods=['get', 'post'], permission_classes=[permissions.IsAdminUser])
+    def prices(self, request, pk=None):
+        """
+        GET: price history (latest start first) and the price in effect now, or at ``?at=``.
+        POST ``{price, kind?, valid_from?, valid_to?, note?}``: a new base price or a promotion.
+        """
+        product = get_object_or_404(Product.objects.only('pk'), pk=pk)
+        if request.method == 'POST':
+            serializer = PriceHistorySerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            data = serializer.validated_data
+            pricing.set_prices(
+                {product.pk: data['price']},
+                data.get('kind', PriceHistory.BASE),
+                data.get('valid_from'),
+                data.get('valid_to'),
+                user=request.user,
+                note=data.get('note', ''),
+            )
+            created = product.price_history.order_by('-id').first()
+            return Response(PriceHistorySerializer(created).data, status=status.HTTP_201_CREATED)
+
+        at_raw = request.query_params.get('at')
+        at = parse_datetime(at_raw) if at_raw else timezone.now()
+        if at is None:
+            return Response({'error': 'at must be an ISO 8601 datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        return Response({
+            'product': product.pk,
+            'at': at,
+            'price': pricing.prices_at(Product.objects.filter(pk=product.pk), at)[product.pk],
+            'history': PriceHistorySerializer(product.price_history.all(), many=True).data,
+        })
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def restock(self, request, pk=None):
+        try:
+            quantity = int(request.data.get('quantity'))
+            if quantity <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            return Response({'error': 'Quantity must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
 
-class CustomerViewSet(viewsets.ModelViewSet):
+        with transaction.atomic():
+            product = get_object_or_404(Product.objects.select_for_update(), pk=pk)
+            inventory.apply_stock_changes(
+                {product.pk: quantity},
+                StockMovement.RESTOCK,
+                user=request.user,
+                note=(request.data.get('note') or '')[:255],
+            )
+        product.refresh_from_db(fields=['quantity'])
+        return Response({'product': product.pk, 'quantity': product.quantity})
+
+
+class CustomerViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [permissions.IsAdminUser]
@@ -81,7 +276,12 @@ class CustomerViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class SaleViewSet(viewsets.ModelViewSet):
+def sale_items_prefetch():
+    """Load every sale's line items (and their product names) in one query."""
+    return Prefetch('items', queryset=SaleItem.objects.select_related('product'))
+
+
+class SaleViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Sale.objects.all().select_related('user', 'customer')
     serializer_class = SaleSerializer
     permission_classes = [permissions.IsAdminUser]
@@ -91,17 +291,28 @@ class SaleViewSet(viewsets.ModelViewSet):
             return SaleDetailSerializer
         return SaleSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, expand = self.get_sparse_params()
+        # With ?fields=/?expand= the sparse query plan already prefetches items.
+        if not (fields or expand) and 'items' in self.get_serializer().fields:
+            queryset = queryset.prefetch_related(sale_items_prefetch())
+        return queryset
+
+    def perform_create(self, serializer):
+        serializer.save(user=serializer.validated_data.get('user') or self.request.user)
+
     @action(detail=False, methods=['get'])
     def today_sales(self, request):
         today = timezone.now().date()
-        sales = self.queryset.filter(date__date=today)
+        sales = self.get_queryset().filter(date__date=today)
         serializer = self.get_serializer(sales, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def sales_summary(self, request):
-        total_sales = self.queryset.count()
-        total_amount = self.queryset.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
+        total_sales = archive.count_across(Sale)
+        total_amount = archive.sum_across(Sale, 'total_amount')
         return Response({'total_sales': total_sales, 'total_amount': float(total_amount)})
 
 
@@ -115,6 +326,7 @@ class DashboardStatsView(APIView):
         else:
             return self.get_user_dashboard(request)
 
+    @coalesce('dashboard.admin')
     def get_admin_dashboard(self, request):
         """Returns dashboard data for staff/admin users."""
         total_products = Product.objects.count()
@@ -131,19 +343,17 @@ class DashboardStatsView(APIView):
             {'id': 'pending_orders', 'title': 'Oda Mpya', 'value': pending_orders_count, 'icon': 'pending_actions'},
         ]
 
-        low_stock_products = Product.objects.filter(quantity__lt=10).order_by('quantity')
-        low_stock_items = list(low_stock_products.values('id', 'name', 'quantity'))
+        low_stock_items = list(
+            LowStockAlert.objects.order_by('quantity').values('quantity', id=F('product_id'), name=F('product__name'))
+        )
 
-        recent_sales = Sale.objects.select_related('customer').order_by('-date')[:5]
+        recent_sales = Sale.objects.select_related('user', 'customer').prefetch_related(sale_items_prefetch()).order_by('-date')[:5]
         recent_sales_data = SaleSerializer(recent_sales, many=True, context={'request': request}).data
 
-        # Data for a simple sales chart (last 7 days)
-        sales_chart_data = []
-        for i in range(7):
-            day = today - timezone.timedelta(days=i)
-            daily_total = Sale.objects.filter(date__date=day).aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-            sales_chart_data.append({'date': day.strftime('%b %d'), 'total': float(daily_total)})
-        sales_chart_data.reverse()  # Order from oldest to newest
+        # Data for a simple sales chart (last 7 days, oldest first)
+        days = [today - timezone.timedelta(days=i) for i in range(6, -1, -1)]
+        daily_totals = archive.daily_sales(days[0])
+        sales_chart_data = [{'date': day.strftime('%b %d'), 'total': float(daily_totals.get(day, 0))} for day in days]
 
         return Response({
             'summary_cards': summary_cards,
@@ -155,11 +365,11 @@ class DashboardStatsView(APIView):
     def get_user_dashboard(self, request):
         """Returns dashboard data for regular authenticated users."""
         user = request.user
-        user_orders = Order.objects.filter(user=user)
+        counts = archive.order_status_counts(user=user)
 
-        total_orders = user_orders.count()
-        pending_orders = user_orders.filter(status='Pending').count()
-        delivered_orders = user_orders.filter(status='Delivered').count()
+        total_orders = sum(counts.values())
+        pending_orders = counts.get('Pending', 0)
+        delivered_orders = counts.get('Delivered', 0)
 
         summary_cards = [
             {'id': 'total_orders', 'title': 'Jumla ya Oda Zangu', 'value': total_orders, 'icon': 'shopping_bag'},
@@ -167,7 +377,10 @@ class DashboardStatsView(APIView):
             {'id': 'delivered_orders', 'title': 'Oda Zilizokamilika', 'value': delivered_orders, 'icon': 'local_shipping'},
         ]
 
-        recent_orders = user_orders.select_related('product').order_by('-date_ordered')[:5]
+        recent_orders = list(heapq.merge(
+            *archive.across_history(Order, lambda orders: orders.filter(user=user).select_related('product').order_by('-date_ordered')[:5]),
+            key=lambda order: order.date_ordered, reverse=True,
+        ))[:5]
         recent_orders_data = [
             {'id': order.id, 'product_name': order.product.name, 'status': order.status, 'date': order.date_ordered.strftime('%b %d, %Y')}
             for order in recent_orders
@@ -179,6 +392,7 @@ class DashboardStatsView(APIView):
 
 class PlaceOrderView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [PlaceOrderThrottle, PlaceOrderEndpointThrottle]
 
     def post(self, request):
         user = request.user
@@ -201,6 +415,7 @@ class PlaceOrderView(APIView):
         try:
             with transaction.atomic():
                 product = Product.objects.select_for_update().get(pk=product_id)
+                pricing.ensure_current([product])
 
                 if product.quantity < quantity:
                     return Response({'error': 'Insufficient stock for this product.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -214,14 +429,150 @@ class PlaceOrderView(APIView):
                     address=address,
                 )
 
-                product.quantity -= quantity
-                product.save(update_fields=['quantity'])
+                inventory.apply_stock_changes({product.pk: -quantity}, StockMovement.ORDER, reference_id=order.pk, user=user)
+                outbox.publish(outbox.ORDER_CREATED, order.pk, order_created_payload(order))
 
             return Response({'success': 'Order placed successfully.', 'order_id': order.id}, status=status.HTTP_201_CREATED)
         except Product.DoesNotExist:
             return Response({'error': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
 
 
+def order_history(since=None, **filters):
+    """Live and archived orders matching ``filters`` (changed since ``since``), newest first."""
+    def select(orders):
+        orders = orders.filter(**filters).select_related('user', 'product').order_by('-date_ordered')
+        return orders if since is None else orders.filter(updated_at__gte=since)
+    return heapq.merge(*archive.across_history(Order, select), key=lambda order: order.date_ordered, reverse=True)
+
+
+def staff_order_data(order):
+    """Row shape used by the staff order list (``orders/``)."""
+    return {
+        'id': order.id,
+        'customer': order.user.username if order.user else 'Guest',
+        'product_name': order.product.name if order.product else 'Unknown Product',
+        'quantity': order.quantity,
+        'total_price': float(order.total_price or 0),
+        'status': order.status,
+        'date': order.date_ordered.isoformat(),
+        'phone': order.phone,
+        'address': order.address,
+        'updated_at': order.updated_at.isoformat(),
+    }
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def api_stock_alerts(request):
+    """
+    Feed of low-stock threshold crossings, oldest first.
+
+    Poll with ``?after=<last id seen>``; ``next_after`` is the cursor for the
+    next call, so clients only ever receive new crossings.
+    """
+    try:
+        after = int(request.query_params.get('after', 0))
+        limit = min(max(int(request.query_params.get('limit', 100)), 1), 500)
+    except ValueError:
+        return Response({'error': 'after and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    events = list(StockAlertEvent.objects.filter(id__gt=after).select_related('product').order_by('id')[:limit])
+    return Response({
+        'results': StockAlertEventSerializer(events, many=True).data,
+        'next_after': events[-1].id if events else after,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def api_events(request):
+    """
+    Outbox feed of order and stock events, oldest first.
+
+    Poll with ``?after=<next_after from the previous call>`` (and optionally
+    ``?topic=order.created,order.status_changed``) to receive only new events.
+    """
+    try:
+        after = int(request.query_params.get('after', 0))
+        limit = min(max(int(request.query_params.get('limit', 100)), 1), 1000)
+    except ValueError:
+        return Response({'error': 'after and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    events = list(outbox.visible_events(after, limit))
+    topics = request.query_params.get('topic')
+    if topics:
+        topics = set(topics.split(','))
+        selected = [event for event in events if event.topic in topics]
+    else:
+        selected = events
+    return Response({
+        'results': OutboxEventSerializer(selected, many=True).data,
+        # Advances past filtered-out events too, so sparse topics do not rescan.
+        'next_after': events[-1].id if events else after,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def api_reorder_suggestions(request):
+    """Latest ``forecast_demand`` output, most urgent (fewest days of cover) first."""
+    suggestions = ReorderSuggestion.objects.select_related('product').order_by(
+        F('days_of_cover').asc(nulls_last=True), '-suggested_quantity',
+    )
+    return Response(ReorderSuggestionSerializer(suggestions, many=True).data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+@coalesce('analytics')
+def api_analytics(request):
+    """
+    Sales reports: ``?report=revenue|baskets|customers``, ``group=day|week|month|category|product``,
+    ``start``/``end`` (dates, inclusive), ``source=all|sales|orders`` and ``top`` (category/product).
+    """
+    return Response(analytics.run_report(analytics.parse_params(request.query_params)))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def api_snapshot(request, dataset):
+    """
+    Download a columnar snapshot of ``dataset`` (products, orders, sales, sale_items).
+
+    ``?output=parquet|arrow|csv`` picks the file format.  The response's
+    ``X-Snapshot-Token`` header can be sent back as ``?since=`` to get only
+    rows changed after this snapshot.
+    """
+    if dataset not in snapshots.DATASETS:
+        return Response({'error': f"Unknown dataset; choose from {', '.join(snapshots.DATASETS)}."}, status=status.HTTP_404_NOT_FOUND)
+    fmt = request.query_params.get('output') or snapshots.default_format()
+    # Spooled to disk so the response never holds a whole table in memory.
+    sink = tempfile.TemporaryFile()
+    try:
+        writer = snapshots.writer_class(fmt)
+        rows, token = snapshots.write_snapshot(dataset, sink, fmt, since=request.query_params.get('since'))
+    except ValueError as exc:
+        sink.close()
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    sink.seek(0)
+    response = FileResponse(
+        sink,
+        as_attachment=True,
+        filename=f"{dataset}-{timezone.now():%Y%m%dT%H%M%S}.{writer.extension}",
+        content_type=writer.content_type,
+    )
+    response['X-Snapshot-Token'] = token
+    response['X-Snapshot-Rows'] = str(rows)
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def api_coalescing_metrics(request):
+    """Per-endpoint counts of computed, coalesced, shared and fallback requests."""
+    return Response(coalescing_stats())
+
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def api_health(request):
@@ -231,44 +582,161 @@ def api_health(request):
 @api_view(['GET'])
 @permission_classes([permissions.IsAdminUser])
 def api_orders(request):
-    orders = Order.objects.select_related('user', 'product').order_by('-date_ordered')
-    data = [
-        {
-            'id': order.id,
-            'customer': order.user.username if order.user else 'Guest',
-            'product_name': order.product.name if order.product else 'Unknown Product',
-            'quantity': order.quantity,
-            'total_price': float(order.total_price or 0),
-            'status': order.status,
-            'date': order.date_ordered.isoformat(),
-            'phone': order.phone,
-            'address': order.address,
-        }
-        for order in orders
-    ]
-    return Response(data)
+    since = parse_since(request.query_params)
+    token = next_sync_token()
+    orders = order_history(since)
+    if since is None:
+        return Response([staff_order_data(order) for order in orders])
+    return Response(delta_payload([staff_order_data(order) for order in orders], Order, since, token))
+
+
+def jwt_user(raw_token):
+    authenticator = CachedJWTAuthentication()
+    try:
+        return authenticator.get_user(authenticator.get_validated_token(raw_token))
+    except (AuthenticationFailed, InvalidToken):
+        return None
+
+
+async def stream_user(request):
+    """Session user, or a JWT from the Authorization header / ``?token=`` (EventSource cannot set headers)."""
+    header = request.headers.get('Authorization', '')
+    raw_token = header[7:] if header.startswith('Bearer ') else request.GET.get('token')
+    if raw_token:
+        return await sync_to_async(jwt_user)(raw_token)
+    return await request.auser()
+
+
+def missed_order_events(user, after):
+    """Order events after ``after`` that ``user`` may see, for ``Last-Event-ID`` reconnects."""
+    events = OutboxEvent.objects.filter(id__gt=after, topic__in=outbox.ORDER_TOPICS).order_by('id')
+    if not user.is_staff:
+        events = events.filter(payload__user=user.pk)
+    return [outbox.event_message(event) for event in events[:500]]
+
+
+def sse_message(message):
+    lines = [f"id: {message['id']}"] if 'id' in message else []
+    lines.append(f"event: {message['topic']}")
+    lines.append('data: ' + json.dumps(message, cls=DjangoJSONEncoder))
+    return '\n'.join(lines) + '\n\n'
+
+
+async def order_event_lines(subscription, missed=()):
+    last_sent = 0
+    try:
+        yield f'retry: {settings.SSE_RETRY_MS}\n\n'
+        for message in missed:
+            last_sent = message['id']
+            yield sse_message(message)
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), settings.SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment lines keep proxies from closing an idle connection.
+                yield ': keep-alive\n\n'
+                continue
+            if message is not RESYNC and message['id'] <= last_sent:
+                continue
+            yield sse_message(message)
+    finally:
+        subscription.close()
+
+
+async def order_event_stream(request):
+    """
+    Server-Sent Events feed of order creation and status changes.
+
+    Staff receive every order, customers only their own.  On reconnect the
+    browser sends ``Last-Event-ID`` and missed events are replayed from the
+    outbox; a ``resync`` event means the client fell behind and should
+    refetch its list.  Serve under ASGI: each connection is one idle coroutine.
+    """
+    user = await stream_user(request)
+    if user is None or not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if not isinstance(request, ASGIRequest):
+        # WSGI buffers an async stream to the end, holding a worker forever;
+        # clients fall back to polling on this 404.
+        return JsonResponse({'detail': 'The live order stream needs an ASGI server.'}, status=404)
+
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or 0)
+    except ValueError:
+        last_event_id = 0
+
+    channel = 'orders.staff' if user.is_staff else f'orders.user.{user.pk}'
+    subscription = get_broker().subscribe([channel])
+    try:
+        missed = await sync_to_async(missed_order_events)(user, last_event_id) if last_event_id else []
+    except Exception:
+        subscription.close()
+        raise
+
+    response = StreamingHttpResponse(order_event_lines(subscription, missed), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAdminUser])
 def api_update_order_status(request, pk):
-    order = get_object_or_404(Order, pk=pk)
+    get_object_or_404(Order.objects.only('pk'), pk=pk)
     new_status = request.data.get('status')
-    valid_statuses = {choice[0] for choice in Order.STATUS_CHOICES}
 
     if not new_status:
         return Response({'error': 'Status is required.'}, status=status.HTTP_400_BAD_REQUEST)
-    if new_status not in valid_statuses:
-        return Response({'error': 'Invalid status value.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    order.status = new_status
-    order.save(update_fields=['status'])
+    try:
+        transition_orders({pk: new_status}, user=request.user)
+    except OrderTransitionError as exc:
+        return Response({'error': exc.errors[pk]}, status=status.HTTP_400_BAD_REQUEST)
     return Response({'message': 'Status updated successfully.'})
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def api_bulk_update_order_status(request):
+    """
+    Change the status of many orders in one transaction.
+
+    Body: ``{"order_ids": [1, 2], "status": "Shipped"}`` or
+    ``{"updates": [{"id": 1, "status": "Shipped"}, {"id": 2, "status": "Cancelled"}]}``.
+    Either every change is applied or none is.
+    """
+    # Only JSON lists are accepted: a string such as "12" would otherwise be
+    # iterated digit by digit and form data keeps just the last value.
+    if 'updates' in request.data:
+        items = request.data['updates']
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return Response({'error': 'updates must be a list of {"id", "status"} objects.'}, status=status.HTTP_400_BAD_REQUEST)
+        pairs = [(item.get('id'), item.get('status')) for item in items]
+    else:
+        order_ids = request.data.get('order_ids')
+        if not isinstance(order_ids, list):
+            return Response({'error': 'order_ids must be a list.'}, status=status.HTTP_400_BAD_REQUEST)
+        pairs = [(order_id, request.data.get('status')) for order_id in order_ids]
+    if not all(type(order_id) is int for order_id, _ in pairs):
+        return Response({'error': 'Order ids must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+    updates = dict(pairs)
+
+    if not updates:
+        return Response({'error': 'No orders given.'}, status=status.HTTP_400_BAD_REQUEST)
+    if not all(updates.values()):
+        return Response({'error': 'Status is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        changed = transition_orders(updates, user=request.user)
+    except OrderTransitionError as exc:
+        return Response({'error': 'Invalid status change.', 'errors': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'message': f'{len(changed)} orders updated.', 'updated': [order.pk for order in changed]})
+
+
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 @authentication_classes([])
+@throttle_classes([RegisterThrottle])
 def api_register(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if not serializer.is_valid():
@@ -284,8 +752,9 @@ def api_register(request):
     if User.objects.filter(username__iexact=username).exists():
         return Response({'error': 'Username already exists.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    user = User.objects.create_user(username=username, email=email, password=password)
-    Customer.objects.create(name=user.username, email=user.email)
+    with transaction.atomic():
+        user = User.objects.create_user(username=username, email=email, password=password)
+        Customer.objects.create(name=user.username, email=user.email)
 
     return Response({'success': 'Registration successful. Please login.'}, status=status.HTTP_201_CREATED)
 
@@ -313,23 +782,14 @@ def api_register_staff(request):
 # simple login endpoint for React client
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([LoginThrottle])
 def api_login(request):
     # accept username or email for login
     identifier = (request.data.get('username') or '').strip()
     password = (request.data.get('password') or '').strip()
 
-    user = None
-    if identifier:
-        # try authenticate directly; if identifier contains '@' maybe it's email
-        user = authenticate(request, username=identifier, password=password)
-        if user is None and '@' in identifier:
-            # try lookup by email since authenticate won't match email automatically
-            from django.contrib.auth.models import User as DjangoUser
-            try:
-                usr = DjangoUser.objects.get(email__iexact=identifier)
-                user = authenticate(request, username=usr.username, password=password)
-            except DjangoUser.DoesNotExist:
-                user = None
+    # CachedModelBackend matches the username or the email in one query.
+    user = authenticate(request, username=identifier, password=password) if identifier else None
     if user is not None:
         auth_login(request, user)
         return Response({'username': user.username, 'is_staff': user.is_staff})
@@ -340,8 +800,10 @@ def api_login(request):
 @permission_classes([permissions.IsAuthenticated])
 def api_user_orders(request):
     user = request.user
+    since = parse_since(request.query_params)
+    token = next_sync_token()
 
-    orders = Order.objects.filter(user=user).select_related('product').order_by('-date_ordered')
+    orders = order_history(since, user=user)
     data = [
         {
             'id': order.id,
@@ -350,7 +812,10 @@ def api_user_orders(request):
             'total_price': float(order.total_price or 0),
             'status': order.status,
             'date': order.date_ordered.isoformat(),
+            'updated_at': order.updated_at.isoformat(),
         }
         for order in orders
     ]
+    if since is not None:
+        return Response(delta_payload(data, Order, since, token, owner=user))
     return Response(data)
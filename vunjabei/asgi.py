@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vunjabei.settings')
 
 application = get_asgi_application()
+
+from vunjabei.boot import prepare_web_process  # noqa: E402
+
+prepare_web_process()
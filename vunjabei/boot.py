@@ -0,0 +1,17 @@
+"""
+Work that only web processes need at start-up.
+
+Kept out of settings.py so management commands, tests and background
+workers do not pay for it on every import.
+"""
+
+from pathlib import Path
+
+from django.conf import settings
+
+
+def prepare_web_process():
+    # Serving /media/ from a missing directory raises 500s instead of 404s.
+    media_root = getattr(settings, 'MEDIA_ROOT', None)
+    if media_root:
+        Path(media_root).mkdir(parents=True, exist_ok=True)
@@ -7,11 +7,6 @@ import os
 import importlib.util
 import sys
 
-try:
-    import dj_database_url
-except ImportError:  # pragma: no cover
-    dj_database_url = None
-
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -23,6 +18,27 @@ def env_bool(name, default=False):
     return value.strip().lower() in {'1', 'true', 'yes', 'on'}
 
 
+def module_available(*names):
+    """Return True if every module in ``names`` can be imported.
+
+    Only the import system's finders are consulted; the modules themselves
+    are not executed, so probing an optional integration stays cheap.
+    """
+    return all(importlib.util.find_spec(name) is not None for name in names)
+
+
+def optional_integration(env_name, *modules, enabled=True):
+    """Decide whether an optional integration should be switched on.
+
+    An explicit ``env_name`` value (``USE_WHITENOISE=False`` ...) wins and
+    skips probing entirely.  Otherwise the modules are only looked up when the
+    integration is ``enabled`` (e.g. its credentials are configured).
+    """
+    if os.environ.get(env_name) is not None:
+        return env_bool(env_name)
+    return enabled and module_available(*modules)
+
+
 SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-change-this-in-production')
 DEBUG = env_bool('DEBUG', True)
 ALLOWED_HOSTS = [host.strip() for host in os.environ.get('ALLOWED_HOSTS', '127.0.0.1,localhost,.onrender.com').split(',') if host.strip()]
@@ -33,9 +49,13 @@ cloudinary_env = (
     (os.environ.get('CLOUDINARY_API_SECRET') or '').strip(),
 )
 CLOUDINARY_CONFIGURED = all(cloudinary_env)
-CLOUDINARY_INSTALLED = bool(importlib.util.find_spec('cloudinary_storage')) and bool(importlib.util.find_spec('cloudinary'))
+# Cloudinary is only probed when its credentials are present, so local runs,
+# tests and management commands never touch the import machinery for it.
+CLOUDINARY_INSTALLED = optional_integration(
+    'USE_CLOUDINARY', 'cloudinary_storage', 'cloudinary', enabled=CLOUDINARY_CONFIGURED,
+)
 USE_CLOUDINARY = CLOUDINARY_CONFIGURED and CLOUDINARY_INSTALLED
-WHITENOISE_INSTALLED = bool(importlib.util.find_spec('whitenoise'))
+WHITENOISE_INSTALLED = optional_integration('USE_WHITENOISE', 'whitenoise')
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -55,6 +75,7 @@ if CLOUDINARY_INSTALLED and CLOUDINARY_CONFIGURED:
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'myapp.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -94,7 +115,9 @@ if RUNNING_TESTS and env_bool('USE_SQLITE_FOR_TESTS', True):
             'NAME': ':memory:',
         }
     }
-elif DATABASE_URL and dj_database_url:
+elif DATABASE_URL and module_available('dj_database_url'):
+    import dj_database_url
+
     DATABASES = {
         'default': dj_database_url.config(default=DATABASE_URL, conn_max_age=600, ssl_require=False)
     }
@@ -117,6 +140,26 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
+# Password hashing: 'pbkdf2' (default) or 'argon2' (needs argon2-cffi).  Get
+# the cost for this host from `python manage.py calibrate_hasher`; stored
+# hashes move to the current profile on each user's next successful login.
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2').strip().lower()
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 0))  # 0: Django's default
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 102400))  # KiB
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 8))
+# Threads that async views hash passwords on (myapp.hashers).
+PASSWORD_HASH_THREADS = int(os.environ.get('PASSWORD_HASH_THREADS', 4))
+PASSWORD_HASHERS = [
+    'myapp.hashers.TunedPBKDF2PasswordHasher',
+    'myapp.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if PASSWORD_HASHER == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
@@ -126,6 +169,23 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static'] if (BASE_DIR / 'static').exists() else []
 
+# Optionally serve the built React app (frontend/dist) from Django.  build.sh
+# precompresses it with `python -m whitenoise.compress`, and WhiteNoise then
+# serves the .br/.gz variants to clients that accept them.
+FRONTEND_DIST = BASE_DIR / 'frontend' / 'dist'
+if WHITENOISE_INSTALLED and env_bool('SERVE_FRONTEND', False):
+    WHITENOISE_ROOT = FRONTEND_DIST
+    WHITENOISE_INDEX_FILE = True
+    # Only Vite's build output under assets/ carries a content hash
+    # (assets/index-BdX3k9aQ.js); files copied from public/ keep their names.
+    WHITENOISE_IMMUTABLE_FILE_TEST = r'^/?assets/.+-[0-9A-Za-z_-]{8,}\.\w+$'
+
+# API response compression (myapp.middleware.CompressionMiddleware)
+API_COMPRESSION_PATHS = ['/api/']
+API_COMPRESSION_EXCLUDE = ['/api/token/', '/api/login/']
+API_COMPRESSION_MIN_SIZE = int(os.environ.get('API_COMPRESSION_MIN_SIZE', 1024))
+API_COMPRESSION_BROTLI_QUALITY = int(os.environ.get('API_COMPRESSION_BROTLI_QUALITY', 5))
+
 if CLOUDINARY_INSTALLED and CLOUDINARY_CONFIGURED:
     CLOUDINARY_STORAGE = {
         'CLOUD_NAME': cloudinary_env[0],
@@ -142,10 +202,9 @@ if CLOUDINARY_INSTALLED and CLOUDINARY_CONFIGURED:
     MEDIA_URL = 'https://res.cloudinary.com/{}/image/upload/'.format(cloudinary_env[0])
 else:
     MEDIA_URL = '/media/'
+    # The directory is created by vunjabei.wsgi/asgi when a web server boots
+    # (and by FileSystemStorage on first upload), not on every settings import.
     MEDIA_ROOT = BASE_DIR / 'media'
-    # Ensure media directory exists to prevent 500 errors
-    if not MEDIA_ROOT.exists():
-        MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
 
 STORAGES = {
     'default': {
@@ -181,18 +240,102 @@ LOGGING = {
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': [
+        'myapp.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'myapp.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'myapp.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # Client IP for throttling: the address this many proxies back in
+    # X-Forwarded-For (Render adds one).  0 uses REMOTE_ADDR and ignores the
+    # header, which clients can set to anything.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0 if DEBUG else 1)),
+    # Token buckets (myapp.throttling): 'N/period' allows bursts of N, refilled at N per period.
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.environ.get('THROTTLE_LOGIN_RATE', '10/min'),  # per IP
+        'register': os.environ.get('THROTTLE_REGISTER_RATE', '5/hour'),  # per IP
+        'place_order': os.environ.get('THROTTLE_PLACE_ORDER_RATE', '20/min'),  # per user
+        'place_order_all': os.environ.get('THROTTLE_PLACE_ORDER_ALL_RATE', '600/min'),  # whole endpoint
+    },
 }
 
+# Products below this quantity are "low stock" unless the product or its
+# category sets its own reorder_threshold.
+DEFAULT_REORDER_THRESHOLD = int(os.environ.get('DEFAULT_REORDER_THRESHOLD', 10))
+
+# Demand forecast (manage.py forecast_demand): days of sales history to load,
+# supplier lead time and how many days of stock a reorder should cover.
+FORECAST_HISTORY_DAYS = int(os.environ.get('FORECAST_HISTORY_DAYS', 730))
+FORECAST_LEAD_TIME_DAYS = int(os.environ.get('FORECAST_LEAD_TIME_DAYS', 7))
+FORECAST_COVER_DAYS = int(os.environ.get('FORECAST_COVER_DAYS', 14))
+FORECAST_SMOOTHING = float(os.environ.get('FORECAST_SMOOTHING', 0.3))
+
+# "Frequently bought together" (manage.py build_recommendations): neighbours
+# kept per product, how close online orders must be to share a basket and the
+# minimum number of shared baskets for a pair to count.
+RECOMMENDATION_TOP_K = int(os.environ.get('RECOMMENDATION_TOP_K', 8))
+RECOMMENDATION_ORDER_WINDOW_HOURS = float(os.environ.get('RECOMMENDATION_ORDER_WINDOW_HOURS', 24))
+RECOMMENDATION_MIN_SUPPORT = int(os.environ.get('RECOMMENDATION_MIN_SUPPORT', 1))
+
+# Background tasks (myapp.tasks, run by `manage.py run_worker`).  Failed tasks
+# retry after TASKS_RETRY_BACKOFF * 2**(attempt - 1) seconds; tasks locked for
+# longer than TASKS_LOCK_TIMEOUT seconds are assumed orphaned and requeued.
+# TASKS_ALWAYS_EAGER runs tasks in-process after commit (no worker needed).
+TASKS_ALWAYS_EAGER = env_bool('TASKS_ALWAYS_EAGER', False)
+TASKS_RETRY_BACKOFF = int(os.environ.get('TASKS_RETRY_BACKOFF', 30))
+TASKS_LOCK_TIMEOUT = int(os.environ.get('TASKS_LOCK_TIMEOUT', 600))
+# Product image uploads go to the worker when storage is remote (Cloudinary).
+TASKS_DEFER_IMAGE_UPLOADS = env_bool('TASKS_DEFER_IMAGE_UPLOADS', USE_CLOUDINARY)
+
+# Outbox readers (api/events/, manage.py dispatch_outbox) only see events this
+# many seconds old, so ids committed out of order are not skipped.
+OUTBOX_SETTLE_SECONDS = float(os.environ.get('OUTBOX_SETTLE_SECONDS', 2))
+
+# Live order stream (api/orders/stream/).  It needs an ASGI server (see the
+# Procfile); under WSGI the endpoint answers 404 and the frontend polls.  The
+# in-memory broker only reaches clients connected to the same process, so the
+# Redis broker is used whenever REDIS_URL is set.
+PUBSUB_BACKEND = os.environ.get(
+    'PUBSUB_BACKEND',
+    'myapp.pubsub.RedisBroker' if os.environ.get('REDIS_URL') else 'myapp.pubsub.InMemoryBroker',
+)
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', 3000))
+
+# Delta sync (?updated_since= / ?sync_token=): tokens lag the clock by this
+# many seconds so rows from transactions still open at read time are not missed.
+SYNC_OVERLAP_SECONDS = float(os.environ.get('SYNC_OVERLAP_SECONDS', 5))
+
+# `manage.py archive_history` moves orders closed, and sales made, more than
+# this many days ago into the archive tables.
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+
+# /api/analytics/ results are cached per query for this long.
+ANALYTICS_CACHE_SECONDS = int(os.environ.get('ANALYTICS_CACHE_SECONDS', 300))
+
+# Columnar history snapshots (`manage.py export_snapshot`, /api/snapshots/).
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', str(BASE_DIR / 'snapshots'))
+SNAPSHOT_BATCH_SIZE = int(os.environ.get('SNAPSHOT_BATCH_SIZE', 50000))
+SNAPSHOT_PARQUET_COMPRESSION = os.environ.get('SNAPSHOT_PARQUET_COMPRESSION', 'zstd')
+SNAPSHOT_ARROW_COMPRESSION = os.environ.get('SNAPSHOT_ARROW_COMPRESSION', 'zstd')
+
+# Admin changelists of unfiltered tables at least this big show the planner's
+# row estimate (Postgres only) instead of running COUNT(*).
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.environ.get('ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000))
+
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOW_CREDENTIALS = True
 
@@ -231,6 +374,43 @@ CSRF_TRUSTED_ORIGINS = [
     if origin.strip()
 ]
 
+# Cache: Redis when REDIS_URL is set (needs the ``redis`` package), otherwise
+# per-process memory.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Authenticated requests read the user from the cache for this long; saving
+# or deleting a user drops the entry.  0 disables the cache.  Off by default
+# without Redis: a per-process cache is only cleared in the process that saved
+# the user, so other workers would honour a revoked user for the whole TTL.
+AUTHENTICATION_BACKENDS = ['myapp.authentication.CachedModelBackend']
+AUTH_USER_CACHE_SECONDS = int(os.environ.get('AUTH_USER_CACHE_SECONDS', 60 if REDIS_URL else 0))
+
+# Sessions are cached in front of the database when the cache is shared
+# between processes.  SESSION_ENGINE=django.contrib.sessions.backends.signed_cookies
+# keeps them in the cookie and skips the session table altogether.
+SESSION_ENGINE = os.environ.get(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.cached_db' if REDIS_URL else 'django.contrib.sessions.backends.db',
+)
+
+# Where throttle buckets live: per process, or shared through Redis.
+THROTTLE_STORE = os.environ.get(
+    'THROTTLE_STORE',
+    'myapp.throttling.RedisBucketStore' if REDIS_URL else 'myapp.throttling.MemoryBucketStore',
+)
+
+# Identical concurrent GETs to expensive endpoints share one computation
+# (myapp/coalescing.py).  Across worker processes this needs a shared cache,
+# so it follows REDIS_URL unless set explicitly.
+COALESCE_ENABLED = env_bool('COALESCE_ENABLED', True)
+COALESCE_WAIT_SECONDS = float(os.environ.get('COALESCE_WAIT_SECONDS', 5))
+COALESCE_RESULT_SECONDS = float(os.environ.get('COALESCE_RESULT_SECONDS', 1))
+COALESCE_CROSS_WORKER = env_bool('COALESCE_CROSS_WORKER', bool(REDIS_URL))
+
 SESSION_COOKIE_SAMESITE = 'None'
 CSRF_COOKIE_SAMESITE = 'None'
 SESSION_COOKIE_SECURE = True
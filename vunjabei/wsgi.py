@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vunjabei.settings')
 
 application = get_wsgi_application()
+
+from vunjabei.boot import prepare_web_process  # noqa: E402
+
+prepare_web_process()